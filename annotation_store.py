@@ -0,0 +1,198 @@
+# annotation_store.py
+#
+# Optional storage engine for large projects (STORAGE_ENGINE = "sqlite" in config.py).
+# The audio table is kept in a local SQLite database instead of a pandas DataFrame
+# in memory: the handlers read and write single rows, only the page shown in the
+# browser is loaded, and an existing project opens without reading its rows.
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import PROJECTS_DIR, STORE_IMPORT_CHUNK
+
+TABLE_NAME = "annotations"
+
+# Columns indexed to look rows up by file, species, validation state and confidence
+INDEXED_COLUMNS = ["File", "Specie", "Validation", "Confidence"]
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def get_project_db_path(project_root, projects_dir=PROJECTS_DIR):
+    """
+    Path of the database of the project whose audio files are in project_root.
+    """
+    project_id = hashlib.blake2b(os.path.abspath(project_root).encode(), digest_size=10).hexdigest()
+    return os.path.join(projects_dir, project_id + ".sqlite")
+
+
+class AnnotationStore:
+    """
+    Audio table stored in SQLite. Rows are addressed by their position in the
+    table (0-based) like the rows of the DataFrame, and "Idx" is the position + 1.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        # Gradio runs the handlers in worker threads, the lock serializes the access
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS project (key TEXT PRIMARY KEY, value TEXT)")
+        self._load_schema()
+
+    @classmethod
+    def for_project(cls, project_root):
+        store = cls(get_project_db_path(project_root))
+        store.set_property("root_dir", os.path.abspath(project_root))
+        return store
+
+    def _load_schema(self):
+        columns = [row[1] for row in self._connection.execute(f"PRAGMA table_info({TABLE_NAME})")]
+        self._columns = ["Idx"] + columns[1:] if columns else []
+        row = self._connection.execute(f"SELECT MAX(row) FROM {TABLE_NAME}").fetchone() if columns else None
+        # Rows are never deleted, so the largest row id is the number of rows
+        self._row_count = (row[0] or 0) if row else 0
+
+    def _create_table(self, columns):
+        column_definitions = ", ".join(_quote(column) for column in columns)
+        with self._connection:
+            self._connection.execute(f"CREATE TABLE {TABLE_NAME} (row INTEGER PRIMARY KEY, {column_definitions})")
+            if "Path" in columns:
+                self._connection.execute(f'CREATE UNIQUE INDEX idx_path ON {TABLE_NAME} ("Path")')
+            for column in INDEXED_COLUMNS:
+                if column in columns:
+                    self._connection.execute(f"CREATE INDEX {_quote('idx_' + column)} ON {TABLE_NAME} ({_quote(column)})")
+        self._load_schema()
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def empty(self):
+        return self._row_count == 0
+
+    def __len__(self):
+        return self._row_count
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    def get_property(self, key, default=None):
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM project WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_property(self, key, value):
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO project (key, value) VALUES (?, ?)", (key, value))
+
+    def import_table(self, audio_table, chunk_size=STORE_IMPORT_CHUNK):
+        """
+        Add the rows of an audio table to the store. Rows whose Path is already in
+        the store are skipped, so importing a folder again keeps the validations
+        and only appends the new files.
+
+        Returns:
+        int: The number of rows added.
+        """
+        if audio_table.empty:
+            return 0
+        columns = [column for column in audio_table.columns if column != "Idx"]
+        if "Comment" not in columns:
+            columns.append("Comment")
+        with self._lock:
+            if not self._columns:
+                self._create_table(columns)
+            missing = [column for column in columns if column not in self._columns]
+            with self._connection:
+                for column in missing:
+                    self._connection.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {_quote(column)}")
+            self._load_schema()
+
+            table = audio_table.reindex(columns=columns)
+            statement = f"INSERT OR IGNORE INTO {TABLE_NAME} ({', '.join(map(_quote, columns))}) VALUES ({', '.join('?' * len(columns))})"
+            with self._connection:
+                for start in range(0, len(table), chunk_size):
+                    chunk = table.iloc[start:start + chunk_size].astype(object)
+                    chunk = chunk.where(chunk.notna(), None)
+                    self._connection.executemany(statement, chunk.itertuples(index=False, name=None))
+            rows_before = self._row_count
+            self._load_schema()
+            return self._row_count - rows_before
+
+    def _select_columns(self, columns):
+        return ", ".join("row AS Idx" if column == "Idx" else _quote(column) for column in columns)
+
+    def get_row(self, row_index):
+        """
+        Return a row of the table as a dict.
+        """
+        with self._lock:
+            cursor = self._connection.execute(f"SELECT {self._select_columns(self._columns)} FROM {TABLE_NAME} WHERE row = ?", (int(row_index) + 1,))
+            values = cursor.fetchone()
+        if values is None:
+            raise IndexError(f"Row {row_index} out of range")
+        return dict(zip(self._columns, values))
+
+    def get_value(self, row_index, column):
+        return self.get_row(row_index)[column] if column in self._columns else None
+
+    def set_values(self, row_index, values):
+        """
+        Update some columns of one row, e.g. {"Validation": 1, "Suggested Specie": None}.
+        """
+        values = {column: (None if not isinstance(value, str) and pd.isna(value) else value) for column, value in values.items()}
+        assignments = ", ".join(f"{_quote(column)} = ?" for column in values)
+        with self._lock, self._connection:
+            self._connection.execute(f"UPDATE {TABLE_NAME} SET {assignments} WHERE row = ?", (*values.values(), int(row_index) + 1))
+
+    def get_rows(self, start, stop, columns=None):
+        """
+        Return the rows start to stop - 1 as a DataFrame indexed by row position.
+        """
+        columns = [column for column in (columns or self._columns) if column in self._columns]
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {self._select_columns(columns)} FROM {TABLE_NAME} WHERE row > ? AND row <= ? ORDER BY row",
+                (int(start), int(stop)),
+            ).fetchall()
+        return pd.DataFrame(rows, columns=columns, index=pd.RangeIndex(start, start + len(rows)))
+
+    def get_column(self, column):
+        """
+        Return one column of every row, in row order, as a numpy array.
+        """
+        with self._lock:
+            cursor = self._connection.execute(f"SELECT {_quote(column)} FROM {TABLE_NAME} ORDER BY row")
+            return np.array([value for value, in cursor], dtype=object)
+
+    def update_validations(self, validation_df):
+        """
+        Copy the Validation, Suggested Specie and Comment of a validation table
+        into the rows with the same File.
+
+        Returns:
+        int: The number of rows updated.
+        """
+        columns = [column for column in ["Validation", "Suggested Specie", "Comment"] if column in validation_df and (column == "Validation" or validation_df[column].notna().any())]
+        table = validation_df[columns + ["File"]].astype(object)
+        table = table.where(table.notna(), None)
+        assignments = ", ".join(f"{_quote(column)} = ?" for column in columns)
+        with self._lock, self._connection:
+            cursor = self._connection.executemany(f'UPDATE {TABLE_NAME} SET {assignments} WHERE "File" = ?', table.itertuples(index=False, name=None))
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
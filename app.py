@@ -1,23 +1,103 @@
 # app.py
 
 # Web App
-from tkinter import Tk, filedialog
 import gradio as gr
 
 # Data processing
 import pandas as pd
 
 import os
+import multiprocessing
 
-from audio_processing import load_audio_files_from_folder, update_audio_and_image, list_audio_files_from_folder, extract_time_from_filename, extract_date_from_filename
+from audio_processing import load_audio_files_from_folder, list_audio_files_from_folder, extract_metadata_from_filenames, get_recording_date_and_time
 from species_management import add_suggested_species, get_suggested_species, initialize_suggested_species_file, initialize_comments_file, add_comment, get_comments
-from data_processing import save_table_to_csv, update_table_with_validation
-from ui_components import build_footer, tutorial_tab, on_audio_selected, update_validation, get_sample_audio_and_image
+from data_processing import save_table, update_table_with_validation
+from ui_components import build_footer, refresh_footer, tutorial_tab, on_audio_selected, select_row, update_validation, get_sample_audio_and_image, render_current_page, on_page_changed
+from table_view import get_page_of_row, get_row_value, set_row_values
+from annotation_store import AnnotationStore
+from sample_library import load_sample_audio_and_image
+from segments import load_birdnet_results
+from validation_journal import get_project_journal
+from session import Session
+from species_index import species_index, load_species, label_with_query
+from metrics import timed_handler, time_postprocess, start_metrics_export
+from profiler import start_profiler
+from render_params import load_project_render_params
+from update_check import start_update_check
+
+from config import STORAGE_ENGINE, STORE_IMPORT_CHUNK, PROJECTS_DIR, QUEUE_CONCURRENCY_LIMIT, QUEUE_MAX_SIZE, EXPORT_POLL_INTERVAL_S
+
+def build_audio_table(filenames):
+    """
+    Build the audio table from the audio file paths, with the metadata parsed
+    from the BirdNET file names in typed columns.
+    """
+    audio_table = pd.DataFrame([
+        {"Idx": idx + 1, "Specie": f.split(os.sep)[-2], "File": os.path.basename(f), "Validation": -100, "Suggested Specie": " ", "Path": f}
+        for idx, f in enumerate(filenames)
+    ])
+    if audio_table.empty:
+        return audio_table
+    return audio_table.join(extract_metadata_from_filenames(audio_table["File"]))
+
+def set_project_table(session, audio_table, root_dir):
+    """
+    Make a new audio table the current one. With STORAGE_ENGINE = "sqlite" the rows
+    are moved into the database of the project and only the store is kept.
+    """
+    if STORAGE_ENGINE == "sqlite":
+        store = AnnotationStore.for_project(root_dir)
+        store.import_table(audio_table)
+        audio_table = store
+    session.set_audio_file_list(audio_table)
+    session.set_root_dir_audio_files(root_dir)
+
+def set_project_files(session, filenames, root_dir):
+    """
+    Build the audio table of a list of audio files and make it the current one.
+    The SQLite store is filled in chunks, so the whole table is never in memory.
+    """
+    if STORAGE_ENGINE != "sqlite":
+        set_project_table(session, build_audio_table(filenames), root_dir)
+        return
+    store = AnnotationStore.for_project(root_dir)
+    for start in range(0, len(filenames), STORE_IMPORT_CHUNK):
+        store.import_table(build_audio_table(filenames[start:start + STORE_IMPORT_CHUNK]))
+    session.set_audio_file_list(store)
+    session.set_root_dir_audio_files(root_dir)
+
+def on_audio_files_loaded(session):
+    """
+    Reset the view after loading a new audio table.
 
-# Global variables
-from config import Globals
+    Returns:
+    - tuple: Summary of the loaded files, first page of the audio table, page description.
+    """
+    session.set_current_row_index(-1)
+    session.set_current_page(0)
+    # The spectrograms of the project are rendered with its own parameters, if it has any
+    load_project_render_params(session.get_root_dir_audio_files())
+    audio_table = session.get_audio_file_list()
+    if isinstance(audio_table, AnnotationStore):
+        # The store writes every validation to its database, no journal is needed
+        session.journal = None
+        restored = 0
+    else:
+        # Restore the validations of a previous session of the same project
+        session.journal = get_project_journal(session.get_root_dir_audio_files())
+        restored = session.journal.replay(audio_table)
+    session.row_style_cache.invalidate()
+    # Incremental saves of the new table start from its validated rows
+    session.export_snapshot = None
+    summary = f"{len(audio_table)} audio files loaded from {session.get_root_dir_audio_files()}"
+    if restored:
+        summary += f", {restored} validations restored"
+    return (summary,) + render_current_page(session)
+
+@timed_handler
+def on_browse(session, data_type, rescan=False):
+    from tkinter import Tk, filedialog  # tkinter is only loaded when a dialog is opened
 
-def on_browse(data_type):
     root = Tk()
     root.attributes("-topmost", True)
     root.withdraw()
@@ -25,38 +105,56 @@ def on_browse(data_type):
         filenames = filedialog.askopenfilenames()
         if filenames:
             # Extraer tiempo de audio
-            Globals.set_audio_file_list(pd.DataFrame([
-                {"Idx": idx + 1, "Specie": f.split(os.sep)[-2], "File": os.path.basename(f), "Validation": -100, "Suggested Specie": " ", "Path": f}
-                for idx, f in enumerate(filenames)
-            ]))
-            Globals.set_root_dir_audio_files(os.path.dirname(filenames[0]))
+            set_project_files(session, list(filenames), os.path.dirname(filenames[0]))
             root.destroy()
-            return Globals.get_audio_file_list().to_string(index=False), Globals.get_audio_file_list()
+            return on_audio_files_loaded(session)
         else:
             root.destroy()
-            return "Files not selected", pd.DataFrame()
+            return ("Files not selected",) + render_current_page(session)
     elif data_type == "Folder":
         folder_path = filedialog.askdirectory()
         if folder_path:
             folder_path = os.path.normpath(folder_path)
             with gr.Blocks() as progress:
                 gr.Markdown("Loading audio files, please wait...")
-                filenames = load_audio_files_from_folder(folder_path)  # Usando caché
-            Globals.set_audio_file_list(pd.DataFrame([
-                {"Idx": idx+1,"Specie": f.split(os.sep)[-2], "File": os.path.basename(f), "Validation": -100, "Suggested Specie": " ", "Path": f}
-                for idx, f in enumerate(filenames)
-            ]))
-            Globals.set_root_dir_audio_files(folder_path)
+                # Usando caché, "Rescan folder" lists every directory again
+                filenames = load_audio_files_from_folder(folder_path, refresh=rescan)
+            set_project_files(session, filenames, folder_path)
             root.destroy()
-            return Globals.get_audio_file_list().to_string(index=False), Globals.get_audio_file_list()
+            return on_audio_files_loaded(session)
         else:
             root.destroy()
-            return "Folder not selected", pd.DataFrame()
+            return ("Folder not selected",) + render_current_page(session)
+    elif data_type == "BirdNET Table":
+        # Segment-on-demand: detections are read straight from the original recordings
+        table_paths = filedialog.askopenfilenames(title="Select BirdNET result tables", filetypes=[("BirdNET results", "*.csv *.txt")])
+        if not table_paths:
+            root.destroy()
+            return ("BirdNET tables not selected",) + render_current_page(session)
+        recordings_dir = filedialog.askdirectory(title="Select the folder with the original recordings")
+        root.destroy()
+        if not recordings_dir:
+            return ("Recordings folder not selected",) + render_current_page(session)
+        recordings_dir = os.path.normpath(recordings_dir)
+        audio_table = load_birdnet_results(table_paths, recordings_dir)
+        set_project_table(session, audio_table.join(extract_metadata_from_filenames(audio_table["File"])), recordings_dir)
+        return on_audio_files_loaded(session)
+    elif data_type == "Project":
+        # Reopen the database of a project, without scanning its audio files again
+        db_path = filedialog.askopenfilename(title="Select a project database", initialdir=PROJECTS_DIR, filetypes=[("Project databases", "*.sqlite")])
+        root.destroy()
+        if not db_path:
+            return ("Project not selected",) + render_current_page(session)
+        store = AnnotationStore(db_path)
+        session.set_audio_file_list(store)
+        session.set_root_dir_audio_files(store.get_property("root_dir", os.path.dirname(db_path)))
+        return on_audio_files_loaded(session)
     else:
         root.destroy()
-        return "Please select an upload option", pd.DataFrame()
+        return ("Please select an upload option",) + render_current_page(session)
 
-def on_browse_sample_audio_folder():
+def on_browse_sample_audio_folder(session):
+    from tkinter import Tk, filedialog
 
     root = Tk()
     root.attributes("-topmost", True)
@@ -64,7 +162,7 @@ def on_browse_sample_audio_folder():
 
     folder = filedialog.askdirectory()
     if folder:
-        Globals.set_sample_audio_dir(os.path.normpath(folder))
+        session.set_sample_audio_dir(os.path.normpath(folder))
         # print("New sample audio folder selected:", sample_audio_dir)
         root.destroy()
     else:
@@ -73,186 +171,178 @@ def on_browse_sample_audio_folder():
 
 # Buttons
 
-def on_species_button_clicked(audio_table, selected_row_index, comment):
+def validate_and_advance(session, selected_row_index, comment, validation_value, suggested_specie=None):
     """
-    Handle the event when the species button is clicked.
+    Store the validation of the selected row and move to the next one.
 
     Parameters:
-    - audio_table (pandas.DataFrame): The audio table.
-    - selected_row_index (int): The index of the selected row.
+    - session (Session): The state of the browser session.
+    - selected_row_index (int): The index of the selected row in the full audio table.
+    - comment (str): The comment for the selected row.
+    - validation_value (int): The validation value to store.
+    - suggested_specie (str): The suggested species for the selected row.
 
     Returns:
-    - tuple: Updated audio table, new selected row index, audio, image, current species name, current sample audio file, sample image, current species name.
+    - tuple: Page of the audio table, new selected row index, audio, image, current species name, current sample audio file, sample image, date, time, page description.
     """
+    audio_table = session.get_audio_file_list()
+    selected_row_index = int(selected_row_index)
+
     add_comment(comment)
-    audio_table.at[selected_row_index, "Comment"] = comment if comment else pd.NA
+    set_row_values(audio_table, selected_row_index, {"Comment": comment if comment else pd.NA})
 
-    audio_table = update_validation(audio_table, selected_row_index, 1)  # Update to 1 for 'Specie'
+    update_validation(session, audio_table, selected_row_index, validation_value, suggested_specie)
 
     selected_row_index += 1
 
     # Check if the selected_row_index is within the range of the audio_table
-    if selected_row_index < len(audio_table.data):
-        next_audio = load_next_audio_file()
-        audio, image = update_audio_and_image(next_audio)
+    if selected_row_index < len(audio_table):
+        next_audio = load_next_audio_file(session)
+        audio, image = session.prefetcher.fetch(next_audio)
 
-        audio_files = Globals.get_audio_file_list()
-        new_specie_name = audio_files["Specie"][selected_row_index]
+        new_specie_name = get_row_value(audio_table, selected_row_index, "Specie")
 
-        if new_specie_name != Globals.get_current_specie_name():
-            Globals.set_current_specie_name(new_specie_name)
-            
-        sample_audio, sample_image = get_sample_audio_and_image()
+        if new_specie_name != session.get_current_specie_name():
+            session.set_current_specie_name(new_specie_name)
 
-        Globals.set_current_sample_audio_file(sample_audio)
+        sample_audio, sample_image = get_sample_audio_and_image(session)
 
-        audio_path = audio_files["Path"][selected_row_index]
-        time = extract_time_from_filename(audio_path)
-        date = extract_date_from_filename(audio_path)
+        session.set_current_sample_audio_file(sample_audio)
 
-        return audio_table, selected_row_index, audio, image, Globals.get_current_specie_name(), Globals.get_current_sample_audio_file(), sample_image, Globals.get_current_specie_name(), date, time
-    else:
-        # If it's the last row, stop the audio and return the current state
-        return audio_table, selected_row_index, None, None, Globals.get_current_specie_name(), None, None, Globals.get_current_specie_name(), None, None
-
-def on_unknown_button_clicked(audio_table, selected_row_index, comment):
-
-    add_comment(comment)
-    audio_table.at[selected_row_index, "Comment"] = comment if comment else pd.NA
-
-    audio_table = update_validation(audio_table, selected_row_index, -2)  # Update to -2 for 'Unknown'
-    selected_row_index += 1
-    next_audio = load_next_audio_file()
-    audio, image = update_audio_and_image(next_audio)
+        date, time = get_recording_date_and_time(audio_table, selected_row_index)
 
-    audio_files = Globals.get_audio_file_list()
-    new_specie_name = audio_files["Specie"][selected_row_index]
-
-    if new_specie_name != Globals.get_current_specie_name():
-        Globals.set_current_specie_name(new_specie_name)
-        
-    sample_audio, sample_image = get_sample_audio_and_image()
-
-    Globals.set_current_sample_audio_file(sample_audio)
-
-    return audio_table, selected_row_index, audio, image, Globals.get_current_specie_name(), Globals.get_current_sample_audio_file(), sample_image, Globals.get_current_specie_name()
-
-def on_bird_button_clicked(audio_table, selected_row_index, comment):
-
-    add_comment(comment)
-    audio_table.at[selected_row_index, "Comment"] = comment if comment else pd.NA
+        # The table view follows the current row
+        session.set_current_page(get_page_of_row(selected_row_index))
+        page, page_text = render_current_page(session)
 
-    audio_table = update_validation(audio_table, selected_row_index, 2, "Bird")  # Update to 1 for 'Bird'
-    selected_row_index += 1
-    next_audio = load_next_audio_file()
-    audio, image = update_audio_and_image(next_audio)
-
-    audio_files = Globals.get_audio_file_list()
-    new_specie_name = audio_files["Specie"][selected_row_index]
-
-    if new_specie_name != Globals.get_current_specie_name():
-        Globals.set_current_specie_name(new_specie_name)
-        
-    sample_audio, sample_image = get_sample_audio_and_image()
-
-    Globals.set_current_sample_audio_file(sample_audio)
-
-    return audio_table, selected_row_index, audio, image, Globals.get_current_specie_name(), Globals.get_current_sample_audio_file(), sample_image, Globals.get_current_specie_name()
-
-def on_other_button_clicked(audio_table, selected_row_index, comment):    
-    
-    add_comment(comment)
-    audio_table.at[selected_row_index, "Comment"] = comment if comment else pd.NA
-
-    audio_table = update_validation(audio_table, selected_row_index, -1)  # Update to 0 for 'Other'
-    selected_row_index += 1
-    next_audio = load_next_audio_file()
-    audio, image = update_audio_and_image(next_audio)
-
-    audio_files = Globals.get_audio_file_list()
-    new_specie_name = audio_files["Specie"][selected_row_index]
+        return page, selected_row_index, audio, image, session.get_current_specie_name(), session.get_current_sample_audio_file(), sample_image, date, time, page_text
+    else:
+        # If it's the last row, stop the audio and return the current state
+        page, page_text = render_current_page(session)
+        return page, selected_row_index, None, None, session.get_current_specie_name(), None, None, None, None, page_text
 
-    if new_specie_name != Globals.get_current_specie_name():
-        Globals.set_current_specie_name(new_specie_name)
-        
-    sample_audio, sample_image = get_sample_audio_and_image()
+@timed_handler
+def on_species_button_clicked(session, selected_row_index, comment):
+    return validate_and_advance(session, selected_row_index, comment, 1)  # Update to 1 for 'Specie'
 
-    Globals.set_current_sample_audio_file(sample_audio)
+@timed_handler
+def on_unknown_button_clicked(session, selected_row_index, comment):
+    return validate_and_advance(session, selected_row_index, comment, -2)  # Update to -2 for 'Unknown'
 
-    return audio_table, selected_row_index, audio, image, Globals.get_current_specie_name(), Globals.get_current_sample_audio_file(), sample_image, Globals.get_current_specie_name()
+@timed_handler
+def on_bird_button_clicked(session, selected_row_index, comment):
+    return validate_and_advance(session, selected_row_index, comment, 2, "Bird")  # Update to 2 for 'Bird'
 
-def on_suggested_specie_button_clicked(audio_table, selected_row_index, suggested_specie_text, comment):
-    
-    # Add comment if it doesnt exist
-    add_comment(comment)
+@timed_handler
+def on_other_button_clicked(session, selected_row_index, comment):
+    return validate_and_advance(session, selected_row_index, comment, -1)  # Update to -1 for 'Other'
 
-    audio_table.at[selected_row_index, "Comment"] = comment if comment else pd.NA
-    
+@timed_handler
+def on_suggested_specie_button_clicked(session, selected_row_index, suggested_specie_text, comment):
     species = suggested_specie_text.strip() if suggested_specie_text else None
     # print(f"Suggested species: {species}")
     if species:
         add_suggested_species(species)
-        # Update the audio table with the suggested species
+        species_index.add(species)
 
-    audio_table = update_validation(audio_table, selected_row_index, 0, species)  # Update to 0 for 'Other'
-    selected_row_index += 1
-    next_audio = load_next_audio_file()
-    audio, image = update_audio_and_image(next_audio)
+    outputs = validate_and_advance(session, selected_row_index, comment, 0, species)  # Update to 0 for 'Suggested Specie'
 
-    audio_files = Globals.get_audio_file_list()
-    new_specie_name = audio_files["Specie"][selected_row_index]
+    # Refresh the suggestions and preselect the species of the next row
+    suggested_species_update = gr.update(choices=get_suggested_species(), value=session.get_current_specie_name())
+    return (outputs[0], suggested_species_update) + tuple(outputs[1:])
 
-    if new_specie_name != Globals.get_current_specie_name():
-        Globals.set_current_specie_name(new_specie_name)
-        
-    sample_audio, sample_image = get_sample_audio_and_image()
+@timed_handler
+def on_species_typed(key_up_data: gr.KeyUpData):
+    # Only the best matches of the typed text are sent to the dropdown
+    query = key_up_data.input_value
+    return gr.update(choices=label_with_query(species_index.search(query), query))
 
-    Globals.set_current_sample_audio_file(sample_audio)
+@timed_handler
+def on_go_to_row(session, row_number):
+    # Row numbers start at 1, as in the Idx column
+    if not len(session.get_audio_file_list()) or row_number is None:
+        return None, None, "Specie", -1, None, None, None, None, None, None, None, "No audio files loaded"
+    return select_row(session, int(row_number) - 1)
 
-    return audio_table, gr.update(choices=get_suggested_species()), selected_row_index, audio, image, Globals.get_current_specie_name(), Globals.get_current_sample_audio_file(), sample_image, Globals.get_current_specie_name()
+@timed_handler
+def on_save_table_clicked(session, changed_only):
+    """
+    Start saving the table in the background and turn on the timer that reports its progress.
+    """
+    if session.export_job is not None and not session.export_job.done():
+        return "A save is already running", gr.Timer(active=True)
+    job, msg = save_table(session.get_audio_file_list(), changed_only, session.export_snapshot)
+    if job is None:
+        return msg, gr.Timer(active=False)
+    session.export_job = job
+    return msg, gr.Timer(active=True)
+
+@timed_handler
+def on_save_progress(session):
+    job = session.export_job
+    if job is None:
+        return "No Validation Saved or Loaded", gr.Timer(active=False)
+    if not job.done():
+        return job.get_status(), gr.Timer(active=True)
+    if job.error is None and job.snapshot is not None:
+        # The next incremental save only holds the rows changed after this one
+        session.export_snapshot, job.snapshot = job.snapshot, None
+    return job.get_status(), gr.Timer(active=False)
+
+@timed_handler
+def on_load_csv_clicked(session):
+    # The merged rows go to the journal too, a crash after the merge keeps them
+    audio_table, msg = update_table_with_validation(session.get_audio_file_list(), session.journal)
+    if not audio_table.empty:
+        session.set_audio_file_list(audio_table)
+        session.row_style_cache.invalidate()
+    page, page_text = render_current_page(session)
+    return page, msg, page_text
 
 # Use a gr.Dataframe or gr.Dynamic for audio file selection
 audio_file_table = gr.Dataframe()
 
 # Function to get the list of sample files
-def get_sample_files():
+def get_sample_files(session):
     # return sorted if audio fie .WAV, .wav, .MP3, .mp3
-    specie_audio_dir = Globals.get_sample_audio_dir() + os.sep + Globals.get_current_specie_name()
+    specie_audio_dir = session.get_sample_audio_dir() + os.sep + session.get_current_specie_name()
     sample_audio_files = list_audio_files_from_folder(specie_audio_dir)
     return sample_audio_files
 
-def load_next_audio_file():
-    audio_files = Globals.get_audio_file_list()
-    next_index = (Globals.get_current_row_index() + 1) % len(audio_files)
-    Globals.set_current_row_index(next_index)
-    current_audio_file = audio_files["Path"][next_index]
+def load_next_audio_file(session):
+    audio_files = session.get_audio_file_list()
+    next_index = (session.get_current_row_index() + 1) % len(audio_files)
+    session.set_current_row_index(next_index)
+    current_audio_file = get_row_value(audio_files, next_index, "Path")
+    session.prefetcher.update()  # Start rendering the rows after the new one
     return current_audio_file
 
-def load_prev_audio_file():
-    audio_files = Globals.get_audio_file_list()
-    prev_index = (Globals.get_current_row_index() - 1) % len(audio_files)
+def load_prev_audio_file(session):
+    audio_files = session.get_audio_file_list()
+    prev_index = (session.get_current_row_index() - 1) % len(audio_files)
     # get current audio file
-    Globals.set_current_row_index(prev_index)
-    current_audio_file = audio_files["Path"][prev_index]
+    session.set_current_row_index(prev_index)
+    current_audio_file = get_row_value(audio_files, prev_index, "Path")
+    session.prefetcher.update()
     return current_audio_file
 
 # Function to load the next sample
-def load_next_sample():
+def load_next_sample(session):
 
-    sample_files = get_sample_files()
+    sample_files = get_sample_files(session)
 
-    current_index = sample_files.index(Globals.get_current_sample_audio_file())
+    current_index = sample_files.index(session.get_current_sample_audio_file())
     next_index = (current_index + 1) % len(sample_files)
-    Globals.set_current_sample_audio_file(sample_files[next_index])
-    return Globals.get_current_sample_audio_file()
+    session.set_current_sample_audio_file(sample_files[next_index])
+    return session.get_current_sample_audio_file()
 
 # Function to load the previous sample
-def load_prev_sample():
-    sample_files = get_sample_files()
-    current_index = sample_files.index(Globals.get_current_sample_audio_file())
+def load_prev_sample(session):
+    sample_files = get_sample_files(session)
+    current_index = sample_files.index(session.get_current_sample_audio_file())
     prev_index = (current_index - 1) % len(sample_files)
-    Globals.set_current_sample_audio_file(sample_files[prev_index])
-    return Globals.get_current_sample_audio_file()
+    session.set_current_sample_audio_file(sample_files[prev_index])
+    return session.get_current_sample_audio_file()
 
 def main():
     """
@@ -264,8 +354,13 @@ def main():
         gr.Blocks: The main UI component.
     """
     
+    # The releases API is asked in the background, the UI does not wait for it
+    start_update_check()
     initialize_suggested_species_file()
     initialize_comments_file()
+    load_species(species_index, get_suggested_species())
+    start_metrics_export()
+    start_profiler()
 
     # Get comments from the initialized file
     comments = get_comments()
@@ -275,24 +370,42 @@ def main():
     sample_audio = gr.Audio(label="Sample Audio per specie", type="filepath")
     sample_image = gr.Image("Sample Mel Spectrogram")
     audio_file_table = gr.Dataframe(headers=["Idx", "File", "Specie", "Suggested Specie"], type="pandas", interactive=False)
+    page_text = gr.Markdown("No audio files loaded")
     comment_box = gr.Dropdown(value="No comments", choices=comments, label="Comments", interactive=True, allow_custom_value=True, filterable=True)
 
+    # Time how long the table and the images take to be serialized for the browser
+    time_postprocess(audio_file_table, "serialize_table")
+    time_postprocess(sample_image, "encode_image")
+
     with gr.Blocks() as demo:
+        # A new Session is created for every browser session
+        session_state = gr.State(Session)
         selected_row_index = gr.Number(visible=False)
         with gr.Tab("Load Audios"):
             gr.Markdown("## Load Audio Files")
-            data_type = gr.Radio(choices=["Files", "Folder"], value="Folder", label="Upload Audio Files")
+            data_type = gr.Radio(choices=["Files", "Folder", "BirdNET Table", "Project"], value="Folder", label="Upload Audio Files")
             input_path = gr.Textbox(label="Path of audios", scale=3, interactive=False)
+            rescan = gr.Checkbox(label="Rescan folder", value=False, info="List the folder again instead of using the folder index")
             browse_btn = gr.Button("Browse", min_width=1)
-            browse_btn.click(on_browse, inputs=data_type, outputs=[input_path, audio_file_table])
+            browse_btn.click(on_browse, inputs=[session_state, data_type, rescan], outputs=[input_path, audio_file_table, page_text])
         with gr.Tab("Validate BirdNET predictions"):
             with gr.Row():
                 with gr.Column():
                     gr.Markdown("## Audio Files")
                     audio_file_table.render()
-                    save_table_btn = gr.Button("Save Table", variant="primary")
+                    with gr.Row():
+                        prev_page_btn = gr.Button("← Previous page", size="sm")
+                        page_text.render()
+                        next_page_btn = gr.Button("Next page →", size="sm")
+                    with gr.Row():
+                        go_to_row_number = gr.Number(label="Go to row", precision=0, minimum=1)
+                        go_to_row_btn = gr.Button("Go", size="sm")
+                    with gr.Row():
+                        save_table_btn = gr.Button("Save Table", variant="primary")
+                        save_changed_only = gr.Checkbox(label="Only rows changed since the last save", value=False)
                     load_csv_btn = gr.Button("Load CSV and Copy Validation", variant="primary")
                     csv_status = gr.Label(value="No Validation Saved or Loaded")  # To display the status of the save operation
+                    save_progress_timer = gr.Timer(EXPORT_POLL_INTERVAL_S, active=False)  # Only ticks while a save is running
 
                 with gr.Column():
                     gr.Markdown("## Validation")
@@ -303,7 +416,7 @@ def main():
 
                     # Define audio_input and mel_spectrogram_output before using them in audio_file_table.select
                     audio_input = gr.Audio(label="Audio", type="filepath", autoplay=True, loop=True)
-                    mel_spectrogram_output = gr.Image(label="Mel Spectrogram")
+                    mel_spectrogram_output = time_postprocess(gr.Image(label="Mel Spectrogram"), "encode_image")
 
                     # Specie Validation Buttons
                     with gr.Row():
@@ -318,17 +431,24 @@ def main():
                         suggested_species = get_suggested_species()
                         suggestedSpecie_text = gr.Dropdown(choices=suggested_species, label="Suggested Specie", interactive=True, allow_custom_value=True, filterable=True)
                         suggestedSpecie_button = gr.Button("Suggested Specie", variant="primary", size="sm")
+                        suggestedSpecie_text.key_up(on_species_typed, inputs=[], outputs=suggestedSpecie_text, queue=False, show_progress="hidden", trigger_mode="always_last")
                         
-                    audio_file_table.select(fn=on_audio_selected, inputs=[audio_file_table], outputs=[mel_spectrogram_output, audio_input, species_button, selected_row_index, sample_audio, sample_image, suggestedSpecie_text, audio_file_table, date_text, time_text, comment_box])
-                    
-                    species_button.click(on_species_button_clicked, inputs=[audio_file_table, selected_row_index, comment_box], outputs=[audio_file_table, selected_row_index, audio_input, mel_spectrogram_output, species_button, sample_audio, sample_image])
-                    unknown_button.click(on_unknown_button_clicked, inputs=[audio_file_table, selected_row_index, comment_box], outputs=[audio_file_table, selected_row_index, audio_input, mel_spectrogram_output, species_button, sample_audio, sample_image])
-                    other_button.click(on_other_button_clicked, inputs=[audio_file_table, selected_row_index, comment_box], outputs=[audio_file_table, selected_row_index, audio_input, mel_spectrogram_output, species_button, sample_audio, sample_image])
-                    bird_button.click(on_bird_button_clicked, inputs=[audio_file_table, selected_row_index, comment_box], outputs=[audio_file_table, selected_row_index, audio_input, mel_spectrogram_output, species_button, sample_audio, sample_image])
-                    suggestedSpecie_button.click(on_suggested_specie_button_clicked, inputs=[audio_file_table, selected_row_index, suggestedSpecie_text, comment_box], outputs=[audio_file_table, suggestedSpecie_text, selected_row_index, audio_input, mel_spectrogram_output, species_button, sample_audio, sample_image, suggestedSpecie_text])
-                    
-                    save_table_btn.click(fn=save_table_to_csv, inputs=audio_file_table, outputs=csv_status)
-                    load_csv_btn.click(fn=update_table_with_validation, inputs=audio_file_table, outputs=[audio_file_table, csv_status])
+                    selection_outputs = [mel_spectrogram_output, audio_input, species_button, selected_row_index, sample_audio, sample_image, suggestedSpecie_text, audio_file_table, date_text, time_text, comment_box, page_text]
+                    audio_file_table.select(fn=on_audio_selected, inputs=[session_state], outputs=selection_outputs)
+                    go_to_row_btn.click(on_go_to_row, inputs=[session_state, go_to_row_number], outputs=selection_outputs)
+                    prev_page_btn.click(lambda session: on_page_changed(session, -1), inputs=[session_state], outputs=[audio_file_table, page_text])
+                    next_page_btn.click(lambda session: on_page_changed(session, 1), inputs=[session_state], outputs=[audio_file_table, page_text])
+
+                    validation_outputs = [audio_file_table, selected_row_index, audio_input, mel_spectrogram_output, species_button, sample_audio, sample_image, date_text, time_text, page_text]
+                    species_button.click(on_species_button_clicked, inputs=[session_state, selected_row_index, comment_box], outputs=validation_outputs)
+                    unknown_button.click(on_unknown_button_clicked, inputs=[session_state, selected_row_index, comment_box], outputs=validation_outputs)
+                    other_button.click(on_other_button_clicked, inputs=[session_state, selected_row_index, comment_box], outputs=validation_outputs)
+                    bird_button.click(on_bird_button_clicked, inputs=[session_state, selected_row_index, comment_box], outputs=validation_outputs)
+                    suggestedSpecie_button.click(on_suggested_specie_button_clicked, inputs=[session_state, selected_row_index, suggestedSpecie_text, comment_box], outputs=[audio_file_table, suggestedSpecie_text] + validation_outputs[1:])
+
+                    save_table_btn.click(fn=on_save_table_clicked, inputs=[session_state, save_changed_only], outputs=[csv_status, save_progress_timer])
+                    save_progress_timer.tick(fn=on_save_progress, inputs=[session_state], outputs=[csv_status, save_progress_timer], show_progress="hidden")
+                    load_csv_btn.click(fn=on_load_csv_clicked, inputs=[session_state], outputs=[audio_file_table, csv_status, page_text])
 
                 with gr.Column():
                     gr.Markdown("## Sample Audio & Spectrogram")
@@ -339,18 +459,18 @@ def main():
                         next_button = gr.Button("→", variant="secondary")
                     
                     prev_button.click(
-                        fn=lambda: update_audio_and_image(load_prev_sample()), 
-                        inputs=[], 
+                        fn=lambda session: load_sample_audio_and_image(load_prev_sample(session)),
+                        inputs=[session_state],
                         outputs=[sample_audio, sample_image]
                     )
                     next_button.click(
-                        fn=lambda: update_audio_and_image(load_next_sample()), 
-                        inputs=[], 
+                        fn=lambda session: load_sample_audio_and_image(load_next_sample(session)),
+                        inputs=[session_state],
                         outputs=[sample_audio, sample_image]
                     )
                     # Add folder selection button
                     browse_samplefolder_btn = gr.Button("Select Sample Audio Folder", min_width=1)
-                    browse_samplefolder_btn.click(on_browse_sample_audio_folder, inputs=[], outputs=[])
+                    browse_samplefolder_btn.click(on_browse_sample_audio_folder, inputs=[session_state], outputs=[])
 
                     # Add observations box to write
                     # gr.Textbox(label="Observations", type="text", placeholder="Write your observations here...", scale=3)
@@ -361,7 +481,7 @@ def main():
 
         with gr.Row():
             # Build and display the footer
-            build_footer()
+            footer = build_footer()
 
             # GitHub Issues Link
             gr.Markdown("""
@@ -373,8 +493,16 @@ def main():
                 </div>
                 """)
 
+        # Shows the result of the update check once a page is loaded
+        demo.load(refresh_footer, outputs=[footer], show_progress="hidden")
+
+    # Events of all the sessions share the queue, heavy rendering goes to the render processes
+    demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
     return demo
 
-demo = main()
-# launch in port 7864
-demo.launch(inbrowser=True, inline=True, show_api=False, server_port=7864)
\ No newline at end of file
+if __name__ == "__main__":
+    # The render worker processes import this module, they must not start the app
+    multiprocessing.freeze_support()
+    demo = main()
+    # launch in port 7864
+    demo.launch(inbrowser=True, inline=True, show_api=False, server_port=7864)
\ No newline at end of file
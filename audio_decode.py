@@ -0,0 +1,250 @@
+# audio_decode.py
+#
+# Decoding of the audio files into mono float32 samples, with one backend per
+# file extension (register_decoder adds or replaces one):
+#   - WAV, FLAC, OGG: read with soundfile. PCM WAVs larger than DECODE_MEMMAP_MIN_MB
+#     are memory-mapped, so only the pages of the samples read are loaded.
+#   - MP3: decoded once and stored as PCM in DECODE_CACHE_DIR (16-bit WAV, or 24-bit
+#     FLAC with DECODE_CACHE_FORMAT = "FLAC"), the next reads go to the stored copy.
+#     The store is kept under DECODE_CACHE_MAX_MB by removing the least recently used files.
+# Formats soundfile cannot read go through librosa (audioread).
+
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+import soundfile as sf
+
+from config import DECODE_MEMMAP_MIN_MB, DECODE_CACHE_DIR, DECODE_CACHE_FORMAT, DECODE_CACHE_MAX_MB
+
+# numpy dtype and full scale of the PCM WAV subtypes that can be memory-mapped
+_MEMMAP_SUBTYPES = {
+    "PCM_16": ("<i2", 32768.0),
+    "PCM_32": ("<i4", 2147483648.0),
+    "FLOAT": ("<f4", 1.0),
+    "DOUBLE": ("<f8", 1.0),
+}
+
+
+def to_mono(y):
+    # Frames x channels to mono float32
+    if y.ndim == 1:
+        return y.astype(np.float32, copy=False)
+    if y.shape[1] == 1:
+        return y[:, 0].astype(np.float32, copy=False)
+    return y.mean(axis=1, dtype=np.float32)
+
+
+def find_wav_data_chunk(path):
+    """
+    Return the byte offset and size of the samples of a RIFF WAV file, or None.
+    """
+    with open(path, "rb") as file:
+        header = file.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        while True:
+            chunk_header = file.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+            if chunk_id == b"data":
+                return file.tell(), chunk_size
+            file.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)  # Chunks are padded to an even size
+
+
+def read_memmap_wav(path, start=0, frames=-1):
+    """
+    Read a PCM WAV through a memory map of its samples, or return None if the
+    file cannot be mapped (compressed, big-endian or unusual sample formats).
+
+    Returns:
+    tuple: The mono float32 samples and the sample rate, or None.
+    """
+    info = sf.info(path)
+    subtype = _MEMMAP_SUBTYPES.get(info.subtype)
+    if info.format != "WAV" or subtype is None or info.endian not in ("FILE", "LITTLE"):
+        return None
+    data_chunk = find_wav_data_chunk(path)
+    if data_chunk is None:
+        return None
+    offset, size = data_chunk
+    dtype, full_scale = subtype
+    total_frames = min(size, os.path.getsize(path) - offset) // (np.dtype(dtype).itemsize * info.channels)
+    if total_frames == 0:
+        return np.zeros(0, dtype=np.float32), info.samplerate
+    samples = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(total_frames, info.channels))
+    end = total_frames if frames < 0 else min(start + frames, total_frames)
+    # Only the pages of the window are read. Mono float32 files stay a read-only view of the map
+    y = np.asarray(to_mono(samples[start:end]))
+    if full_scale != 1.0:
+        y *= np.float32(1.0 / full_scale)  # A new array, converted from the integer samples
+    return y, info.samplerate
+
+
+def read_soundfile(path, start=0, frames=-1):
+    """
+    Read an audio file with soundfile, memory-mapping large PCM WAVs.
+
+    Returns:
+    tuple: The mono float32 samples and the sample rate.
+    """
+    if os.path.getsize(path) >= DECODE_MEMMAP_MIN_MB * 1024 * 1024:
+        result = read_memmap_wav(path, start, frames)
+        if result is not None:
+            return result
+    with sf.SoundFile(path) as audio:
+        if start:
+            audio.seek(start)
+        y = audio.read(frames, dtype="float32", always_2d=True)
+        return to_mono(y), audio.samplerate
+
+
+def read_with_librosa(path, start=0, frames=-1):
+    import librosa  # audioread fallback, only for formats soundfile cannot read
+    sr = librosa.get_samplerate(path)
+    offset = start / sr
+    duration = None if frames < 0 else frames / sr
+    y, sr = librosa.load(path, sr=None, offset=offset, duration=duration)
+    return y.astype(np.float32, copy=False), sr
+
+
+class TranscodeCache:
+    """
+    PCM copies of the files of slow-to-decode formats, keyed by path, size and
+    modification time, so a changed file is decoded again.
+    """
+
+    def __init__(self, cache_dir=DECODE_CACHE_DIR, file_format=DECODE_CACHE_FORMAT, max_mb=DECODE_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.file_format = file_format
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.transcoded = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Computed on the first write
+
+    def get_path(self, path):
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.{self.file_format.lower()}")
+
+    def get_transcoded(self, path, decode):
+        """
+        Return the path of the PCM copy of a file, decoding it with decode(path)
+        and writing the copy first if it is not stored yet.
+        """
+        cached_path = self.get_path(path)
+        if os.path.exists(cached_path):
+            try:
+                os.utime(cached_path)  # Mark as recently used
+            except OSError:
+                pass
+            return cached_path
+        y, sr = decode(path)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                # 16-bit WAVs can be memory-mapped, FLAC has no float samples and gets 24 bits
+                subtype = "PCM_24" if self.file_format == "FLAC" else "PCM_16"
+                sf.write(file, y, sr, format=self.file_format, subtype=subtype)
+            os.replace(tmp_path, cached_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.transcoded += 1
+        self._add_bytes(cached_path, os.path.getsize(cached_path))
+        return cached_path
+
+    def _add_bytes(self, new_path, size):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry[1] for entry in self._list_entries())
+            else:
+                self._total_bytes += size
+            if self._total_bytes <= self.max_bytes:
+                return
+            for path, entry_size in self._list_entries():  # Oldest first
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if path == new_path:
+                    continue  # Still about to be read
+                try:
+                    os.remove(path)
+                    self._total_bytes -= entry_size
+                except OSError:
+                    pass
+
+    def _list_entries(self):
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith(".tmp"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(entries)]
+
+
+transcode_cache = TranscodeCache()
+
+
+def _decode_mp3(path):
+    try:
+        return read_soundfile(path)
+    except sf.LibsndfileError:
+        return read_with_librosa(path)  # libsndfile older than 1.1 has no MP3 support
+
+
+def get_seekable_path(path):
+    """
+    Path of a file that soundfile can seek in: the file itself, or the stored
+    PCM copy of an MP3.
+    """
+    if os.path.splitext(path)[1].lower() == ".mp3":
+        return transcode_cache.get_transcoded(path, _decode_mp3)
+    return path
+
+
+def read_transcoded(path, start=0, frames=-1):
+    return read_soundfile(get_seekable_path(path), start, frames)
+
+
+# Extension -> function(path, start, frames) returning (mono float32 samples, sample rate)
+DECODERS = {
+    ".wav": read_soundfile,
+    ".flac": read_soundfile,
+    ".ogg": read_soundfile,
+    ".mp3": read_transcoded,
+}
+
+
+def register_decoder(extension, decoder):
+    """
+    Use decoder(path, start, frames) for the files with the given extension.
+    """
+    DECODERS[extension.lower()] = decoder
+
+
+def decode_audio(path, start=0, frames=-1):
+    """
+    Decode an audio file, or a window of it, to mono float32 samples.
+
+    Parameters:
+    path (str): The audio file.
+    start (int): First frame to read.
+    frames (int): Number of frames to read, -1 to read to the end.
+
+    Returns:
+    tuple: The mono float32 samples and the sample rate.
+    """
+    decoder = DECODERS.get(os.path.splitext(path)[1].lower(), read_soundfile)
+    try:
+        return decoder(path, start, frames)
+    except sf.LibsndfileError:
+        return read_with_librosa(path, start, frames)
@@ -1,65 +1,273 @@
 # audio_processing.py
 
 import numpy as np
+import pandas as pd
 
-# Audio processing
+# Audio processing (librosa loads its submodules on first use)
 import librosa
-import librosa.display
 
-# Image processing
-import matplotlib.pyplot as plt
+# Image processing, matplotlib is only imported by the matplotlib renderer
 from PIL import Image
 
 # File handling
 import os
 from io import BytesIO
-from pathlib import Path
+from collections import namedtuple
 
 # Caching
 from functools import lru_cache
 
-import gradio as gr
+# pyplot keeps global state, renders from the prefetch threads must not overlap
+import threading
+_pyplot_lock = threading.Lock()
+
+# Rendering
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_decode import decode_audio
+from config import SPECTROGRAM_RENDER_PARAMS, RENDER_WORKERS
+from folder_index import folder_index, scan_audio_files
+from memory_cache import memory_cached
+from metrics import registry as metrics_registry, stage
+from render_params import get_render_params, get_render_params_id
+from segments import parse_segment_path, read_segment
+from spectrogram_cache import SpectrogramCache
+from table_view import get_row
+
+spectrogram_cache = SpectrogramCache()
+
+# Processes shared by all the sessions to render spectrograms, started on first use
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def get_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # "spawn" because the server process runs many threads, which fork does not copy safely
+            _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _render_pool
+
+def render_spectrogram_image(file_path, params=SPECTROGRAM_RENDER_PARAMS):
+    """
+    Render the spectrogram of an audio file in the render processes, so that
+    the renders of several sessions use all the CPU cores.
+    """
+    if not RENDER_WORKERS:
+        return audio_to_mel_spectrogram(file_path, params)
+    with stage("render_pool"):
+        # The parameters are sent along, the render processes do not know the projects
+        image, stage_samples = get_render_pool().submit(_render_in_process, file_path, params).result()
+    # The stages timed in the render process are added to the metrics of the app
+    metrics_registry.merge(stage_samples)
+    return image
+
+def _render_in_process(file_path, params):
+    image = audio_to_mel_spectrogram(file_path, params)
+    return image, metrics_registry.drain()
 
 #                       Cache functions
 # ============================================================
-@lru_cache(maxsize=128)
-def load_audio_files_from_folder(folder_path):
-    return list_audio_files_from_folder(folder_path)
+def load_audio_files_from_folder(folder_path, refresh=False):
+    # Only the directories that changed since the last scan are listed again
+    return folder_index.list_audio_files(folder_path, refresh=refresh)
 
-@lru_cache(maxsize=128)
+# The in-memory caches are limited in bytes, see MEMORY_CACHE_MB
+@memory_cached("audio")
 def load_audio(file_path):
+    # Segments of long recordings are decoded and played from memory
+    if parse_segment_path(file_path):
+        y, sr = read_segment(file_path)
+        return sr, y
     return file_path
 
-@lru_cache(maxsize=128)
+def _spectrogram_key(file_path):
+    # The render parameters of the project are part of the key, as in the persistent cache
+    return file_path, get_render_params_id(get_render_params(file_path))
+
+@memory_cached("spectrograms", key=_spectrogram_key)
 def get_mel_spectrogram(file_path):
-    audio_data = load_audio(file_path)
-    mel_spectrogram = audio_to_mel_spectrogram(audio_data)
+    # Look in the persistent cache before rendering the spectrogram
+    params = get_render_params(file_path)
+    cache_key = spectrogram_cache.make_key(file_path, params)
+    with stage("cache_get"):
+        mel_spectrogram = spectrogram_cache.get(cache_key)
+    if mel_spectrogram is None:
+        mel_spectrogram = render_spectrogram_image(file_path, params)
+        with stage("cache_put"):
+            spectrogram_cache.put(cache_key, mel_spectrogram)
     return mel_spectrogram
 
-def audio_to_mel_spectrogram(audio_clip):
+def load_waveform(audio_clip, sr=None):
+    """
+    Load the samples of an audio clip, or of a segment of a long recording.
+
+    Returns:
+    tuple: The mono samples and the sample rate.
+    """
+    if parse_segment_path(audio_clip):
+        y, native_sr = read_segment(audio_clip)
+    else:
+        # Native soundfile reads, memory maps for large WAVs and the stored copies of the MP3s
+        y, native_sr = decode_audio(audio_clip)
+    if sr is not None and sr != native_sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr)
+        return y, sr
+    return y, native_sr
+
+def audio_to_mel_spectrogram(audio_clip, params=SPECTROGRAM_RENDER_PARAMS):
     """
     Convert an audio clip to a mel spectrogram image.
 
     Parameters:
-    audio_clip (str): The path to the audio clip file.
+    audio_clip (str): The path to the audio clip file, or a segment path.
+    params (dict): The render parameters, see SPECTROGRAM_RENDER_PARAMS.
 
     Returns:
     PIL.Image.Image: The mel spectrogram image.
     """
-    y, sr = librosa.load(audio_clip, sr=None)
-    fmin = 1
-    fmax = 32000
-    fig, ax = plt.subplots(figsize=(12, 6))
-    D = librosa.amplitude_to_db(librosa.stft(y), ref=np.max)
-    librosa.display.specshow(D, sr=sr, x_axis="time", y_axis="log", fmin=fmin, fmax=fmax, ax=ax)
-    ax.axis('off')
+    D, layout = compute_spectrogram_db(audio_clip, params)
+    with stage("render"):
+        if params["renderer"] == "matplotlib":
+            return render_spectrogram_matplotlib(D, layout, params)
+        return render_spectrogram(D, layout, params)
+
+# STFT settings chosen for a clip, and the frequency bins kept: D row i is bin first_bin + i
+StftLayout = namedtuple("StftLayout", ["sr", "n_fft", "hop_length", "first_bin"])
+
+def get_stft_layout(sr, n_samples, params=SPECTROGRAM_RENDER_PARAMS):
+    """
+    Choose the STFT size and hop for a clip, and the bins of the displayed band.
+
+    With n_fft "auto" the window lasts about window_s at any sample rate, and with
+    hop_length "auto" there are about as many frames as image columns: no fewer
+    hops than librosa's default (n_fft / 4), and no gaps between the windows.
+
+    Returns:
+    tuple: The StftLayout and the index of the last bin kept.
+    """
+    n_fft = params["n_fft"]
+    if n_fft == "auto":
+        n_fft = int(2 ** round(np.log2(sr * params["window_s"])))
+    hop_length = params["hop_length"]
+    if hop_length == "auto":
+        hop_length = int(np.clip(n_samples // params["width"], n_fft // 4, n_fft))
+    nyquist_bin = n_fft // 2
+    first_bin = int(np.clip(np.floor(params["fmin"] * n_fft / sr), 0, nyquist_bin))
+    last_bin = int(np.clip(np.ceil(params["fmax"] * n_fft / sr), first_bin, nyquist_bin))
+    return StftLayout(sr, n_fft, hop_length, first_bin), last_bin
+
+def compute_spectrogram_db(audio_clip, params=SPECTROGRAM_RENDER_PARAMS):
+    """
+    Load an audio clip and compute the STFT magnitude in dB of the displayed band.
+
+    Recordings sampled far above the band (e.g. 256 kHz for fmax = 32 kHz) are
+    downsampled first when params["decimate"] is set, and the bins outside
+    [fmin, fmax] are dropped before the dB conversion.
+
+    Returns:
+    tuple: The dB matrix (frequency bins x frames) and its StftLayout.
+    """
+    with stage("load"):
+        y, sr = load_waveform(audio_clip, sr=params["sr"])
+    factor = int(sr // (2 * params["fmax"]))
+    if params["decimate"] and factor >= 2:
+        with stage("decimate"):
+            y = librosa.resample(y, orig_sr=sr, target_sr=sr // factor)
+            sr = sr // factor
+    layout, last_bin = get_stft_layout(sr, len(y), params)
+    with stage("stft"):
+        S = librosa.stft(y, n_fft=layout.n_fft, hop_length=layout.hop_length)[layout.first_bin:last_bin + 1]
+        D = librosa.amplitude_to_db(np.abs(S), ref=np.max)
+    return D, layout
+
+def render_spectrogram(D, layout, params=SPECTROGRAM_RENDER_PARAMS):
+    """
+    Render a dB spectrogram to an image without matplotlib.
+
+    The values are mapped through a colormap lookup table and the rows are
+    remapped to the same log frequency axis that librosa.display.specshow uses
+    (symlog base 2), so the result looks like the matplotlib rendering but is
+    much faster to produce and can be used from several threads.
+
+    Parameters:
+    D (numpy.ndarray): The spectrogram in dB (frequency bins x frames).
+    layout (StftLayout): The STFT settings and first bin of D.
+
+    Returns:
+    PIL.Image.Image: The spectrogram image.
+    """
+    width, height = params["width"], params["height"]
+    n_bins, n_frames = D.shape
+
+    rows = _log_frequency_rows(layout.first_bin, n_bins, layout.sr, layout.n_fft, height)
+    columns = (np.arange(width) + 0.5) * n_frames // width
+    pixels = D[rows[:, None], columns.astype(np.intp)[None, :]]
+
+    # Normalize to the data range like matplotlib does by default
+    vmin, vmax = D.min(), D.max()
+    scale = 256.0 / (vmax - vmin) if vmax > vmin else 0.0
+    indices = np.clip(((pixels - vmin) * scale).astype(np.intp), 0, 255)
+    return Image.fromarray(_colormap_lut(params["cmap"])[indices])
+
+def render_spectrogram_matplotlib(D, layout, params=SPECTROGRAM_RENDER_PARAMS):
+    """
+    Render a dB spectrogram with librosa.display.specshow. This is the original
+    renderer, kept as a reference for render_spectrogram.
+    """
+    import librosa.display  # Imports matplotlib.pyplot, slow
+    import matplotlib.pyplot as plt
+
+    # The figure is sized so that the axes area has the configured pixel size
+    figsize = (params["width"] / 100 / 0.775, params["height"] / 100 / 0.77)
+    # Frequencies of the rows of D, which may start above 0 Hz
+    frequencies = librosa.fft_frequencies(sr=layout.sr, n_fft=layout.n_fft)[layout.first_bin:layout.first_bin + D.shape[0]]
     buf = BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
-    plt.close(fig)
+    with _pyplot_lock:
+        fig, ax = plt.subplots(figsize=figsize)
+        librosa.display.specshow(D, sr=layout.sr, n_fft=layout.n_fft, hop_length=layout.hop_length, x_axis="time", y_axis="log", y_coords=frequencies, cmap=params["cmap"], ax=ax)
+        ax.axis('off')
+        fig.savefig(buf, format='png', bbox_inches='tight', pad_inches=0)
+        plt.close(fig)
     buf.seek(0)
     image = Image.open(buf)
     return image
 
+@lru_cache(maxsize=8)
+def _colormap_lut(cmap_name):
+    """
+    Lookup table with the 256 RGB colors of a matplotlib colormap.
+    """
+    from matplotlib import colormaps
+    return (colormaps[cmap_name](np.linspace(0, 1, 256))[:, :3] * 255).round().astype(np.uint8)
+
+@lru_cache(maxsize=32)
+def _log_frequency_rows(first_bin, n_bins, sr, n_fft, height):
+    """
+    Index (in D, whose row 0 is bin first_bin) of the frequency bin shown on each
+    image row, from top to bottom, for librosa's "log" axis: symlog with base 2,
+    linear below C2 and linscale 0.5.
+    """
+    linthresh = librosa.note_to_hz("C2")
+    linscale = 0.5 / (1.0 - 0.5)
+
+    def forward(f):
+        a = np.abs(f)
+        return np.where(a <= linthresh, f * linscale, np.sign(f) * linthresh * (linscale + np.log2(np.maximum(a, linthresh) / linthresh)))
+
+    def inverse(y):
+        a = np.abs(y)
+        return np.where(a <= linthresh * linscale, y / linscale, np.sign(y) * linthresh * 2 ** (a / linthresh - linscale))
+
+    # Each bin is drawn from halfway to the previous bin to halfway to the next one
+    bin_width = sr / n_fft
+    bottom = forward((first_bin - 0.5) * bin_width)
+    top = forward((first_bin + n_bins - 0.5) * bin_width)
+    centers = top - (np.arange(height) + 0.5) * (top - bottom) / height
+    frequencies = inverse(centers)
+    return np.clip(np.floor(frequencies / bin_width + 0.5) - first_bin, 0, n_bins - 1).astype(np.intp)
+
 def list_audio_files_from_folder(folder_path):
     """
     Lists all audio files (with extensions .mp3, .wav, .WAV, .MP3) in the given folder and its subfolders.
@@ -71,7 +279,7 @@ def list_audio_files_from_folder(folder_path):
         list: A list of full paths to the audio files found.
     """
 
-    return [str(file) for file in Path(folder_path).rglob('*') if file.suffix.lower() in ['.mp3', '.wav']]
+    return scan_audio_files(folder_path)
 
 def extract_time_from_filename(filename):
     try:
@@ -116,6 +324,65 @@ def extract_date_from_filename(filename):
     except IndexError:
         return "Unknown Date"
 
+# BirdNET clip names: <recorder>_<YYYYMMDD>_<HHMMSS>_<start ms>_<end ms>_<confidence>.<extension>
+FILENAME_METADATA_PATTERN = (
+    r"^(?P<recorder>.+)_(?P<date>\d{8})_(?P<time>\d{6})_(?P<start_ms>\d+)_(?P<end_ms>\d+)"
+    r"_(?P<confidence>\d*\.?\d+(?:[eE][-+]?\d+)?)\.[^.]+$"
+)
+
+def _format_hhmmss(seconds):
+    seconds = seconds.astype("Int64")
+    parts = [seconds // 3600, (seconds % 3600) // 60, seconds % 60]
+    formatted = [part.astype(str).str.zfill(2) for part in parts]
+    return (formatted[0] + ":" + formatted[1] + ":" + formatted[2]).where(seconds.notna())
+
+def extract_metadata_from_filenames(filenames):
+    """
+    Parse the metadata of all the BirdNET clip names at once.
+
+    Parameters:
+    filenames (pandas.Series): The file names (without folder).
+
+    Returns:
+    pandas.DataFrame: With the same index as filenames, the columns "Recorder",
+    "Date" (YYYY-MM-DD), "Start Time" (recording start, HH:MM:SS), "Start (ms)" and
+    "End (ms)" (detection window in the recording), "Confidence" and "Time"
+    (time of the detection, HH:MM:SS). Names that do not follow the BirdNET
+    format get missing values.
+    """
+    parts = pd.Series(filenames, dtype="object").str.extract(FILENAME_METADATA_PATTERN)
+    start_ms = pd.to_numeric(parts["start_ms"]).astype("Int64")
+    end_ms = pd.to_numeric(parts["end_ms"]).astype("Int64")
+    start_seconds = (
+        pd.to_numeric(parts["time"].str[:2]) * 3600
+        + pd.to_numeric(parts["time"].str[2:4]) * 60
+        + pd.to_numeric(parts["time"].str[4:6])
+    )
+    date = parts["date"].str[:4] + "-" + parts["date"].str[4:6] + "-" + parts["date"].str[6:]
+
+    return pd.DataFrame({
+        "Recorder": parts["recorder"],
+        "Date": date,
+        "Start Time": _format_hhmmss(start_seconds),
+        "Start (ms)": start_ms,
+        "End (ms)": end_ms,
+        "Confidence": pd.to_numeric(parts["confidence"]),
+        "Time": _format_hhmmss(start_seconds + start_ms // 1000),
+    }, index=parts.index)
+
+def get_recording_date_and_time(audio_table, row_index):
+    """
+    Return the recording date and the detection time of a row of the audio table,
+    from the columns added by extract_metadata_from_filenames.
+    """
+    row = get_row(audio_table, row_index)
+    if "Date" not in row or "Time" not in row:
+        audio_path = row["Path"]
+        return extract_date_from_filename(os.path.basename(audio_path)), extract_time_from_filename(audio_path)
+    date = row["Date"]
+    time = row["Time"]
+    return (date if isinstance(date, str) else "Unknown Date"), (time if isinstance(time, str) else "Unknown Time")
+
 def update_audio_and_image(audio_path):
     audio = load_audio(audio_path)
     image = get_mel_spectrogram(audio_path)
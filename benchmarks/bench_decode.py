@@ -0,0 +1,96 @@
+# benchmarks/bench_decode.py
+#
+# Decode throughput per format, librosa.load against audio_decode.decode_audio,
+# in seconds of audio decoded per second of wall time (x realtime):
+#   - full reads of 3 s clips (WAV, FLAC, MP3) and of a long WAV (memory-mapped)
+#   - window reads of a long recording, as in segment-on-demand mode
+# MP3 is timed cold (decoded and stored in the transcode cache) and warm (read
+# from the stored copy). The transcoded copies go to a temporary folder.
+# Run from the repository root:
+#   python -m benchmarks.bench_decode [--clips 20] [--long-minutes 10]
+
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+import audio_decode
+from benchmarks.corpus import make_waveform, SAMPLE_RATE
+from segments import make_segment_path, parse_segment_path, read_segment
+
+
+def write_files(directory, n_clips, long_minutes, rng):
+    clip = make_waveform(0, rng)
+    files = {}
+    for file_format, extension in [("WAV", "wav"), ("FLAC", "flac"), ("MP3", "mp3")]:
+        paths = []
+        for index in range(n_clips):
+            path = os.path.join(directory, f"clip_{index}.{extension}")
+            sf.write(path, clip, SAMPLE_RATE, format=file_format)
+            paths.append(path)
+        files[f"clip_{extension}"] = paths
+    long_audio = np.tile(clip, long_minutes * 20)  # 3 s clips
+    for file_format, extension in [("WAV", "wav"), ("MP3", "mp3")]:
+        path = os.path.join(directory, f"long.{extension}")
+        sf.write(path, long_audio, SAMPLE_RATE, format=file_format)
+        files[f"long_{extension}"] = [path]
+    return files
+
+
+def throughput(function, paths):
+    # Seconds of audio per second, over all the paths
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    for path in paths:
+        y, sr = function(path)
+        audio_seconds += len(y) / sr
+    return audio_seconds / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode throughput per format")
+    parser.add_argument("--clips", type=int, default=20, help="Clips per format")
+    parser.add_argument("--long-minutes", type=int, default=10, help="Length of the long recordings")
+    parser.add_argument("--windows", type=int, default=50, help="Window reads of the long recordings")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_files(directory, args.clips, args.long_minutes, rng)
+        cache = audio_decode.TranscodeCache(cache_dir=os.path.join(directory, "decoded"))
+        with mock.patch("audio_decode.transcode_cache", cache):
+            librosa.load(files["clip_wav"][0], sr=None)  # Warm-up of the librosa imports
+            print(f"{'files':<12} {'librosa.load':>14} {'decode_audio':>14}")
+            for name, paths in files.items():
+                if name.endswith("mp3"):
+                    baseline = throughput(lambda path: librosa.load(path, sr=None), paths)
+                    cold = throughput(audio_decode.decode_audio, paths)
+                    warm = throughput(audio_decode.decode_audio, paths)
+                    print(f"{name:<12} {baseline:>13.0f}x {cold:>9.0f}x cold {warm:.0f}x warm")
+                    continue
+                baseline = throughput(lambda path: librosa.load(path, sr=None), paths)
+                decoded = throughput(audio_decode.decode_audio, paths)
+                print(f"{name:<12} {baseline:>13.0f}x {decoded:>13.0f}x")
+
+            # Windows of 3 s of the long recordings, at random positions (the MP3 is already stored)
+            duration = args.long_minutes * 60
+            starts = rng.uniform(0, duration - 3, args.windows)
+            for name in ["long_wav", "long_mp3"]:
+                path = files[name][0]
+                segments = [make_segment_path(path, start, start + 3) for start in starts]
+
+                def librosa_window(segment):
+                    recording, start, end = parse_segment_path(segment)
+                    return librosa.load(recording, sr=None, offset=start, duration=end - start)
+                baseline = throughput(librosa_window, segments)
+                decoded = throughput(read_segment, segments)
+                print(f"{name + ' win':<12} {baseline:>13.0f}x {decoded:>13.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_folder_scan.py
+#
+# Compare the recursive rglob listing with the parallel, indexed folder scanner
+# on a synthetic tree of empty audio files.
+# Run from the repository root:
+#   python -m benchmarks.bench_folder_scan [--files 200000] [--folders 500]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from folder_index import FolderIndex
+
+
+def build_tree(root, n_files, n_folders):
+    files_per_folder = max(n_files // n_folders, 1)
+    for folder in range(n_folders):
+        folder_path = os.path.join(root, f"Species {folder:04d}")
+        os.makedirs(folder_path)
+        for clip in range(files_per_folder):
+            open(os.path.join(folder_path, f"REC{folder:04d}_20240509_042300_{clip * 3000}_{clip * 3000 + 3000}_0.8.WAV"), "w").close()
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<34} {time.perf_counter() - start:8.3f} s  ({len(result)} files)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the folder scanner")
+    parser.add_argument("--files", type=int, default=200000, help="Number of files in the synthetic tree")
+    parser.add_argument("--folders", type=int, default=500, help="Number of species folders")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_folder_scan_")
+    try:
+        print(f"Building {args.files} files in {args.folders} folders...")
+        build_tree(root, args.files, args.folders)
+        index_path = os.path.join(root, "index.json")
+
+        timed("rglob (previous scanner)", lambda: [str(f) for f in Path(root).rglob("*") if f.suffix.lower() in [".mp3", ".wav"]])
+        timed("parallel scandir, cold index", lambda: FolderIndex(index_path).list_audio_files(root))
+        timed("parallel scandir, warm index", lambda: FolderIndex(index_path).list_audio_files(root))
+
+        # A new clip in one folder only relists that folder
+        open(os.path.join(root, "Species 0000", "REC0000_20240509_042300_0_1_0.5.WAV"), "w").close()
+        timed("warm index, one folder changed", lambda: FolderIndex(index_path).list_audio_files(root))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
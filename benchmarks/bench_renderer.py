@@ -0,0 +1,58 @@
+# benchmarks/bench_renderer.py
+#
+# Compare the matplotlib spectrogram renderer with the NumPy one.
+# Run from the repository root:
+#   python -m benchmarks.bench_renderer ["Bird Vocalization Samples"] [--clips 20] [--repeat 3]
+
+import argparse
+import time
+
+import numpy as np
+
+from audio_processing import compute_spectrogram_db, list_audio_files_from_folder, render_spectrogram, render_spectrogram_matplotlib
+
+
+def time_renderer(renderer, spectrograms, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for D, layout in spectrograms:
+            renderer(D, layout)
+        best = min(best, time.perf_counter() - start)
+    return best / len(spectrograms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the spectrogram renderers")
+    parser.add_argument("folder", nargs="?", default="Bird Vocalization Samples", help="Folder with audio clips")
+    parser.add_argument("--clips", type=int, default=20, help="Number of clips to render")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions, the best one is reported")
+    args = parser.parse_args()
+
+    audio_files = list_audio_files_from_folder(args.folder)[:args.clips]
+    if not audio_files:
+        print(f"No audio files found in {args.folder}")
+        return
+    spectrograms = [compute_spectrogram_db(audio_file) for audio_file in audio_files]
+
+    matplotlib_time = time_renderer(render_spectrogram_matplotlib, spectrograms, args.repeat)
+    numpy_time = time_renderer(render_spectrogram, spectrograms, args.repeat)
+
+    # Mean absolute difference between both renderings, in 0-255 color units
+    differences = []
+    for D, layout in spectrograms:
+        reference = np.asarray(render_spectrogram_matplotlib(D, layout).convert("RGB"), dtype=np.int16)
+        rendered = np.asarray(render_spectrogram(D, layout), dtype=np.int16)
+        if reference.shape == rendered.shape:
+            differences.append(np.abs(reference - rendered).mean())
+
+    print(f"Clips:       {len(spectrograms)}")
+    print(f"matplotlib:  {matplotlib_time * 1000:.1f} ms/clip")
+    print(f"numpy:       {numpy_time * 1000:.1f} ms/clip")
+    print(f"Speedup:     {matplotlib_time / numpy_time:.1f}x")
+    if differences:
+        print(f"Pixel diff:  {np.mean(differences):.3f} (mean absolute, 0-255)")
+
+
+if __name__ == "__main__":
+    main()
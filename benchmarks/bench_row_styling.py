@@ -0,0 +1,75 @@
+# benchmarks/bench_row_styling.py
+#
+# Per-click cost of styling the audio table: the previous path (Styler.apply of
+# apply_styles over the whole table) against the cached, vectorized row styles
+# of the current page. Both include the Styler rendering done by gr.Dataframe.
+# Run from the repository root:
+#   python -m benchmarks.bench_row_styling [--sizes 1000 10000 100000] [--clicks 5]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from session import Session
+from table_view import get_page, get_page_of_row, get_page_start
+from ui_components import apply_styles, style_page
+
+
+def make_table(n_rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Idx": np.arange(1, n_rows + 1),
+        "Specie": rng.choice(["Grus grus", "Asio otus", "Anas crecca"], n_rows),
+        "File": [f"REC_20240509_042300_{i * 3000}_{i * 3000 + 3000}_0.8.WAV" for i in range(n_rows)],
+        "Validation": rng.choice([-100, -2, -1, 0, 1, 2], n_rows),
+        "Suggested Specie": " ",
+        "Path": "",
+    })
+
+
+def render(styler):
+    # What gr.Dataframe does with a Styler value
+    styler._compute()._translate(None, None)
+
+
+def previous_click(session, audio_table, row_index):
+    audio_table.at[row_index, "Validation"] = 1
+    render(audio_table.style.apply(apply_styles, axis=1))
+
+
+def cached_click(session, audio_table, row_index):
+    audio_table.at[row_index, "Validation"] = 1
+    session.row_style_cache.update_row(audio_table, row_index)
+    page = get_page_of_row(row_index)
+    render(style_page(session, get_page(audio_table, page), get_page_start(page)))
+
+
+def time_clicks(click, session, audio_table, clicks):
+    start = time.perf_counter()
+    for row_index in range(clicks):
+        click(session, audio_table, row_index)
+    return (time.perf_counter() - start) / clicks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-click styling of the audio table")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Table sizes in rows")
+    parser.add_argument("--clicks", type=int, default=5, help="Clicks timed per size")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'previous (ms/click)':>20} {'cached (ms/click)':>18} {'speedup':>8}")
+    for n_rows in args.sizes:
+        audio_table = make_table(n_rows)
+        session = Session()
+        session.set_audio_file_list(audio_table)
+        session.row_style_cache.get_styles(audio_table, 0, 0)  # Built once when the table is loaded
+
+        previous = time_clicks(previous_click, session, audio_table, args.clicks)
+        cached = time_clicks(cached_click, session, audio_table, args.clicks)
+        print(f"{n_rows:>8} {previous * 1000:>20.1f} {cached * 1000:>18.2f} {previous / cached:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
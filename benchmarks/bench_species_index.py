@@ -0,0 +1,75 @@
+# benchmarks/bench_species_index.py
+#
+# Per-keystroke latency of the species suggestions, on a synthetic label set the
+# size of the BirdNET one (or on a real labels file), compared with filtering the
+# whole species list like the dropdown did on the client.
+# Run from the repository root:
+#   python -m benchmarks.bench_species_index [--species 6500] [--labels path/to/labels.txt]
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from species_index import SpeciesIndex, read_labels_file
+
+SYLLABLES = ["ra", "lo", "ni", "cus", "pha", "tur", "dus", "mer", "gus", "ala", "ca", "an", "ser", "in", "us", "ix", "po", "te", "ar", "ba"]
+
+
+def make_labels(n_species, rng):
+    def word(syllables):
+        return "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+    return [(f"{word(3).capitalize()} {word(3)}", f"{word(2).capitalize()} {word(3).capitalize()}") for _ in range(n_species)]
+
+
+def keystrokes(name, typo, rng):
+    # Every prefix of the name as it is typed, with a letter swapped when typo is set
+    if typo and len(name) > 4:
+        position = rng.randrange(1, len(name) - 2)
+        name = name[:position] + name[position + 1] + name[position] + name[position + 2:]
+    return [name[:length] for length in range(1, len(name) + 1)]
+
+
+def percentiles(latencies):
+    latencies = np.array(latencies) * 1000
+    return f"p50 {np.percentile(latencies, 50):6.2f} ms  p95 {np.percentile(latencies, 95):6.2f} ms  max {latencies.max():6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the species suggestion index")
+    parser.add_argument("--species", type=int, default=6500, help="Number of synthetic species")
+    parser.add_argument("--labels", help="BirdNET labels file to use instead of synthetic names")
+    parser.add_argument("--queries", type=int, default=200, help="Names typed per run")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    labels = read_labels_file(args.labels) if args.labels else make_labels(args.species, rng)
+    usage = {scientific_name: rng.randrange(50) for scientific_name, _ in rng.sample(labels, min(500, len(labels)))}
+
+    start = time.perf_counter()
+    index = SpeciesIndex(usage_counts=lambda: usage)
+    for scientific_name, common_name in labels:
+        index.add(scientific_name, common_name)
+    print(f"Index of {len(index)} species built in {time.perf_counter() - start:.2f} s")
+
+    all_names = [f"{scientific_name} ({common_name})" for scientific_name, common_name in labels]
+    for typo in [False, True]:
+        index_latencies, scan_latencies = [], []
+        for scientific_name, common_name in rng.sample(labels, args.queries):
+            for text in keystrokes(rng.choice([scientific_name, common_name]), typo, rng):
+                start = time.perf_counter()
+                index.search(text)
+                index_latencies.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                lowered = text.lower()
+                [name for name in all_names if lowered in name.lower()]
+                scan_latencies.append(time.perf_counter() - start)
+        label = "with a typo" if typo else "exact"
+        print(f"Keystrokes {label:<12} index: {percentiles(index_latencies)}")
+        print(f"{'':<23} scan:  {percentiles(scan_latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/bench_startup.py
+#
+# Time to the first render of the app, against a local stub of the GitHub releases
+# API, so the update check never reaches the network. Every scenario starts the app
+# in a new process and times its phases from the start of that process:
+#   - import:  import app
+#   - build:   app.main(), the UI blocks
+#   - launch:  demo.launch until the server answers
+#   - page:    the first GET of the page
+#   - footer:  how long the page load waits for the update check (refresh_footer)
+# The scenarios: the stub answering at once, the stub slower than the timeout, a
+# closed port (offline without the switch), VALIDATOR_OFFLINE=1, and a recent
+# cached answer with the slow stub.
+# Run from the repository root:
+#   python -m benchmarks.bench_startup [--runs 3] [--output startup.json]
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import CURRENT_VERSION, BENCHMARK_RESULTS_DIR
+
+
+class StubReleasesServer:
+    """
+    Local stand-in of the GitHub releases API, answering after delay seconds.
+    """
+
+    def __init__(self, delay=0.0, tag_name=CURRENT_VERSION):
+        stub = self
+        self.delay = delay
+        self.tag_name = tag_name
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.delay)
+                data = json.dumps({"tag_name": stub.tag_name}).encode("utf-8")
+                try:
+                    self.send_response(200 if self.path.endswith("/releases/latest") else 404)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass  # The app gave up waiting
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_child(update_cache_file):
+    # Runs in the app process started by run_scenario, prints the timings as JSON
+    start = time.perf_counter()
+    timings = {}
+
+    import update_check
+    update_check.start_update_check(cache_file=update_cache_file)  # app.main() does not start it again
+    import app
+    timings["import_s"] = time.perf_counter() - start
+
+    demo = app.main()
+    timings["build_s"] = time.perf_counter() - start
+
+    port = get_free_port()
+    demo.launch(prevent_thread_lock=True, server_name="127.0.0.1", server_port=port, show_api=False, quiet=True)
+    timings["launch_s"] = time.perf_counter() - start
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=60) as response:
+        response.read()
+    timings["page_s"] = time.perf_counter() - start
+
+    footer_start = time.perf_counter()
+    app.refresh_footer()
+    timings["footer_s"] = time.perf_counter() - footer_start
+
+    demo.close()
+    print(json.dumps({key: round(value, 4) for key, value in timings.items()}))
+
+
+def run_scenario(env, update_cache_file):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", update_cache_file],
+        env={**os.environ, **env}, capture_output=True, text=True, timeout=600,
+    )
+    total = time.perf_counter() - start
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        print(result.stderr[-2000:])
+        return {"error": f"exit code {result.returncode}"}
+    return {**json.loads(lines[-1]), "process_s": round(total, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the startup of the app against a stub releases API")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per scenario, the fastest is kept")
+    parser.add_argument("--slow-delay", type=float, default=10.0, help="Seconds the slow stub takes to answer")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_RESULTS_DIR, "startup_results.json"), help="JSON file with the results")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    fast, slow = StubReleasesServer(), StubReleasesServer(delay=args.slow_delay)
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        cached_file = os.path.join(work_dir, "cached.json")
+        scenarios = [
+            ("stub", {"VALIDATOR_GITHUB_API_URL": fast.url}, None),
+            ("slow_stub", {"VALIDATOR_GITHUB_API_URL": slow.url}, None),
+            ("unreachable", {"VALIDATOR_GITHUB_API_URL": f"http://127.0.0.1:{get_free_port()}"}, None),
+            ("offline", {"VALIDATOR_OFFLINE": "1", "VALIDATOR_GITHUB_API_URL": slow.url}, None),
+            ("cached", {"VALIDATOR_GITHUB_API_URL": slow.url}, cached_file),
+        ]
+        # The cached scenario reads the answer the stub gives here
+        run_scenario({"VALIDATOR_GITHUB_API_URL": fast.url}, cached_file)
+        for name, env, cache_file in scenarios:
+            print(f"Scenario {name}...")
+            runs = []
+            for run in range(args.runs):
+                runs.append(run_scenario(env, cache_file or os.path.join(work_dir, f"{name}_{run}.json")))
+            ok = [run for run in runs if "error" not in run]
+            results[name] = min(ok, key=lambda run: run["page_s"]) if ok else runs[-1]
+            print(json.dumps(results[name]))
+    print(f"Requests to the stubs: {fast.requests} fast, {slow.requests} slow")
+    fast.close()
+    slow.close()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# benchmarks/bench_suite.py
+#
+# Times the main code paths of the app on synthetic BirdNET corpora (see
+# benchmarks/corpus.py) of several sizes, and writes the results to a JSON file
+# so runs can be compared to catch regressions:
+#   - scan:        list_audio_files_from_folder, and load_audio_files_from_folder cold and warm
+#   - table build: what Browse does after the folder dialog (audio table, journal, first page)
+#   - spectrogram: audio_to_mel_spectrogram per clip
+#   - validation:  update_validation and the page render of each click
+#   - load_csv:    load_csv_and_copy_validation of an export of the table
+#   - species:     add_suggested_species per click
+# The file dialogs are replaced by the chosen files, and the journals, folder index
+# and suggested species are written to a temporary folder, not to the app files.
+# Run from the repository root:
+#   python -m benchmarks.bench_suite [--sizes 1000 10000 100000] [--output results.json] [--baseline previous.json]
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+
+import app
+import data_processing
+import species_management
+from audio_processing import audio_to_mel_spectrogram, list_audio_files_from_folder
+from benchmarks.corpus import make_corpus
+from config import BENCHMARK_RESULTS_DIR
+from folder_index import FolderIndex
+from session import Session
+from ui_components import render_current_page, update_validation
+from validation_journal import ValidationJournal
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def summarize(latencies):
+    latencies = np.array(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "max_ms": round(float(latencies.max()), 3),
+    }
+
+
+def run_size(n_clips, work_dir, args):
+    rng = random.Random(n_clips)
+    results = {}
+    corpus_dir = os.path.join(work_dir, f"corpus_{n_clips}")
+    _, results["corpus_s"] = timed(make_corpus, corpus_dir, n_clips, args.species)
+
+    # Scan
+    filenames, results["scan_s"] = timed(list_audio_files_from_folder, corpus_dir)
+    folder_index = FolderIndex(index_path=os.path.join(work_dir, f"folder_index_{n_clips}.json"))
+    with mock.patch("audio_processing.folder_index", folder_index):
+        _, results["scan_indexed_cold_s"] = timed(app.load_audio_files_from_folder, corpus_dir)
+        _, results["scan_indexed_warm_s"] = timed(app.load_audio_files_from_folder, corpus_dir)
+
+    # Table build, as in on_browse after the folder is chosen
+    journal = ValidationJournal(journal_dir=os.path.join(work_dir, "journals"))
+    journal.open(corpus_dir)
+    session = Session()
+    with mock.patch("app.get_project_journal", lambda project_root: journal):
+        start = time.perf_counter()
+        app.set_project_files(session, filenames, corpus_dir)
+        app.on_audio_files_loaded(session)
+        results["table_build_s"] = time.perf_counter() - start
+    audio_table = session.get_audio_file_list()
+
+    # Spectrograms, on a sample of the clips
+    audio_to_mel_spectrogram(filenames[0])  # Warm-up, the first call compiles the librosa kernels
+    latencies = []
+    for path in rng.sample(filenames, min(args.spectrograms, len(filenames))):
+        latencies.append(timed(audio_to_mel_spectrogram, path)[1])
+    results["spectrogram"] = summarize(latencies)
+
+    # Validation clicks: the new value and the render of the page of the row
+    latencies = []
+    for row_index in rng.sample(range(len(audio_table)), min(args.clicks, len(audio_table))):
+        # The row is selected first, as when it is clicked in the table
+        session.set_current_row_index(row_index)
+        start = time.perf_counter()
+        update_validation(session, audio_table, row_index, rng.choice([1, 0, -1, 2]))
+        render_current_page(session)
+        latencies.append(time.perf_counter() - start)
+    results["validation"] = summarize(latencies)
+    journal.close()
+
+    # Load CSV and Copy Validation, of an export of the validated table
+    validation_path = os.path.join(work_dir, f"validation_{n_clips}.csv")
+    audio_table.drop(columns=["Path"]).to_csv(validation_path, index=False)
+    with mock.patch("tkinter.Tk"), mock.patch("tkinter.filedialog.askopenfilenames", return_value=[validation_path]):
+        (_, msg), results["load_csv_s"] = timed(data_processing.load_csv_and_copy_validation, audio_table.copy())
+    if msg.startswith("ERROR"):
+        print(f"load_csv_and_copy_validation failed: {msg}")
+
+    # Suggested species clicks
+    store = species_management.SuggestedSpeciesStore(file_path=os.path.join(work_dir, f"suggested_species_{n_clips}.txt"))
+    species = sorted(audio_table["Specie"].unique())
+    with mock.patch("species_management.suggested_species_store", store):
+        latencies = [timed(species_management.add_suggested_species, rng.choice(species))[1] for _ in range(args.clicks)]
+        _, results["species_flush_s"] = timed(store.flush)
+    results["add_suggested_species"] = summarize(latencies)
+
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in results.items()}
+
+
+def get_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "species": args.species,
+        "spectrograms": args.spectrograms,
+        "clicks": args.clicks,
+    }
+
+
+def flatten(results, prefix=""):
+    # "10000.validation.p50_ms" -> value, to compare two runs
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif key.endswith("_s") or key.endswith("_ms"):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def print_comparison(results, baseline):
+    current, previous = flatten(results["sizes"]), flatten(baseline["sizes"])
+    print(f"\nCompared with the run of {baseline['meta'].get('date')} ({baseline['meta'].get('commit')}):")
+    for key in sorted(current.keys() & previous.keys()):
+        if previous[key]:
+            ratio = current[key] / previous[key]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{key:<45} {previous[key]:>10.3f} -> {current[key]:>10.3f}  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app code paths on synthetic BirdNET corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Clips per corpus")
+    parser.add_argument("--species", type=int, default=100, help="Species folders per corpus")
+    parser.add_argument("--spectrograms", type=int, default=30, help="Clips rendered per corpus")
+    parser.add_argument("--clicks", type=int, default=200, help="Validation and suggested species clicks per corpus")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_RESULTS_DIR, "benchmark_results.json"), help="JSON file with the results")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    results = {"meta": get_metadata(args), "sizes": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_clips in args.sizes:
+            print(f"Benchmarking {n_clips} clips...")
+            results["sizes"][str(n_clips)] = run_size(n_clips, work_dir, args)
+            print(json.dumps(results["sizes"][str(n_clips)], indent=2))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            print_comparison(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
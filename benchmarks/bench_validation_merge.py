@@ -0,0 +1,63 @@
+# benchmarks/bench_validation_merge.py
+#
+# Time and peak memory of merging several validation exports into an audio
+# table, on synthetic CSV and Parquet files with overlapping clips.
+# Run from the repository root:
+#   python -m benchmarks.bench_validation_merge [--rows 1000000] [--files 4]
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from validation_merge import apply_validation_map, build_validation_map
+
+
+def make_exports(directory, n_rows, n_files, file_format, rng):
+    # Every export validates half of the clips, picked at random, so files overlap
+    paths = []
+    for index in range(n_files):
+        rows = rng.choice(n_rows, n_rows // 2, replace=False)
+        export = pd.DataFrame({
+            "File": [f"clip_{row}.wav" for row in rows],
+            "Validation": rng.integers(0, 3, len(rows)),
+            "Suggested Specie": None,
+            "Timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 86400, len(rows)), unit="s"),
+        })
+        path = os.path.join(directory, f"export_{index}.{file_format}")
+        if file_format == "parquet":
+            export.to_parquet(path, index=False)
+        else:
+            export.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the merge of validation exports")
+    parser.add_argument("--rows", type=int, default=1000000, help="Clips in the audio table")
+    parser.add_argument("--files", type=int, default=4, help="Validation exports to merge")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    audio_table = pd.DataFrame({"File": [f"clip_{row}.wav" for row in range(args.rows)], "Validation": -100, "Suggested Specie": None})
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in ["csv", "parquet"]:
+            paths = make_exports(directory, args.rows, args.files, file_format, rng)
+            for resolution in ["last", "timestamp"]:
+                tracemalloc.start()
+                start = time.perf_counter()
+                validation_map = build_validation_map(paths, resolution)
+                _, updated = apply_validation_map(audio_table.copy(), validation_map)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+                print(f"{file_format:<8} {resolution:<10} {updated} rows updated in {elapsed:6.2f} s, peak {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/corpus.py
+#
+# Synthetic corpus of BirdNET clips: N clips of 3 s with valid BirdNET names
+# (<recorder>_<YYYYMMDD>_<HHMMSS>_<start ms>_<end ms>_<confidence>.WAV) spread over
+# species folders, like the output of BirdNET's segments command. Only a small
+# pool of distinct waveforms is written, the clips are hard links to them (copies
+# where links are not supported), so 100k clips take a few MB.
+# Run from the repository root:
+#   python -m benchmarks.corpus corpus_dir [--clips 10000] [--species 100]
+
+import argparse
+import os
+import random
+import shutil
+
+import numpy as np
+import soundfile as sf
+
+CLIP_SECONDS = 3
+SAMPLE_RATE = 48000
+WAVEFORMS = 16
+RECORDERS = ["2MA00783-INM", "2MA01022-PNM", "SMM04512-DON", "AM120-LAG"]
+SYLLABLES = ["ra", "lo", "ni", "cus", "pha", "tur", "dus", "mer", "gus", "ala", "ca", "an", "ser", "in", "us", "ix", "po", "te", "ar", "ba"]
+
+
+def make_species_names(n_species, rng):
+    names = set()
+    while len(names) < n_species:
+        genus = "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+        species = "".join(rng.choice(SYLLABLES) for _ in range(3))
+        names.add(f"{genus} {species}")
+    return sorted(names)
+
+
+def make_waveform(index, rng):
+    # A few chirps over background noise, so the spectrograms are not empty
+    t = np.arange(CLIP_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    y = 0.02 * rng.standard_normal(len(t))
+    for _ in range(3 + index % 4):
+        start, length = rng.uniform(0, CLIP_SECONDS - 0.5), rng.uniform(0.1, 0.5)
+        f0, f1 = rng.uniform(1500, 4000), rng.uniform(3000, 9000)
+        window = (t >= start) & (t < start + length)
+        phase = 2 * np.pi * (f0 * (t - start) + (f1 - f0) * (t - start) ** 2 / (2 * length))
+        y[window] += 0.3 * np.sin(phase[window]) * np.hanning(window.sum())
+    return (np.clip(y, -1, 1) * 32767).astype(np.int16)
+
+
+def make_clip_name(rng):
+    recorder = rng.choice(RECORDERS)
+    date = f"2024{rng.randint(3, 7):02d}{rng.randint(1, 28):02d}"
+    time = f"{rng.randrange(24):02d}{rng.randrange(60):02d}{rng.randrange(60):02d}"
+    start_ms = rng.randrange(0, 3600000, 3000)
+    confidence = rng.uniform(0.1, 1.0)
+    return f"{recorder}_{date}_{time}_{start_ms}_{start_ms + CLIP_SECONDS * 1000}_{confidence:.4f}.WAV"
+
+
+def make_corpus(root, n_clips, n_species=100, seed=0):
+    """
+    Write a synthetic corpus of BirdNET clips to root/<species>/<clip>.
+
+    Parameters:
+    root (str): Folder of the corpus, created if needed.
+    n_clips (int): Number of clips.
+    n_species (int): Number of species folders.
+
+    Returns:
+    list: Paths of the clips.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    # Not named .wav, so the folder scanners do not list them as clips
+    pool_dir = os.path.join(root, ".waveforms")
+    os.makedirs(pool_dir, exist_ok=True)
+    pool = []
+    for index in range(WAVEFORMS):
+        path = os.path.join(pool_dir, f"waveform_{index}.pcm")
+        sf.write(path, make_waveform(index, np_rng), SAMPLE_RATE, subtype="PCM_16", format="WAV")
+        pool.append(path)
+
+    species_names = make_species_names(n_species, rng)
+    for species in species_names:
+        os.makedirs(os.path.join(root, species), exist_ok=True)
+
+    paths = []
+    names = set()
+    while len(paths) < n_clips:
+        name = make_clip_name(rng)
+        if name in names:
+            continue
+        names.add(name)
+        path = os.path.join(root, species_names[len(paths) % n_species], name)
+        source = pool[len(paths) % WAVEFORMS]
+        try:
+            os.link(source, path)
+        except OSError:
+            shutil.copyfile(source, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic corpus of BirdNET clips")
+    parser.add_argument("root", help="Folder of the corpus")
+    parser.add_argument("--clips", type=int, default=10000, help="Number of clips")
+    parser.add_argument("--species", type=int, default=100, help="Number of species folders")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = make_corpus(args.root, args.clips, args.species, args.seed)
+    print(f"{len(paths)} clips written to {args.root}")
+
+
+if __name__ == "__main__":
+    main()
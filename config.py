@@ -1,63 +1,115 @@
 # config.py
 
+import os
+import sys
+
 CURRENT_VERSION = "v1.7"  # Replace with your current app version
 GITHUB_REPO = "GrunCrow/BirdNET-PredictionsValidator-App"  # Replace with your GitHub repo
+GITHUB_API_URL = os.environ.get("VALIDATOR_GITHUB_API_URL", "https://api.github.com")  # Releases API used by the update check
+UPDATE_CHECK_OFFLINE = os.environ.get("VALIDATOR_OFFLINE", "0") == "1"  # Skip the update check, e.g. on field laptops
+UPDATE_CHECK_TIMEOUT_S = 3  # The check runs in the background, the footer waits at most this long for it
+UPDATE_CHECK_CACHE_FILE = os.path.join("cache", "update_check.json")
+UPDATE_CHECK_CACHE_TTL_S = 24 * 3600  # The releases API is asked again after this time
 SUGGESTED_SPECIES_FILE = "suggested_species.txt"  # File to store suggested species
 COMMENTS_FILE = "comments.txt"
+SUGGESTED_SPECIES_FLUSH_DELAY_S = 2.0  # Suggested species clicks are written to the file after this delay
+SPECIES_LABELS_FILE = "BirdNET_GLOBAL_6K_V2.4_Labels.txt"  # Optional BirdNET labels, searched by the Suggested Specie dropdown
+SPECIES_SUGGESTIONS_K = 20  # Suggestions sent to the dropdown per keystroke
+
+# Persistent cache of rendered spectrograms
+CACHE_DIR = "cache"
+SPECTROGRAM_CACHE_DIR = os.path.join(CACHE_DIR, "spectrograms")
+SPECTROGRAM_CACHE_MAX_MB = 2048  # Least recently used images are evicted above this size
+
+# Decoding of the audio files (see audio_decode.py)
+DECODE_MEMMAP_MIN_MB = 16  # PCM WAVs from this size are memory-mapped instead of read
+DECODE_CACHE_DIR = os.path.join(CACHE_DIR, "decoded")  # PCM copies of the MP3 files, decoded once
+DECODE_CACHE_FORMAT = "WAV"  # "WAV": 16-bit PCM, fastest to read and memory-mapped, "FLAC": 24-bit, ~half the size but slower than MP3 itself
+DECODE_CACHE_MAX_MB = 4096
+
+# In-memory caches (see memory_cache.py), budget in MB of each one
+MEMORY_CACHE_MB = {
+    "spectrograms": 256,  # Spectrogram images of the clips
+    "audio": 128,  # Decoded segments of long recordings (clip files are played from their path)
+    "samples": 64,  # Spectrogram images of the species samples
+}
+MEMORY_CACHE_IMAGE_ENCODING = "array"  # "array": raw pixels, "png": smaller but decoded on every hit
+
+# Parameters used to render the spectrograms. They are part of the cache key,
+# so changing any of them invalidates the cached images. A project folder can
+# override some of them in its PROJECT_RENDER_PARAMS_FILE (see render_params.py).
+SPECTROGRAM_RENDER_PARAMS = {
+    "sr": None,  # None keeps the native sample rate
+    "n_fft": "auto",  # "auto": the power of two closest to window_s seconds, or a fixed size
+    "hop_length": "auto",  # "auto": about one frame per image column, or a fixed hop
+    "window_s": 0.043,  # STFT window of the "auto" n_fft, 2048 samples at 48 kHz
+    "fmin": 1,  # Displayed band in Hz, the bins outside it are dropped before the dB conversion
+    "fmax": 32000,
+    "decimate": True,  # Downsample recordings sampled at 4x fmax or more before the STFT
+    "cmap": "magma",
+    "width": 930,  # Size in pixels of the rendered image
+    "height": 462,
+    "renderer": "numpy",
+}
+
+PROJECT_RENDER_PARAMS_FILE = "spectrogram_params.json"  # Render parameters of a project, in its folder
+
+# Index of the scanned audio folders, only changed directories are listed again
+FOLDER_INDEX_FILE = os.path.join(CACHE_DIR, "folder_index.json")
+FOLDER_SCAN_WORKERS = 16  # Directories listed in parallel, mostly waiting on I/O
+
+# Seconds of audio added before and after each detection in segment-on-demand mode
+SEGMENT_CONTEXT_S = 0.0
+
+# Rows of the audio table sent to the browser at once
+TABLE_PAGE_SIZE = 50
+
+# Background rendering of the next rows while validating
+PREFETCH_ROWS = 5
+PREFETCH_WORKERS = 8  # Threads shared by all the sessions
+
+# Serving several annotators from one server process
+QUEUE_CONCURRENCY_LIMIT = 16  # Events processed at the same time, across all the sessions
+QUEUE_MAX_SIZE = 256  # Events waiting in the queue before new ones are rejected
+RENDER_WORKERS = os.cpu_count()  # Processes rendering spectrograms, 0 renders in the calling thread
+
+# Append-only journal of the validations, replayed when a project is loaded again
+JOURNAL_DIR = os.path.join(CACHE_DIR, "journals")
+JOURNAL_FSYNC_EVERY = 20  # Records written before forcing them to disk
+JOURNAL_FSYNC_INTERVAL_S = 2.0  # Maximum time a record waits to be forced to disk
+JOURNAL_COMPACT_EVERY = 500  # Records appended before compacting the journal into a CSV snapshot
+
+# Lock files of the files shared between processes (suggested species, comments)
+LOCK_DIR = os.path.join(CACHE_DIR, "locks")
+
+# Storage of the audio table: "dataframe" keeps it in memory, "sqlite" keeps it
+# in a database per project, for projects with hundreds of thousands of rows
+STORAGE_ENGINE = "dataframe"
+PROJECTS_DIR = os.path.join(CACHE_DIR, "projects")
+STORE_IMPORT_CHUNK = 10000  # Rows inserted or exported at once
+
+# Merge of validation exports ("Load CSV and Copy Validation")
+VALIDATION_MERGE_CHUNK_ROWS = 200000  # Rows read at once from each file
+VALIDATION_MERGE_RESOLUTION = "last"  # "last": the last file wins, "timestamp": the latest Timestamp column wins
+
+# Latency metrics of the handlers and stages (see metrics.py), enabled with VALIDATOR_METRICS=1
+METRICS_ENABLED = os.environ.get("VALIDATOR_METRICS", "0") == "1"
+METRICS_WINDOW = 2048  # Last calls of each handler and stage kept for the percentiles
+METRICS_PORT = 9464  # Local Prometheus endpoint (http://127.0.0.1:9464/metrics), 0 to disable it
+METRICS_DUMP_PATH = os.path.join(CACHE_DIR, "metrics.json")  # Periodic JSON dump, "" to disable it
+METRICS_DUMP_INTERVAL_S = 30
+
+# Sampling profiler (see profiler.py), enabled with VALIDATOR_PROFILE=1 or python app.py --profile
+PROFILE_ENABLED = os.environ.get("VALIDATOR_PROFILE", "0") == "1" or "--profile" in sys.argv
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+PROFILE_SAMPLE_RATE = 20  # Stack samples per second
+PROFILE_FLUSH_INTERVAL_S = 60  # How often the collapsed stacks and the cache sizes are written
+PROFILE_TRACE_MEMORY = False  # Also measure the bytes held by the lru_caches with tracemalloc (slower)
+
+# Results of the scripts in benchmarks/, when no --output is given
+BENCHMARK_RESULTS_DIR = os.path.join(CACHE_DIR, "benchmarks")
 
-class Globals:
-    _sample_audio_dir = ""
-    _current_specie_name = ""
-    _current_sample_audio_file = ""
-
-    _root_dir_audio_files = ""
-    _audio_file_list = []
-    _current_row_index = -1
-
-    @classmethod
-    def set_sample_audio_dir(cls, value):
-        cls._sample_audio_dir = value
-
-    @classmethod
-    def get_sample_audio_dir(cls):
-        return cls._sample_audio_dir
-    
-    @classmethod
-    def set_current_specie_name(cls, value):
-        cls._current_specie_name = value
-
-    @classmethod
-    def get_current_specie_name(cls):
-        return cls._current_specie_name
-    
-    @classmethod
-    def set_current_sample_audio_file(cls, value):
-        cls._current_sample_audio_file = value
-
-    @classmethod
-    def get_current_sample_audio_file(cls):
-        return cls._current_sample_audio_file
-    
-    @classmethod
-    def set_root_dir_audio_files(cls, value):
-        cls._root_dir_audio_files = value
-
-    @classmethod
-    def get_root_dir_audio_files(cls):
-        return cls._root_dir_audio_files
-    
-    @classmethod
-    def set_audio_file_list(cls, value):
-        cls._audio_file_list = value
-
-    @classmethod
-    def get_audio_file_list(cls):
-        return cls._audio_file_list
-    
-    @classmethod
-    def set_current_row_index(cls, value):
-        cls._current_row_index = value
-
-    @classmethod
-    def get_current_row_index(cls):
-        return cls._current_row_index
+# Save Table
+EXPORT_CHUNK_ROWS = 50000  # Rows written at once by the background writer
+EXPORT_PARQUET_COMPRESSION = "zstd"  # Compression of Parquet exports
+EXPORT_POLL_INTERVAL_S = 0.5  # How often the UI refreshes the progress of a save
@@ -1,87 +1,82 @@
 # data_processing.py
 
-from tkinter import Tk, filedialog
-
 import pandas as pd
 
-from ui_components import apply_styles
+from metrics import timed_handler
+from table_export import start_export
+from validation_merge import merge_validation_files
 
-def load_csv_and_copy_validation(audio_table):
+def load_csv_and_copy_validation(audio_table, journal=None):
     """
-    Loads a CSV file, maps the validation values to the audio table, and applies color styling to the table rows based on the validation values.
+    Loads one or more validation files (CSV or Parquet) and maps their validation values to the audio table.
+    When a File is in several files, the last one selected wins (see VALIDATION_MERGE_RESOLUTION).
+    The color styling is applied when a page of the table is shown.
 
     Parameters:
-    - audio_table (DataFrame): The audio table to be updated.
+    - audio_table (DataFrame or AnnotationStore): The audio table to be updated.
+    - journal (ValidationJournal): Journal of the project, the updated rows are appended to it.
 
     Returns:
-    - audio_table (DataFrame): The updated audio table with validation values and color styling applied.
+    - audio_table (DataFrame or AnnotationStore): The updated audio table with validation values.
     - message (str): A message indicating the result of the operation.
     """
+    from tkinter import Tk, filedialog  # tkinter is only loaded when a dialog is opened
+
     try:
         root = Tk()
         root.attributes("-topmost", True)
         root.withdraw()  # Hide the root window
-        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
-        if file_path:
-            df = pd.read_csv(file_path)
-            # Map per File from audio table and df and change Validation value to df value
-            audio_table = audio_table.merge(df[['File', 'Validation', 'Suggested Specie']], on='File', how='left')
-            
-            # If exists Validation_x and Validation_y, keep Validation from df
-            if 'Validation_x' in audio_table and 'Validation_y' in audio_table:
-                audio_table['Validation'] = audio_table['Validation_y']
-                audio_table = audio_table.drop(columns=['Validation_x', 'Validation_y'])
-            # If exists Suggested Specie_x and Suggested Specie_y, keep Suggested Specie from df
-            if 'Suggested Specie_x' in audio_table and 'Suggested Specie_y' in audio_table:
-                audio_table['Suggested Specie'] = audio_table['Suggested Specie_y']
-                audio_table = audio_table.drop(columns=['Suggested Specie_x', 'Suggested Specie_y'])
-
-            audio_table = audio_table.style.apply(apply_styles, axis=1)
-
-            root.destroy()
-            return audio_table, "Validation Values Loaded"  # Devuelve el DataFrame de Pandas con los valores de validación
+        file_paths = filedialog.askopenfilenames(filetypes=[("Validation files", "*.csv *.parquet")])
+        root.destroy()
+        if file_paths:
+            # The files are streamed in chunks, rows without a validation in them keep their values
+            return merge_validation_files(audio_table, list(file_paths), journal=journal)
         else:
-            root.destroy()
             return pd.DataFrame(), "ERROR: No Validation File"  # Devuelve un DataFrame vacío si se cancela la operación
     except Exception as e:
         return pd.DataFrame(), f"ERROR: {str(e)}"
     
     
-def save_table_to_csv(audio_table):
+@timed_handler
+def save_table(audio_table, changed_only=False, snapshot=None):
     """
-    Saves the given audio table to a CSV file.
+    Asks for a CSV or Parquet file and saves the given audio table to it in the background.
 
     Parameters:
-    audio_table (pandas.DataFrame): The audio table to be saved.
+    audio_table (pandas.DataFrame or AnnotationStore): The audio table to be saved.
+    changed_only (bool): Only save the rows changed since the last save.
+    snapshot (pandas.DataFrame): Validation columns of the last save, from its ExportJob.
 
     Returns:
+    ExportJob: The running save, or None if it was cancelled.
     str: A message indicating the status of the save operation.
     """
+    from tkinter import Tk, filedialog
 
     root = Tk()
     root.attributes("-topmost", True)
     root.withdraw()  # Hide the root window
-    file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+    file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+    root.destroy()
     if file_path:
-        # Save all columns but Path
-        table_to_save = audio_table.drop(columns=["Path"])
-        table_to_save.to_csv(file_path, index=False)
-        root.destroy()
-        return f"Validation saved to {file_path}"
+        # Save all columns but Path, the file is written by the background writer
+        job = start_export(audio_table, file_path, changed_only, snapshot)
+        return job, f"Saving to {file_path}..."
     else:
-        root.destroy()
-        return "Save operation cancelled"
+        return None, "Save operation cancelled"
     
-def update_table_with_validation(audio_table):
+@timed_handler
+def update_table_with_validation(audio_table, journal=None):
     """
     Update the audio table with validation data.
 
     Parameters:
     audio_table (str): The path to the audio table.
+    journal (ValidationJournal): Journal of the project, the updated rows are appended to it.
 
     Returns:
     validation_df (pandas.DataFrame): The validation data loaded from the CSV file.
     msg (str): A message indicating the status of the operation.
     """
-    validation_df, msg = load_csv_and_copy_validation(audio_table)
+    validation_df, msg = load_csv_and_copy_validation(audio_table, journal)
     return validation_df, msg
\ No newline at end of file
@@ -0,0 +1,45 @@
+# file_lock.py
+
+import hashlib
+import os
+
+from config import LOCK_DIR
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    Exclusive lock between processes, held on a lock file in lock_dir while the
+    context is active. The lock file is named after the absolute path of the
+    protected file, so every process locks the same one.
+    """
+
+    def __init__(self, path, lock_dir=LOCK_DIR):
+        digest = hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=8).hexdigest()
+        self.lock_path = os.path.join(lock_dir, f"{os.path.basename(path)}.{digest}.lock")
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        self._file = open(self.lock_path, "a+")
+        if os.name == "nt":
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
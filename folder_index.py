@@ -0,0 +1,196 @@
+# folder_index.py
+
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import FOLDER_INDEX_FILE, FOLDER_SCAN_WORKERS
+
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+# Threads listing the directories, created on the first scan and shared by all the scans
+_scan_executors = {}  # Number of workers -> ThreadPoolExecutor
+_scan_executors_lock = threading.Lock()
+
+
+def _get_scan_executor(workers):
+    with _scan_executors_lock:
+        executor = _scan_executors.get(workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="folder-scan")
+            _scan_executors[workers] = executor
+        return executor
+
+
+def _scan_directory(dir_path):
+    """
+    List one directory with os.scandir.
+
+    Returns:
+    tuple: The directory stat, the audio file names and the subdirectory names.
+    """
+    files, subdirs = [], []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirs.append(entry.name)
+            elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                files.append(entry.name)
+    return os.stat(dir_path), files, subdirs
+
+
+def _get_dir_id(stat):
+    # Some network file systems report no inode numbers (0), their directories are not deduplicated
+    return (stat.st_dev, stat.st_ino) if stat.st_ino else None
+
+
+class FolderIndex:
+    """
+    Index of the audio files of folder trees, persisted between sessions.
+
+    Trees are walked level by level, listing the directories of each level in
+    parallel. The mtime of every directory is kept in the index, and a directory
+    is only listed again when its mtime changed (files or subdirectories were
+    added, removed or renamed), which makes re-browsing a large network share
+    cost one stat per directory. Directories are identified by device and inode,
+    so a symbolic link to a directory already listed (e.g. a link to a parent
+    folder) is not followed twice. The listings are only kept in memory during a
+    scan, they are read from the index file when the next scan starts.
+    """
+
+    def __init__(self, index_path=FOLDER_INDEX_FILE, workers=FOLDER_SCAN_WORKERS):
+        self.index_path = index_path
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()  # One scan at a time, they share the index file
+        self._dirs = {}  # directory path -> {"mtime": ns, "files": [...], "subdirs": [...]}, during a scan
+
+    def _load(self):
+        self._dirs = {}
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as file:
+                    self._dirs = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Error loading folder index, rebuilding it: {str(e)}")
+                self._dirs = {}
+
+    def _save(self):
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        with self._lock:
+            data = json.dumps(self._dirs)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(data)
+        os.replace(tmp_path, self.index_path)
+
+    def _check_directory(self, dir_path):
+        """
+        Reuse the indexed listing of a directory if it did not change, list it otherwise.
+
+        Returns:
+        tuple: The path, the index entry (None if the directory cannot be listed)
+        and the (device, inode) of the directory (None if the file system has no inodes).
+        """
+        entry = self._dirs.get(dir_path)
+        if entry is not None:
+            try:
+                stat = os.stat(dir_path)
+            except OSError:
+                return dir_path, None, None
+            if stat.st_mtime_ns == entry["mtime"]:
+                return dir_path, entry, _get_dir_id(stat)
+        try:
+            stat, files, subdirs = _scan_directory(dir_path)
+        except OSError:
+            return dir_path, None, None
+        return dir_path, {"mtime": stat.st_mtime_ns, "files": files, "subdirs": subdirs}, _get_dir_id(stat)
+
+    def list_audio_files(self, folder_path, refresh=False):
+        """
+        List all the audio files in a folder and its subfolders.
+
+        Parameters:
+        folder_path (str): The path to the folder to search for audio files.
+        refresh (bool): Ignore the index and list every directory again.
+
+        Returns:
+        list: The sorted full paths of the audio files.
+        """
+        folder_path = os.path.normpath(folder_path)
+        with self._scan_lock:
+            self._load()
+            if refresh:
+                self._forget(folder_path)
+            try:
+                return self._scan(folder_path, changed=refresh)
+            finally:
+                self._dirs = {}  # The file lists of the tree are not kept in memory
+
+    def _scan(self, folder_path, changed=False):
+        audio_files = []
+        level = [folder_path]
+        visited = set()  # (device, inode) of the directories listed, against symbolic link cycles
+        while level:
+            next_level = []
+            if len(level) == 1:
+                results = [self._check_directory(level[0])]  # Not worth a thread
+            else:
+                results = _get_scan_executor(self.workers).map(self._check_directory, level)
+            for dir_path, entry, dir_id in results:
+                with self._lock:
+                    if entry is None:
+                        changed |= self._dirs.pop(dir_path, None) is not None
+                        continue
+                    if dir_id is not None:
+                        if dir_id in visited:
+                            continue  # Reached again through a symbolic link
+                        visited.add(dir_id)
+                    changed |= self._dirs.get(dir_path) is not entry
+                    self._dirs[dir_path] = entry
+                audio_files.extend(os.path.join(dir_path, name) for name in entry["files"])
+                next_level.extend(os.path.join(dir_path, name) for name in entry["subdirs"])
+            level = next_level
+
+        if changed:
+            self._save()
+        return sorted(audio_files)
+
+    def invalidate(self, folder_path=None):
+        """
+        Forget the indexed listings of a folder and its subfolders, or of every
+        folder if no path is given, so they are listed again on the next scan.
+        """
+        with self._scan_lock:
+            self._load()
+            if folder_path is not None:
+                self._forget(os.path.normpath(folder_path))
+            else:
+                self._dirs = {}
+            self._save()
+            self._dirs = {}
+
+    def _forget(self, folder_path):
+        prefix = folder_path + os.sep
+        for dir_path in [d for d in self._dirs if d == folder_path or d.startswith(prefix)]:
+            del self._dirs[dir_path]
+
+    def refresh(self, folder_path):
+        """
+        List a folder again from scratch and update the index.
+        """
+        return self.list_audio_files(folder_path, refresh=True)
+
+
+def scan_audio_files(folder_path, workers=FOLDER_SCAN_WORKERS):
+    """
+    List the audio files of a folder tree with a parallel scan, without index.
+    """
+    return FolderIndex(index_path=None, workers=workers).list_audio_files(folder_path)
+
+
+folder_index = FolderIndex()
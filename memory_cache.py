@@ -0,0 +1,167 @@
+# memory_cache.py
+#
+# In-memory caches limited by the bytes they hold instead of by their number of
+# entries, for the spectrogram images and the decoded audio of the clips. Every
+# cache has a budget in MB (MEMORY_CACHE_MB in config.py) and evicts its least
+# recently used entries above it. Images are kept as uint8 arrays (or as PNG bytes
+# with MEMORY_CACHE_IMAGE_ENCODING = "png", ~5x smaller but decoded on every hit)
+# instead of PIL images, so their size is known and they hold no decoder state.
+
+import functools
+import sys
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from config import MEMORY_CACHE_MB, MEMORY_CACHE_IMAGE_ENCODING
+
+# Name -> MemoryCache, for the profiler and the benchmarks
+memory_caches = {}
+
+
+def sizeof(value):
+    """
+    Approximate bytes held by a cached value: the buffers of arrays and bytes, and
+    the size of the containers and strings around them.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes + sys.getsizeof(value) if value.base is None else value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class EncodedImage:
+    """
+    A PIL image stored compactly, as its pixels or as PNG bytes.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, image, encoding=MEMORY_CACHE_IMAGE_ENCODING):
+        if encoding == "png":
+            buf = BytesIO()
+            image.save(buf, format="png")
+            self.data = buf.getvalue()
+        else:
+            if image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGBA")  # Modes that fromarray gives back
+            self.data = np.asarray(image)
+            self.data.setflags(write=False)  # The decoded images share it
+
+    def decode(self):
+        if isinstance(self.data, bytes):
+            image = Image.open(BytesIO(self.data))
+            image.load()
+            return image
+        return Image.fromarray(self.data)
+
+    @property
+    def nbytes(self):
+        return len(self.data) if isinstance(self.data, bytes) else self.data.nbytes
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU cache with a budget in bytes.
+
+    Parameters:
+    name (str): Name of the cache in the stats, and its key in MEMORY_CACHE_MB.
+    max_mb (float): Budget, defaults to MEMORY_CACHE_MB[name]. 0 disables the cache.
+    """
+
+    def __init__(self, name, max_mb=None):
+        self.name = name
+        self.max_bytes = int((MEMORY_CACHE_MB.get(name, 0) if max_mb is None else max_mb) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size in bytes), oldest first
+        self._total_bytes = 0
+        memory_caches[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+        value = entry[0]
+        return value.decode() if isinstance(value, EncodedImage) else value
+
+    def put(self, key, value):
+        """
+        Store a value, PIL images are encoded first. Values larger than the whole
+        budget are not stored.
+        """
+        if isinstance(value, Image.Image):
+            value = EncodedImage(value)
+        size = value.nbytes if isinstance(value, EncodedImage) else sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self.evictions += 1
+
+    def _forget(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def memory_cached(name, key=None):
+    """
+    Decorator caching the results of a function in a MemoryCache, like lru_cache
+    but limited in bytes. The cache is available as function.cache.
+
+    Parameters:
+    name (str): Name of the cache.
+    key (callable): Builds the cache key from the arguments, the arguments themselves by default.
+    """
+    def decorator(function):
+        cache = MemoryCache(name)
+        missing = object()
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            cache_key = key(*args) if key else args
+            value = cache.get(cache_key, missing)
+            if value is missing:
+                value = function(*args)
+                cache.put(cache_key, value)
+            return value
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
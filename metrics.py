@@ -0,0 +1,254 @@
+# metrics.py
+#
+# Latency of the event handlers and of the stages inside them (audio load, STFT,
+# render, image encoding, table styling and serialization), to find out where a
+# slow click spends its time. Every series keeps its last METRICS_WINDOW samples,
+# and the p50/p95/p99 are served in the Prometheus text format at
+# http://127.0.0.1:<METRICS_PORT>/metrics (JSON at /metrics.json) and/or dumped
+# to METRICS_DUMP_PATH periodically, with the gauges sampled by the app (e.g. the
+# depth of the prefetch queue) and the usage of the in-memory caches.
+#
+# Disabled by default, enable it with the environment variable
+#   VALIDATOR_METRICS=1 python app.py
+# When disabled, timed_handler returns the function unchanged and stage returns a
+# shared no-op context, so the instrumented code runs as before.
+
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from config import METRICS_ENABLED, METRICS_WINDOW, METRICS_PORT, METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL_S, PROFILE_ENABLED
+from memory_cache import memory_caches
+
+QUANTILES = [0.5, 0.95, 0.99]
+_NO_OP = nullcontext()
+
+# Thread id -> name of the handler it is running, for the sampling profiler
+active_handlers = {}
+
+
+class Series:
+    """
+    Rolling window of the last samples of one timer, plus totals since the start.
+    """
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        quantiles = np.quantile(np.fromiter(self.samples, float), QUANTILES) if self.samples else [0.0] * len(QUANTILES)
+        return {"count": self.count, "sum": self.total, **{f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, quantiles)}}
+
+
+class MetricsRegistry:
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}  # (kind, name) -> Series, kind is "handler" or "stage"
+        self._recent = []  # Samples not drained yet, to send them from the render processes
+        self._gauges = {}  # name -> (last value, help text)
+
+    def record(self, kind, name, seconds):
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = Series(self.window)
+            series.add(seconds)
+            self._recent.append((kind, name, seconds))
+            if len(self._recent) > self.window:
+                del self._recent[:-self.window]
+
+    def drain(self):
+        """
+        Return the samples recorded since the last drain, e.g. in a render process
+        to send them back with its result.
+        """
+        with self._lock:
+            recent, self._recent = self._recent, []
+        return recent
+
+    def set_gauge(self, name, value, help_text=""):
+        with self._lock:
+            self._gauges[name] = (value, help_text)
+
+    def merge(self, samples):
+        for kind, name, seconds in samples:
+            self.record(kind, name, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {f"{kind}:{name}": series.summary() for (kind, name), series in sorted(self._series.items())}
+            snapshot.update({f"gauge:{name}": value for name, (value, _) in sorted(self._gauges.items())})
+        snapshot.update({f"cache:{name}": cache.stats() for name, cache in sorted(memory_caches.items())})
+        return snapshot
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._series.items())
+            gauges = sorted(self._gauges.items())
+        for kind in ["handler", "stage"]:
+            metric = f"validator_{kind}_seconds"
+            lines += [f"# HELP {metric} Latency of the app {kind}s, over the last {self.window} calls.", f"# TYPE {metric} summary"]
+            for (series_kind, name), series in items:
+                if series_kind != kind:
+                    continue
+                summary = series.summary()
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{kind}="{name}",quantile="{q}"}} {summary[f"p{int(q * 100)}"]:.6f}')
+                lines.append(f'{metric}_sum{{{kind}="{name}"}} {summary["sum"]:.6f}')
+                lines.append(f'{metric}_count{{{kind}="{name}"}} {summary["count"]}')
+        for name, (value, help_text) in gauges:
+            lines += [f"# HELP validator_{name} {help_text}", f"# TYPE validator_{name} gauge", f"validator_{name} {value}"]
+        # Usage of the in-memory caches
+        stats = {name: cache.stats() for name, cache in sorted(memory_caches.items())}
+        for field, metric_type, help_text in [
+            ("bytes", "gauge", "Bytes held by each in-memory cache."),
+            ("max_bytes", "gauge", "Budget in bytes of each in-memory cache."),
+            ("hits", "counter", "Lookups found in each in-memory cache."),
+            ("misses", "counter", "Lookups not found in each in-memory cache."),
+            ("evictions", "counter", "Entries evicted from each in-memory cache to stay under its budget."),
+        ]:
+            metric = f"validator_cache_{field}" + ("_total" if metric_type == "counter" else "")
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {metric_type}"]
+            lines += [f'{metric}{{cache="{name}"}} {cache_stats[field]}' for name, cache_stats in stats.items()]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def timed_handler(function):
+    """
+    Decorator recording the latency of an event handler under its name, and
+    which handler each thread runs for the profiler. The signature is kept
+    (functools.wraps), Gradio still injects the event data.
+    """
+    if not (METRICS_ENABLED or PROFILE_ENABLED):
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        thread_id = threading.get_ident()
+        outer_handler = active_handlers.get(thread_id)
+        active_handlers[thread_id] = function.__name__
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            registry.record("handler", function.__name__, time.perf_counter() - start)
+            if outer_handler is None:
+                active_handlers.pop(thread_id, None)
+            else:
+                active_handlers[thread_id] = outer_handler
+    return wrapper
+
+
+class _StageTimer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.record("stage", self.name, time.perf_counter() - self.start)
+
+
+def stage(name):
+    """
+    Context manager timing a stage of a handler: with stage("stft"): ...
+    """
+    if not METRICS_ENABLED:
+        return _NO_OP
+    return _StageTimer(name)
+
+
+def set_gauge(name, value, help_text=""):
+    """
+    Record the current value of a gauge, e.g. set_gauge("prefetch_queue_depth", 3).
+    """
+    if METRICS_ENABLED:
+        registry.set_gauge(name, value, help_text)
+
+
+def time_postprocess(component, name):
+    """
+    Time the serialization of the values sent to a Gradio component (e.g. the
+    Styler of the audio table rendered to HTML, or an image encoded to a file).
+    """
+    if METRICS_ENABLED:
+        postprocess = component.postprocess
+
+        def timed_postprocess(value):
+            with stage(name):
+                return postprocess(value)
+        component.postprocess = timed_postprocess
+    return component
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(registry.snapshot(), indent=2), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass  # Scrapes are not logged to the console
+
+
+def _dump_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8") as file:
+                json.dump({"time": time.time(), "metrics": registry.snapshot()}, file, indent=2)
+            os.replace(file.name, path)
+        except OSError as e:
+            print(f"Error writing the metrics to {path}: {e}")
+
+
+def start_metrics_export(port=METRICS_PORT, dump_path=METRICS_DUMP_PATH, dump_interval=METRICS_DUMP_INTERVAL_S):
+    """
+    Start the local metrics endpoint and the periodic JSON dump, when metrics are enabled.
+    """
+    if not METRICS_ENABLED:
+        return
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsRequestHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+            print(f"Metrics served at http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"Error starting the metrics endpoint on port {port}: {e}")
+    if dump_path:
+        threading.Thread(target=_dump_periodically, args=(dump_path, dump_interval), name="metrics-dump", daemon=True).start()
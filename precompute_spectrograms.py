@@ -0,0 +1,100 @@
+# precompute_spectrograms.py
+#
+# Pre-render the spectrograms of a folder of BirdNET clips into the app cache,
+# so annotators do not have to wait for them while validating.
+#
+# Usage:
+#   python precompute_spectrograms.py <audio folder> [--workers N] [--cache-dir DIR] [--max-mb MB]
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import audio_processing
+from audio_processing import list_audio_files_from_folder, audio_to_mel_spectrogram
+from config import SPECTROGRAM_CACHE_DIR, SPECTROGRAM_CACHE_MAX_MB
+from render_params import get_render_params, load_project_render_params
+from spectrogram_cache import SpectrogramCache
+
+
+def init_worker(cache_dir, folder):
+    # Every worker process keeps its own index of the shared cache folder, without a
+    # budget: the workers would each evict against it, and together overshoot it.
+    # The parent trims the cache once, when all the clips are rendered.
+    audio_processing.spectrogram_cache = SpectrogramCache(cache_dir, max_mb=None)
+    # Same parameters as the app when the folder is loaded as a project
+    load_project_render_params(folder)
+
+
+def precompute(audio_path):
+    """
+    Render one clip into the cache, unless it is already cached.
+
+    Returns:
+    str: "rendered", "skipped" or "failed".
+    """
+    cache = audio_processing.spectrogram_cache
+    try:
+        params = get_render_params(audio_path)
+        cache_key = cache.make_key(audio_path, params)
+        if cache.contains(cache_key):
+            cache.touch(cache_key)  # Part of the warm-up, evicted after the older images
+            return "skipped"
+        cache.put(cache_key, audio_to_mel_spectrogram(audio_path, params))
+        return "rendered"
+    except Exception as e:
+        print(f"\nError rendering {audio_path}: {str(e)}", file=sys.stderr)
+        return "failed"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render the spectrograms of a folder of audio clips into the app cache")
+    parser.add_argument("folder", help="Folder with the audio clips, searched recursively")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--cache-dir", default=SPECTROGRAM_CACHE_DIR, help=f"Spectrogram cache folder (default: {SPECTROGRAM_CACHE_DIR})")
+    parser.add_argument("--max-mb", type=float, default=SPECTROGRAM_CACHE_MAX_MB, help=f"Cache size budget in MB (default: {SPECTROGRAM_CACHE_MAX_MB})")
+    args = parser.parse_args()
+
+    audio_files = list_audio_files_from_folder(args.folder)
+    total = len(audio_files)
+    if not total:
+        print(f"No audio files found in {args.folder}")
+        return
+    print(f"Found {total} audio files, rendering with {args.workers} workers into {args.cache_dir}")
+
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    start = time.perf_counter()
+    last_report = 0.0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(args.cache_dir, args.folder)) as executor:
+        for done, result in enumerate(executor.map(precompute, audio_files, chunksize=8), start=1):
+            counts[result] += 1
+            elapsed = time.perf_counter() - start
+            if elapsed - last_report >= 1.0 or done == total:
+                last_report = elapsed
+                rate = done / elapsed if elapsed > 0 else 0.0
+                eta = (total - done) / rate if rate > 0 else 0.0
+                print(
+                    f"\r{done}/{total} clips | rendered {counts['rendered']}, skipped {counts['skipped']}, failed {counts['failed']} | {rate:.1f} clips/s | ETA {eta:.0f}s",
+                    end="",
+                    flush=True,
+                )
+    print()
+
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s ({total / elapsed:.1f} clips/s)")
+
+    # One budget for all the workers: the least recently used images are evicted here
+    cache = SpectrogramCache(args.cache_dir, args.max_mb)
+    evicted = cache.trim()
+    cache_stats = cache.stats()
+    print(f"Cache size: {cache_stats['bytes'] / 1024 / 1024:.1f} MB of {args.max_mb:g} MB")
+    if evicted:
+        print(f"Warning: {evicted} images were evicted to fit the budget, increase --max-mb to keep all the images")
+    if cache_stats["bytes"] > SPECTROGRAM_CACHE_MAX_MB * 1024 * 1024:
+        print(f"Warning: the app evicts above SPECTROGRAM_CACHE_MAX_MB ({SPECTROGRAM_CACHE_MAX_MB} MB), raise it in config.py to keep the warmed images")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# prefetch.py
+
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_processing import update_audio_and_image, list_audio_files_from_folder
+from config import PREFETCH_ROWS, PREFETCH_WORKERS
+from metrics import set_gauge
+from sample_library import load_sample_audio_and_image
+from table_view import get_rows
+
+# Threads shared by the prefetchers of all the sessions
+prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_prefetchers = weakref.WeakSet()  # Prefetchers of the open sessions, for the queue depth gauge
+
+
+def get_prefetch_key(audio_path):
+    # The same file can reach the prefetcher as written in the table and normalized
+    return os.path.normpath(audio_path)
+
+
+class Prefetcher:
+    """
+    Renders the spectrograms of the next rows of the audio table of a session
+    (and the sample of their species) in background threads, so that moving to
+    the next row only costs a cache lookup.
+    """
+
+    def __init__(self, session, rows=PREFETCH_ROWS, executor=prefetch_executor):
+        self.session = session
+        self.rows = rows
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._futures = {}  # get_prefetch_key(audio path) -> Future
+        self._anchor_row = None
+        _prefetchers.add(self)
+
+    def update(self):
+        """
+        Schedule the current row and the rows after it, and cancel the work
+        queued for rows that are not ahead of the current row anymore.
+        """
+        audio_files = self.session.get_audio_file_list()
+        current_row = self.session.get_current_row_index()
+        anchor_row = (id(audio_files), current_row)
+        if len(audio_files) == 0 or anchor_row == self._anchor_row:
+            return
+        self._anchor_row = anchor_row
+
+        wanted = {}  # get_prefetch_key(audio path) -> loader
+        # The current row is kept so a job still rendering it is not cancelled
+        rows = get_rows(audio_files, max(current_row, 0), current_row + 1 + self.rows, ["Path", "Specie"])
+        for audio_path, species_name in zip(rows["Path"], rows["Specie"]):
+            wanted[get_prefetch_key(audio_path)] = update_audio_and_image
+            sample_audio_file = self._get_sample_audio_file(species_name)
+            if sample_audio_file:
+                wanted[get_prefetch_key(sample_audio_file)] = load_sample_audio_and_image
+
+        with self._lock:
+            # Cancel stale work, the running jobs finish anyway and end up in the caches
+            for path in list(self._futures):
+                if path not in wanted:
+                    future = self._futures.pop(path)
+                    future.cancel()
+            for path, loader in wanted.items():
+                if path not in self._futures:
+                    self._futures[path] = self._executor.submit(loader, path)
+
+        set_gauge("prefetch_queue_depth", get_prefetch_queue_depth(), "Prefetch jobs queued or running, across all the sessions.")
+
+    def fetch(self, audio_path, loader=update_audio_and_image):
+        """
+        Return the audio and image of a file, waiting for the prefetch job if it
+        is already in progress instead of rendering it a second time.
+        """
+        audio_path = get_prefetch_key(audio_path)
+        with self._lock:
+            future = self._futures.pop(audio_path, None)
+        if future is not None and not future.cancelled():
+            try:
+                return future.result()
+            except Exception as e:
+                print(f"Error prefetching {audio_path}: {str(e)}")
+        return loader(audio_path)
+
+    def queue_depth(self):
+        """
+        Number of prefetch jobs that are queued or running.
+        """
+        with self._lock:
+            return sum(1 for future in self._futures.values() if not future.done())
+
+    def _get_sample_audio_file(self, species_name):
+        sample_audio_dir = self.session.get_sample_audio_dir()
+        if not sample_audio_dir:
+            return None
+        sample_audio_files = list_audio_files_from_folder(sample_audio_dir + os.sep + species_name)
+        return sample_audio_files[0] if sample_audio_files else None
+
+
+def get_prefetch_queue_depth():
+    """
+    Number of prefetch jobs queued or running, across all the sessions.
+    """
+    return sum(prefetcher.queue_depth() for prefetcher in list(_prefetchers))
@@ -0,0 +1,205 @@
+# profiler.py
+#
+# Sampling profiler for live sessions. A background thread samples the Python
+# stacks of all the threads of the app PROFILE_SAMPLE_RATE times per second and
+# counts them per event handler (the handlers decorated with
+# metrics.timed_handler, the rest goes to "background"). Every
+# PROFILE_FLUSH_INTERVAL_S the counts are written to PROFILE_DIR/<start time>/
+# as one collapsed-stack file per handler ("frame;frame;frame count" lines, the
+# input of flamegraph.pl, speedscope or inferno), and a line with the size of
+# the caches and the memory of the process is appended to memory.jsonl.
+#
+# Enable it with VALIDATOR_PROFILE=1 python app.py (or python app.py --profile).
+# The render processes are not sampled, their stages are timed by metrics.py.
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from config import PROFILE_ENABLED, PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_FLUSH_INTERVAL_S, PROFILE_TRACE_MEMORY
+from memory_cache import memory_caches
+from metrics import active_handlers
+
+# Modules whose lru_cache'd functions are tracked
+CACHED_MODULES = ["audio_processing"]
+
+TRACED_BLOCK_MIN_BYTES = 16 * 1024
+
+# Leaf frames of threads waiting for work, not worth a sample
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("base_events.py", "_run_once"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def get_rss_bytes():
+    """
+    Resident memory of the process, or None where it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource  # Not available on Windows
+        # Peak, not current, memory; ru_maxrss is in bytes on macOS and in KB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def find_cached_functions(module_names=CACHED_MODULES):
+    """
+    Return the lru_cache'd functions of the given modules, by "module.function".
+    """
+    functions = {}
+    for module_name in module_names:
+        module = sys.modules.get(module_name)
+        for name, value in vars(module or {}).items():
+            # Functions imported from another module are listed under their own module
+            if callable(value) and hasattr(value, "cache_info") and getattr(value, "__module__", None) == module_name:
+                functions[f"{module_name}.{name}"] = value
+    return functions
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir, sample_rate=PROFILE_SAMPLE_RATE, flush_interval=PROFILE_FLUSH_INTERVAL_S, trace_memory=PROFILE_TRACE_MEMORY):
+        self.output_dir = output_dir
+        self.interval = 1.0 / sample_rate
+        self.flush_interval = flush_interval
+        self.trace_memory = trace_memory
+        self._stacks = defaultdict(Counter)  # handler -> collapsed stack -> samples
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._cache_lines = {}  # (file name, line) -> cached function, to attribute traced memory
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.trace_memory:
+            tracemalloc.start(25)
+            self._cache_lines = self._get_cache_lines()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        print(f"Profiling to {self.output_dir}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stop.wait(self.interval):
+            self.sample(exclude=own_thread)
+            if time.monotonic() >= next_flush:
+                self.flush()
+                next_flush = time.monotonic() + self.flush_interval
+
+    def sample(self, exclude=None):
+        """
+        Add the current stack of every thread to the counts of its handler.
+        """
+        frames = sys._current_frames()
+        handlers = dict(active_handlers)
+        samples = []
+        for thread_id, frame in frames.items():
+            if thread_id == exclude:
+                continue
+            leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+            handler = handlers.get(thread_id)
+            if handler is None and leaf in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                frame = frame.f_back
+            samples.append((handler or "background", ";".join(reversed(stack))))
+        del frames
+        with self._lock:
+            for handler, stack in samples:
+                self._stacks[handler][stack] += 1
+
+    def flush(self):
+        """
+        Rewrite the collapsed-stack files and append the memory of the caches.
+        """
+        with self._lock:
+            stacks = {handler: dict(counts) for handler, counts in self._stacks.items()}
+        for handler, counts in stacks.items():
+            path = os.path.join(self.output_dir, f"{handler}.collapsed")
+            with open(path + ".tmp", "w", encoding="utf-8") as file:
+                for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+                    file.write(f"{stack} {count}\n")
+            os.replace(path + ".tmp", path)
+
+        with open(os.path.join(self.output_dir, "memory.jsonl"), "a", encoding="utf-8") as file:
+            file.write(json.dumps(self.get_memory_record()) + "\n")
+
+    def get_memory_record(self):
+        caches = {}
+        for name, function in find_cached_functions().items():
+            info = function.cache_info()
+            caches[name] = {"size": info.currsize, "maxsize": info.maxsize, "hits": info.hits, "misses": info.misses}
+        # The memory caches count their own bytes
+        for name, cache in memory_caches.items():
+            caches[f"memory_cache.{name}"] = cache.stats()
+        if self.trace_memory:
+            for name, size in self._get_traced_cache_bytes().items():
+                caches.setdefault(name, {})["traced_bytes"] = size
+        return {"time": datetime.now().isoformat(timespec="seconds"), "rss_bytes": get_rss_bytes(), "caches": caches}
+
+    def _get_cache_lines(self):
+        lines = {}
+        for name, function in find_cached_functions().items():
+            code = getattr(function, "__wrapped__", function).__code__
+            for _, _, line in code.co_lines():
+                if line is not None:
+                    lines[(code.co_filename, line)] = name
+        return lines
+
+    def _get_traced_cache_bytes(self):
+        # Memory still allocated by calls of the cached functions, i.e. mostly their
+        # cached results. Only large blocks (images, audio) are looked at, reading the
+        # traceback of every small allocation would take minutes.
+        totals = Counter()
+        for trace in tracemalloc.take_snapshot().traces:
+            if trace.size < TRACED_BLOCK_MIN_BYTES:
+                continue
+            for frame in trace.traceback:
+                name = self._cache_lines.get((frame.filename, frame.lineno))
+                if name is not None:
+                    totals[name] += trace.size
+                    break
+        return dict(totals)
+
+
+profiler = None
+
+
+def start_profiler(output_root=PROFILE_DIR):
+    """
+    Start sampling the app, in a new folder of output_root, when profiling is enabled.
+    """
+    global profiler
+    if not PROFILE_ENABLED or profiler is not None:
+        return None
+    profiler = SamplingProfiler(os.path.join(output_root, datetime.now().strftime("%Y%m%d-%H%M%S")))
+    profiler.start()
+    atexit.register(profiler.stop)
+    return profiler
@@ -0,0 +1,66 @@
+# render_params.py
+#
+# Spectrogram render parameters per project. A project folder can hold a
+# PROJECT_RENDER_PARAMS_FILE (JSON) overriding some of SPECTROGRAM_RENDER_PARAMS,
+# e.g. {"fmin": 10000, "fmax": 120000} for bat recordings at 256 kHz. The files of
+# the project, and the segments of its recordings, are rendered with the merged
+# parameters; other files (e.g. the species samples) with the defaults. The
+# parameters are part of the cache keys, so every project has its own images.
+
+import json
+import os
+import threading
+
+from config import SPECTROGRAM_RENDER_PARAMS, PROJECT_RENDER_PARAMS_FILE
+from segments import parse_segment_path
+
+_project_params = {}  # Project root (with a trailing separator) -> merged parameters
+_project_params_lock = threading.Lock()
+
+
+def load_project_render_params(root_dir):
+    """
+    Read the render parameters of the project in root_dir, and use them for its files.
+
+    Returns:
+    dict: The parameters of the project, the defaults if it has no parameters file.
+    """
+    root = os.path.join(os.path.abspath(root_dir), "")
+    params = dict(SPECTROGRAM_RENDER_PARAMS)
+    path = os.path.join(root, PROJECT_RENDER_PARAMS_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as file:
+                overrides = json.load(file)
+            unknown = set(overrides) - set(SPECTROGRAM_RENDER_PARAMS)
+            if unknown:
+                print(f"Unknown render parameters in {path}, ignored: {', '.join(sorted(unknown))}")
+            params.update({key: value for key, value in overrides.items() if key in SPECTROGRAM_RENDER_PARAMS})
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error reading the render parameters {path}: {e}")
+    with _project_params_lock:
+        if params == SPECTROGRAM_RENDER_PARAMS:
+            _project_params.pop(root, None)
+        else:
+            _project_params[root] = params
+    return params
+
+
+def get_render_params(file_path):
+    """
+    Return the render parameters of an audio file or segment: those of the
+    innermost loaded project that contains it, or the defaults.
+    """
+    segment = parse_segment_path(file_path)
+    path = os.path.abspath(segment[0] if segment else file_path)
+    best_root, best_params = "", SPECTROGRAM_RENDER_PARAMS
+    with _project_params_lock:
+        for root, params in _project_params.items():
+            if path.startswith(root) and len(root) > len(best_root):
+                best_root, best_params = root, params
+    return best_params
+
+
+def get_render_params_id(params):
+    # Hashable form of the parameters, for the in-memory cache keys
+    return json.dumps(params, sort_keys=True)
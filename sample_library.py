@@ -0,0 +1,134 @@
+# sample_library.py
+#
+# Reference vocalizations per species. Every sample .WAV can have a pre-rendered
+# .PNG spectrogram next to it (a "sidecar"), which is used instead of computing
+# the spectrogram at runtime. Sidecars are regenerated when they are missing,
+# unreadable or older than their audio file.
+#
+# Rebuild all the sidecars of a sample folder:
+#   python sample_library.py ["Bird Vocalization Samples"] [--workers N] [--force]
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from audio_processing import audio_to_mel_spectrogram, list_audio_files_from_folder, load_audio
+from memory_cache import memory_cached
+
+SIDECAR_EXTENSIONS = [".PNG", ".png"]
+
+
+def get_sidecar_path(audio_path):
+    """
+    Return the path of the sidecar image of an audio file. If no sidecar exists
+    yet, the path where it should be created is returned.
+    """
+    stem = os.path.splitext(audio_path)[0]
+    for extension in SIDECAR_EXTENSIONS:
+        if os.path.exists(stem + extension):
+            return stem + extension
+    return stem + SIDECAR_EXTENSIONS[0]
+
+
+def is_sidecar_valid(audio_path, image_path):
+    """
+    Check that a sidecar image exists, is newer than its audio file and can be decoded.
+    """
+    try:
+        if os.path.getmtime(image_path) < os.path.getmtime(audio_path):
+            return False
+        with Image.open(image_path) as image:
+            image.verify()
+        return True
+    except Exception:
+        return False
+
+
+def build_sidecar(audio_path):
+    """
+    Render the spectrogram of a sample and write it next to the audio file.
+
+    Returns:
+    PIL.Image.Image: The rendered image.
+    """
+    image = audio_to_mel_spectrogram(audio_path)
+    image_path = get_sidecar_path(audio_path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(image_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            image.save(file, format="png")
+        os.replace(tmp_path, image_path)
+    except OSError as e:
+        # Read-only sample folders still get the rendered image
+        print(f"Could not write sidecar {image_path}: {str(e)}")
+    return image
+
+
+@memory_cached("samples")
+def _load_sample_image(audio_path, audio_mtime):
+    image_path = get_sidecar_path(audio_path)
+    if is_sidecar_valid(audio_path, image_path):
+        image = Image.open(image_path)
+        image.load()
+        return image
+    return build_sidecar(audio_path)
+
+
+def load_sample_audio_and_image(audio_path):
+    """
+    Return the audio and the spectrogram image of a sample, read from its sidecar.
+    """
+    image = _load_sample_image(audio_path, os.path.getmtime(audio_path))
+    return load_audio(audio_path), image
+
+
+def _refresh_sidecar(audio_path, force=False):
+    try:
+        if not force and is_sidecar_valid(audio_path, get_sidecar_path(audio_path)):
+            return "valid"
+        build_sidecar(audio_path)
+        return "built"
+    except Exception as e:
+        print(f"Error building sidecar for {audio_path}: {str(e)}")
+        return "failed"
+
+
+def build_sample_library(sample_audio_dir, workers=None, force=False):
+    """
+    Regenerate the stale or missing sidecars of every sample in parallel.
+
+    Parameters:
+    sample_audio_dir (str): The folder with one subfolder of samples per species.
+    workers (int): Number of worker processes, by default the number of CPUs.
+    force (bool): Rebuild every sidecar, even the valid ones.
+
+    Returns:
+    dict: The number of "valid", "built" and "failed" sidecars.
+    """
+    audio_files = list_audio_files_from_folder(sample_audio_dir)
+    counts = {"valid": 0, "built": 0, "failed": 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_refresh_sidecar, audio_files, [force] * len(audio_files), chunksize=4):
+            counts[result] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the spectrogram sidecars of the sample vocalizations")
+    parser.add_argument("folder", nargs="?", default="Bird Vocalization Samples", help="Sample audio folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true", help="Rebuild the sidecars that are still valid")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = build_sample_library(args.folder, workers=args.workers, force=args.force)
+    elapsed = time.perf_counter() - start
+    print(f"Sidecars: {counts['built']} built, {counts['valid']} up to date, {counts['failed']} failed ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# segments.py
+#
+# Segment-on-demand mode: validate BirdNET detections straight from the long
+# source recordings, without cutting and storing one clip per detection.
+# A detection is addressed with a media fragment path "recording.wav#t=start,end"
+# (in seconds), and only that window is decoded when it is played or rendered.
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import soundfile as sf
+
+from audio_decode import decode_audio, get_seekable_path
+from config import SEGMENT_CONTEXT_S
+
+_SEGMENT_PATH_RE = re.compile(r"^(?P<recording>.*)#t=(?P<start>\d+(?:\.\d+)?),(?P<end>\d+(?:\.\d+)?)$")
+
+AUDIO_EXTENSIONS = [".wav", ".flac", ".mp3"]
+
+# Column names used by the different BirdNET result formats (CSV and Raven selection tables)
+_RESULT_COLUMNS = {
+    "start": ["Start (s)", "Begin Time (s)", "start_time"],
+    "end": ["End (s)", "End Time (s)", "end_time"],
+    "scientific_name": ["Scientific name", "Scientific Name", "scientific_name"],
+    "common_name": ["Common name", "Common Name", "common_name"],
+    "confidence": ["Confidence", "confidence"],
+    "file": ["File", "Begin Path", "Begin File", "filepath"],
+}
+
+
+def make_segment_path(recording_path, start, end):
+    """
+    Build the path of a segment of a recording, with start and end in seconds.
+    """
+    return f"{recording_path}#t={start:.3f},{end:.3f}"
+
+
+def parse_segment_path(path):
+    """
+    Split a segment path into the recording path and the window in seconds.
+
+    Returns:
+    tuple: (recording_path, start, end), or None if the path is a regular file.
+    """
+    match = _SEGMENT_PATH_RE.match(str(path))
+    if match is None:
+        return None
+    return match.group("recording"), float(match.group("start")), float(match.group("end"))
+
+
+def read_segment(path, context=SEGMENT_CONTEXT_S):
+    """
+    Decode only the window of a segment path, plus `context` seconds on each side.
+    The decoder seeks to the first frame, so the rest of the recording is never read.
+
+    Returns:
+    tuple: The mono float32 samples and the sample rate.
+    """
+    recording_path, start, end = parse_segment_path(path)
+    try:
+        # MP3 recordings are read from their stored PCM copy, which can be seeked exactly
+        seekable_path = get_seekable_path(recording_path)
+        info = sf.info(seekable_path)
+        sr = info.samplerate
+        first_frame = max(int((start - context) * sr), 0)
+        last_frame = min(int(np.ceil((end + context) * sr)), info.frames)
+        return decode_audio(seekable_path, first_frame, last_frame - first_frame)
+    except sf.LibsndfileError:
+        # Formats not supported by libsndfile go through librosa, which still only decodes the window
+        import librosa
+        offset = max(start - context, 0.0)
+        y, sr = librosa.load(recording_path, sr=None, offset=offset, duration=end + context - offset)
+        return y, sr
+
+
+def _find_column(df, name):
+    for column in _RESULT_COLUMNS[name]:
+        if column in df.columns:
+            return column
+    return None
+
+
+def _resolve_recording(file_value, table_path, recordings_dir):
+    """
+    Find the recording of a detection: the path stored in the table if it exists,
+    otherwise a file with the same name in the recordings folder. Per-recording
+    tables without a file column are matched by the name of the table itself
+    (e.g. "<recording>.BirdNET.selection.table.txt").
+    """
+    if isinstance(file_value, str) and file_value:
+        if os.path.exists(file_value):
+            return file_value
+        candidate = os.path.join(recordings_dir, os.path.basename(file_value.replace("\\", "/")))
+        if os.path.exists(candidate):
+            return candidate
+        return None
+    stem = os.path.basename(table_path).split(".")[0]
+    for extension in AUDIO_EXTENSIONS:
+        for candidate_extension in [extension, extension.upper()]:
+            candidate = os.path.join(recordings_dir, stem + candidate_extension)
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def load_birdnet_results(table_paths, recordings_dir):
+    """
+    Build the audio table from BirdNET result tables (CSV or Raven selection tables)
+    and the folder with the original recordings.
+
+    Parameters:
+    table_paths (list): Paths of the BirdNET result tables.
+    recordings_dir (str): The folder with the original long recordings.
+
+    Returns:
+    pandas.DataFrame: One row per detection, with the same columns as a table
+    loaded from clips, and a segment path in "Path".
+    """
+    rows = []
+    missing_recordings = set()
+    for table_path in table_paths:
+        separator = "\t" if table_path.lower().endswith(".txt") else ","
+        df = pd.read_csv(table_path, sep=separator)
+        start_column, end_column = _find_column(df, "start"), _find_column(df, "end")
+        if start_column is None or end_column is None:
+            print(f"Skipping {table_path}: no detection start/end columns")
+            continue
+        species_column = _find_column(df, "scientific_name") or _find_column(df, "common_name")
+        confidence_column = _find_column(df, "confidence")
+        file_column = _find_column(df, "file")
+
+        for detection in df.to_dict("records"):
+            file_value = detection[file_column] if file_column else None
+            recording_path = _resolve_recording(file_value, table_path, recordings_dir)
+            if recording_path is None:
+                missing_recordings.add(file_value or table_path)
+                continue
+
+            start, end = float(detection[start_column]), float(detection[end_column])
+            confidence = detection[confidence_column] if confidence_column else 0
+            stem = os.path.splitext(os.path.basename(recording_path))[0]
+            rows.append({
+                "Specie": detection[species_column] if species_column else "Unknown",
+                # Same name as the clip BirdNET would have cut, so the date and time can be parsed from it
+                "File": f"{stem}_{int(round(start * 1000))}_{int(round(end * 1000))}_{confidence}.WAV",
+                "Validation": -100,
+                "Suggested Specie": " ",
+                "Path": make_segment_path(recording_path, start, end),
+            })
+
+    for recording in sorted(missing_recordings):
+        print(f"Recording not found: {recording}")
+
+    audio_table = pd.DataFrame(rows, columns=["Specie", "File", "Validation", "Suggested Specie", "Path"])
+    audio_table.insert(0, "Idx", range(1, len(audio_table) + 1))
+    return audio_table
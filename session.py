@@ -0,0 +1,69 @@
+# session.py
+#
+# State of one browser session. Every session gets its own Session object through
+# a gr.State, so several annotators can use the same server without sharing the
+# current row, species or audio table.
+
+from prefetch import Prefetcher
+from ui_components import RowStyleCache
+
+
+class Session:
+    def __init__(self):
+        self._sample_audio_dir = ""
+        self._current_specie_name = ""
+        self._current_sample_audio_file = ""
+
+        self._root_dir_audio_files = ""
+        self._audio_file_list = []
+        self._current_row_index = -1
+        self._current_page = 0
+
+        # Per-session helpers, the work they schedule goes to pools shared by all the sessions
+        self.row_style_cache = RowStyleCache()
+        self.prefetcher = Prefetcher(self)
+        self.journal = None  # ValidationJournal of the project, shared with the other sessions on it
+        self.export_job = None  # Running or last ExportJob of Save Table
+        self.export_snapshot = None  # Validation columns as of the last save, for incremental saves
+
+    def set_sample_audio_dir(self, value):
+        self._sample_audio_dir = value
+
+    def get_sample_audio_dir(self):
+        return self._sample_audio_dir
+
+    def set_current_specie_name(self, value):
+        self._current_specie_name = value
+
+    def get_current_specie_name(self):
+        return self._current_specie_name
+
+    def set_current_sample_audio_file(self, value):
+        self._current_sample_audio_file = value
+
+    def get_current_sample_audio_file(self):
+        return self._current_sample_audio_file
+
+    def set_root_dir_audio_files(self, value):
+        self._root_dir_audio_files = value
+
+    def get_root_dir_audio_files(self):
+        return self._root_dir_audio_files
+
+    def set_audio_file_list(self, value):
+        self._audio_file_list = value
+
+    def get_audio_file_list(self):
+        return self._audio_file_list
+
+    def set_current_row_index(self, value):
+        self._current_row_index = value
+
+    def get_current_row_index(self):
+        return self._current_row_index
+
+    def set_current_page(self, value):
+        self._current_page = value
+
+    def get_current_page(self):
+        return self._current_page
@@ -0,0 +1,211 @@
+# species_index.py
+#
+# Server-side suggestions for the "Suggested Specie" dropdown. The scientific
+# and common names of the species are indexed in a prefix trie, and every
+# keystroke returns the best k matches instead of sending the whole species
+# list to the browser. When no name starts with the typed text, names within a
+# small edit distance are suggested instead (e.g. "Grsu" finds "Grus grus").
+
+import heapq
+import os
+import threading
+
+from config import SPECIES_LABELS_FILE, SPECIES_SUGGESTIONS_K
+from species_management import suggested_species_store
+
+_IDS = None  # Key of the ids stored in each trie node
+
+
+def normalize_name(name):
+    return " ".join(str(name).split()).lower()
+
+
+def max_edit_distance(query):
+    # Short queries only tolerate one typo, otherwise everything matches
+    if len(query) < 3:
+        return 0
+    return 1 if len(query) < 6 else 2
+
+
+def read_labels_file(labels_path):
+    """
+    Read a BirdNET labels file, with one "Scientific name_Common name" per line.
+
+    Returns:
+    list: (scientific name, common name) tuples.
+    """
+    species = []
+    with open(labels_path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                scientific_name, _, common_name = line.partition("_")
+                species.append((scientific_name, common_name))
+    return species
+
+
+class SpeciesIndex:
+    """
+    Prefix trie over the words of the species names. Every node keeps the ids of
+    the species with a word starting with the node prefix, so a prefix query is
+    one walk down the trie, and the results are ranked by usage count.
+    """
+
+    def __init__(self, usage_counts=None, max_results=SPECIES_SUGGESTIONS_K):
+        self.max_results = max_results
+        # Callable returning a dict of usage counts by species, e.g. how often each one was suggested
+        self.usage_counts = usage_counts or dict
+        self._lock = threading.Lock()
+        self._root = {}
+        self._species = []  # id -> scientific name
+        self._labels = []  # id -> label shown in the dropdown
+        self._keys = []  # id -> indexed word starts of the names, to match the used species directly
+        self._ids = {}  # scientific name -> id
+
+    def __len__(self):
+        return len(self._species)
+
+    def add(self, scientific_name, common_name=""):
+        """
+        Add a species to the index. Adding a known species only fills in its common name.
+        """
+        scientific_name = scientific_name.strip()
+        if not scientific_name:
+            return
+        with self._lock:
+            species_id = self._ids.get(scientific_name)
+            if species_id is None:
+                species_id = len(self._species)
+                self._ids[scientific_name] = species_id
+                self._species.append(scientific_name)
+                self._labels.append(scientific_name)
+                self._keys.append([])
+                self._insert(scientific_name, species_id)
+            if common_name and self._labels[species_id] == scientific_name:
+                self._labels[species_id] = f"{scientific_name} ({common_name})"
+                self._insert(common_name, species_id)
+
+    def _insert(self, name, species_id):
+        words = normalize_name(name).split(" ")
+        # Every word start is indexed, so "crane" finds "Common Crane"
+        for start in range(len(words)):
+            key = " ".join(words[start:])
+            self._keys[species_id].append(key)
+            node = self._root
+            for char in key:
+                node = node.setdefault(char, {})
+                ids = node.setdefault(_IDS, [])
+                if not ids or ids[-1] != species_id:
+                    ids.append(species_id)
+
+    def _find_prefix(self, query):
+        node = self._root
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(_IDS, [])
+
+    def _find_fuzzy(self, query, max_distance):
+        """
+        Ids of the species with a word that starts with a prefix at most
+        max_distance edits away from the query (Levenshtein distance computed
+        row by row while walking down the trie). The first letter is assumed to
+        be right, which keeps the search to one branch of the trie.
+
+        Returns:
+        dict: id -> edit distance.
+        """
+        matches = {}
+        first_row = list(range(len(query) + 1))
+        stack = [(self._root[query[0]], query[0], first_row)] if query[0] in self._root else []
+        while stack:
+            node, char, previous_row = stack.pop()
+            row = [previous_row[0] + 1]
+            for column in range(1, len(query) + 1):
+                cost = 0 if query[column - 1] == char else 1
+                row.append(min(row[column - 1] + 1, previous_row[column] + 1, previous_row[column - 1] + cost))
+            if row[-1] <= max_distance:
+                # The whole subtree matches with this distance, no need to go further down
+                for species_id in node.get(_IDS, []):
+                    if row[-1] < matches.get(species_id, max_distance + 1):
+                        matches[species_id] = row[-1]
+            elif min(row) <= max_distance:
+                stack.extend((child, child_char, row) for child_char, child in node.items() if child_char is not _IDS)
+        return matches
+
+    def search(self, query, max_results=None):
+        """
+        Return the best suggestions for the typed text, as (label, scientific name)
+        tuples for the dropdown.
+
+        The species starting with the text are ranked by usage count. Only the
+        used species need to be sorted, the rest of the list is filled with the
+        first matches of the trie, so the cost does not depend on how many names
+        match. If no name starts with the text, the names within a small edit
+        distance are suggested, closest first.
+        """
+        max_results = max_results or self.max_results
+        query = normalize_name(query or "")
+        usage = self.usage_counts()
+        with self._lock:
+            candidates = self._find_prefix(query) if query else range(len(self._species))
+            if candidates:
+                used = []
+                if len(candidates) < len(usage):
+                    for species_id in candidates:
+                        count = usage.get(self._species[species_id], 0)
+                        if count > 0:
+                            used.append((-count, self._species[species_id], species_id))
+                else:
+                    for species, count in usage.items():
+                        species_id = self._ids.get(species)
+                        if count > 0 and species_id is not None and any(key.startswith(query) for key in self._keys[species_id]):
+                            used.append((-count, species, species_id))
+                ranked = [species_id for _, _, species_id in heapq.nsmallest(max_results, used)]
+                seen = set(ranked)
+                for species_id in candidates:
+                    if len(ranked) >= max_results:
+                        break
+                    if species_id not in seen:
+                        ranked.append(species_id)
+            else:
+                fuzzy = self._find_fuzzy(query, max_edit_distance(query)) if max_edit_distance(query) else {}
+                ranked = heapq.nsmallest(max_results, fuzzy, key=lambda i: (fuzzy[i], -usage.get(self._species[i], 0), self._species[i]))
+            return [(self._labels[i], self._species[i]) for i in ranked]
+
+
+def label_with_query(choices, query):
+    """
+    Make the labels of the suggestions contain the typed text. The browser only
+    shows the dropdown choices whose label contains it, which would hide the
+    fuzzy matches (e.g. "Grsu" for "Grus grus"), so the text is appended to them.
+
+    Parameters:
+    choices (list): (label, scientific name) tuples, as returned by SpeciesIndex.search.
+    query (str): The typed text.
+
+    Returns:
+    list: The choices, with the labels the browser keeps.
+    """
+    query = query or ""
+    return [
+        (label if query.lower() in label.lower() else f"{label} ~ {query}", species)
+        for label, species in choices
+    ]
+
+
+def load_species(index, suggested_species=(), labels_path=SPECIES_LABELS_FILE):
+    """
+    Fill the index with the BirdNET labels file (if it exists) and the species
+    already suggested by the users.
+    """
+    if labels_path and os.path.exists(labels_path):
+        for scientific_name, common_name in read_labels_file(labels_path):
+            index.add(scientific_name, common_name)
+    for species in suggested_species:
+        index.add(species)
+    return index
+
+
+species_index = SpeciesIndex(usage_counts=suggested_species_store.get_counts)
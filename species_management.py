@@ -1,7 +1,258 @@
+import atexit
+import bisect
+import csv
 import os
+import tempfile
+import threading
+
 import pandas as pd
 
-from config import SUGGESTED_SPECIES_FILE, COMMENTS_FILE
+from config import SUGGESTED_SPECIES_FILE, COMMENTS_FILE, SUGGESTED_SPECIES_FLUSH_DELAY_S
+from file_lock import FileLock
+
+
+def _write_csv_atomic(file_path, header, rows):
+    # Written to a temporary file and renamed, so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), suffix=".tmp")
+    with os.fdopen(fd, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+    os.replace(tmp_path, file_path)
+
+
+class SuggestedSpeciesStore:
+    """
+    Suggested species and their counts, loaded once and kept in memory.
+
+    The species are grouped in buckets by count, so an increment moves one
+    species to the next bucket in O(1) and the ranking (ascending count, as
+    shown in the dropdown) is always up to date. Increments are written to the
+    file after a short delay, merged with the changes made by other processes
+    under a file lock.
+    """
+
+    def __init__(self, file_path=SUGGESTED_SPECIES_FILE, flush_delay=SUGGESTED_SPECIES_FLUSH_DELAY_S):
+        self.file_path = file_path
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._flush_timer = None
+        self._loaded = False
+        self._pending = {}  # species -> increments not written yet
+        self._set_counts([])
+
+    def _set_counts(self, species_counts):
+        self._counts = {}  # species -> count
+        self._buckets = {}  # count -> species with that count, in ranking order
+        self._bucket_counts = []  # sorted counts with a bucket
+        self._ranking = None
+        for species, count in species_counts:
+            if species not in self._counts:
+                self._add_to_bucket(species, count)
+
+    def _add_to_bucket(self, species, count):
+        if count not in self._buckets:
+            self._buckets[count] = {}
+            bisect.insort(self._bucket_counts, count)
+        self._buckets[count][species] = None
+        self._counts[species] = count
+
+    def _remove_from_bucket(self, species):
+        count = self._counts.pop(species)
+        bucket = self._buckets[count]
+        del bucket[species]
+        if not bucket:
+            del self._buckets[count]
+            del self._bucket_counts[bisect.bisect_left(self._bucket_counts, count)]
+
+    def _read_file(self):
+        species_counts = []
+        if os.path.exists(self.file_path):
+            with open(self.file_path, newline="", encoding="utf-8") as file:
+                for row in csv.DictReader(file):
+                    try:
+                        species_counts.append((row["species"], int(float(row["count"] or 0))))
+                    except (KeyError, ValueError, TypeError):
+                        continue
+        # Ascending count, keeping the file order for equal counts
+        return sorted(species_counts, key=lambda item: item[1])
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._set_counts(self._read_file())
+            self._loaded = True
+
+    def reload(self):
+        """
+        Read the file again, e.g. after it was rewritten at startup.
+        """
+        with self._lock:
+            self._set_counts(self._read_file())
+            self._pending = {}
+            self._loaded = True
+
+    def increment(self, species):
+        with self._lock:
+            self._ensure_loaded()
+            count = self._counts.get(species)
+            if count is not None:
+                self._remove_from_bucket(species)
+            self._add_to_bucket(species, (count or 0) + 1)
+            self._ranking = None
+            self._pending[species] = self._pending.get(species, 0) + 1
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def get_counts(self):
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._counts)
+
+    def get_ranking(self):
+        """
+        Return the species sorted by ascending count.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._ranking is None:
+                self._ranking = [species for count in self._bucket_counts for species in self._buckets[count]]
+            return list(self._ranking)
+
+    def flush(self):
+        """
+        Write the pending increments to the file.
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        try:
+            with FileLock(self.file_path):
+                # Other processes may have written the file since it was loaded
+                merged = dict(self._read_file())
+                for species, increments in pending.items():
+                    merged[species] = merged.get(species, 0) + increments
+                species_counts = sorted(merged.items(), key=lambda item: item[1])
+                _write_csv_atomic(self.file_path, ["species", "count"], species_counts)
+        except OSError as e:
+            print(f"Error saving suggested species: {str(e)}")
+            with self._lock:
+                for species, increments in pending.items():
+                    self._pending[species] = self._pending.get(species, 0) + increments
+            return
+
+        with self._lock:
+            # Increments made while writing are kept on top of the merged counts
+            self._set_counts([(species, count + self._pending.get(species, 0)) for species, count in species_counts])
+            for species, increments in self._pending.items():
+                if species not in self._counts:
+                    self._add_to_bucket(species, increments)
+
+
+suggested_species_store = SuggestedSpeciesStore()
+atexit.register(suggested_species_store.flush)
+
+
+def normalize_comment(comment):
+    """
+    Normalized form of a comment, only used as the key to detect duplicates:
+    lowercase, with the whitespace collapsed. The comment is stored as typed.
+    """
+    return " ".join(str(comment).split()).lower() if comment else ""
+
+
+class CommentVocabulary:
+    """
+    Comments used so far, indexed by their normalized form.
+
+    Looking a comment up is a set membership test, so repeating a known comment
+    costs no disk I/O. New comments are appended to the end of the file, after
+    reading the lines other processes may have appended since the last read.
+    """
+
+    def __init__(self, file_path=COMMENTS_FILE):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._comments = {}  # normalized comment -> comment as stored, in file order
+        self._offset = 0  # bytes of the file already read
+
+    def _read_new_lines(self):
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, "rb") as file:
+            file.seek(self._offset)
+            data = file.read()
+        # Only complete lines are read, a line being written is read next time
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].decode("utf-8").splitlines()
+        if self._offset == 0:
+            lines = lines[1:]  # Header
+        self._offset += end
+        for row in csv.reader(lines):
+            if row and row[0]:
+                self._comments.setdefault(normalize_comment(row[0]), row[0])
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._read_new_lines()
+            self._loaded = True
+
+    def reload(self):
+        with self._lock:
+            self._reset()
+            self._read_new_lines()
+            self._loaded = True
+
+    def __contains__(self, comment):
+        with self._lock:
+            self._ensure_loaded()
+            return normalize_comment(comment) in self._comments
+
+    def add(self, comment):
+        """
+        Store a comment if it is new, as typed (without the surrounding spaces).
+
+        Returns:
+        bool: True if the comment was new.
+        """
+        key = normalize_comment(comment)
+        if not key:
+            return False
+        text = str(comment).strip()
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._comments:
+                return False
+            try:
+                with FileLock(self.file_path):
+                    self._read_new_lines()
+                    if key in self._comments:
+                        return False
+                    with open(self.file_path, "a", newline="", encoding="utf-8") as file:
+                        csv.writer(file).writerow([text])
+                    self._offset = os.path.getsize(self.file_path)
+            except OSError as e:
+                print(f"Error saving comment: {str(e)}")
+            self._comments[key] = text
+            return True
+
+    def get_comments(self):
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._comments.values())
+
+
+comment_vocabulary = CommentVocabulary()
 
 def initialize_suggested_species_file():
     required_columns = ["species", "count"]
@@ -17,7 +268,8 @@ def initialize_suggested_species_file():
             os.rename(SUGGESTED_SPECIES_FILE, backup_file)
             
             df = pd.read_csv(backup_file)
-            df['count'] = 0  # Reset the count to 0
+            # The counts are kept, the species suggestions are ranked by them across sessions
+            df['count'] = pd.to_numeric(df['count'], errors='coerce').fillna(0).astype(int)
             
             # Ensure the correct column order and save the new file
             df = df[required_columns]
@@ -27,6 +279,7 @@ def initialize_suggested_species_file():
                 os.remove(SUGGESTED_SPECIES_FILE)
 
             df.to_csv(SUGGESTED_SPECIES_FILE, index=False)
+        suggested_species_store.reload()
     except Exception as e:
         print(f"Error initializing suggested species file: {str(e)}")
         # If an error occurs, change name of file to avoid further errors and create a new one
@@ -39,27 +292,10 @@ def initialize_suggested_species_file():
         initialize_suggested_species_file()
 
 def add_suggested_species(species):
-    if os.path.exists(SUGGESTED_SPECIES_FILE):
-        df = pd.read_csv(SUGGESTED_SPECIES_FILE)
-    else:
-        df = pd.DataFrame(columns=["species", "count"])
-    
-    if species in df['species'].values:
-        df.loc[df['species'] == species, 'count'] += 1
-    else:
-        new_row = pd.DataFrame([[species, 1]], columns=["species", "count"])
-        df = pd.concat([df, new_row], ignore_index=True)
-    
-    df = df.sort_values(by='count')
-    df.to_csv(SUGGESTED_SPECIES_FILE, index=False)
+    suggested_species_store.increment(species)
 
 def get_suggested_species():
-    if os.path.exists(SUGGESTED_SPECIES_FILE):
-        df = pd.read_csv(SUGGESTED_SPECIES_FILE)
-        df = df.sort_values(by='count')
-        return df['species'].tolist()
-    else:
-        return []
+    return suggested_species_store.get_ranking()
     
 def initialize_comments_file():
     required_columns = ["Comment"]
@@ -84,6 +320,7 @@ def initialize_comments_file():
                 os.remove(COMMENTS_FILE)
 
             df.to_csv(COMMENTS_FILE, index=False)
+        comment_vocabulary.reload()
     except Exception as e:
         print(f"Error initializing comments file: {str(e)}")
         # If an error occurs, change name of file to avoid further errors and create a new one
@@ -96,22 +333,7 @@ def initialize_comments_file():
         initialize_comments_file()
 
 def add_comment(comment):
-    if os.path.exists(COMMENTS_FILE):
-        df = pd.read_csv(COMMENTS_FILE)
-    else:
-        df = pd.DataFrame(columns=["Comment"])
-    
-    # Normalize the comment to avoid case issues and check if it's not empty
-    if comment and comment != "":
-        comment = comment.strip().lower()
-    if comment and comment not in df['Comment'].str.lower().values:
-        new_row = pd.DataFrame([[comment]], columns=["Comment"])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(COMMENTS_FILE, index=False)
+    comment_vocabulary.add(comment)
 
 def get_comments():
-    if os.path.exists(COMMENTS_FILE):
-        df = pd.read_csv(COMMENTS_FILE)
-        return df['Comment'].tolist()
-    else:
-        return []
\ No newline at end of file
+    return comment_vocabulary.get_comments()
@@ -0,0 +1,232 @@
+# spectrogram_cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+from config import SPECTROGRAM_CACHE_DIR, SPECTROGRAM_CACHE_MAX_MB, SEGMENT_CONTEXT_S
+from segments import parse_segment_path
+
+
+class SpectrogramCache:
+    """
+    Persistent on-disk cache of rendered spectrogram images.
+
+    Entries are keyed by a hash of the audio file content plus the render
+    parameters, so the cache survives app restarts and keeps working when the
+    audio folder is moved or renamed. The total size is kept under a budget by
+    evicting the least recently used entries (the file mtime is used as the
+    access time, so the order is also kept across restarts). With max_mb=None
+    nothing is evicted until trim() is called with a budget.
+    """
+
+    def __init__(self, cache_dir=SPECTROGRAM_CACHE_DIR, max_mb=SPECTROGRAM_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = None if max_mb is None else int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total_bytes = 0
+        self._content_hashes = {}  # (path, size, mtime) -> content hash
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".png"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def content_hash(self, file_path):
+        """
+        Hash the content of a file. Results are memoized per (path, size, mtime),
+        so a file is only read again when it changes. Segments of long recordings
+        are hashed by the content hash of the recording (read once, never decoded)
+        and their window and context, so their images survive a move of the
+        recordings too.
+        """
+        segment = parse_segment_path(file_path)
+        if segment:
+            recording_path, start, end = segment
+            window = f"{self.content_hash(recording_path)}|{start:.3f}|{end:.3f}|{SEGMENT_CONTEXT_S}"
+            return hashlib.blake2b(window.encode("utf-8"), digest_size=16).hexdigest()
+        stat = os.stat(file_path)
+        stat_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._content_hashes.get(stat_key)
+        if digest is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(file_path, "rb") as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            self._content_hashes[stat_key] = digest
+        return digest
+
+    def make_key(self, file_path, render_params):
+        """
+        Build the cache key for an audio file rendered with the given parameters.
+
+        Parameters:
+        file_path (str): The path to the audio file.
+        render_params (dict): The parameters used to render the spectrogram.
+
+        Returns:
+        str: The cache key.
+        """
+        params = json.dumps(render_params, sort_keys=True)
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(self.content_hash(file_path).encode())
+        hasher.update(params.encode())
+        return hasher.hexdigest()
+
+    def _find_entry(self, key):
+        """
+        Whether the key is cached. Keys missing from the index are looked up on
+        disk, images written by other processes (precompute_spectrograms.py, or
+        another app) after the index was loaded are added to it.
+        """
+        with self._lock:
+            if key in self._entries:
+                return True
+        try:
+            size = os.path.getsize(self._entry_path(key))
+        except OSError:
+            return False
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = size
+                self._total_bytes += size
+                self._evict()
+            return key in self._entries
+
+    def contains(self, key):
+        return self._find_entry(key)
+
+    def touch(self, key):
+        """
+        Mark a cached image as recently used, without reading it.
+        """
+        try:
+            os.utime(self._entry_path(key))
+        except OSError:
+            pass
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def get(self, key):
+        """
+        Return the cached image for the key, or None if it is not cached.
+        """
+        path = self._entry_path(key)
+        if not self._find_entry(key):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)  # Mark as recently used for the next sessions
+        except OSError:
+            # Evicted by another process, treat as a miss
+            with self._lock:
+                self._forget(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        image = Image.open(BytesIO(data))
+        image.load()
+        return image
+
+    def put(self, key, image):
+        """
+        Store an image in the cache. The file is written to a temporary file and
+        then renamed, so readers never see a partially written entry.
+        """
+        buf = BytesIO()
+        image.save(buf, format="png")
+        data = buf.getvalue()
+
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def trim(self, max_mb=None):
+        """
+        Evict the least recently used images until the cache fits in max_mb (by
+        default its own budget).
+
+        Returns:
+        int: The number of images evicted.
+        """
+        max_bytes = self.max_bytes if max_mb is None else int(max_mb * 1024 * 1024)
+        with self._lock:
+            evictions = self.evictions
+            self._evict(max_bytes)
+            return self.evictions - evictions
+
+    def _evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return
+        while self._total_bytes > max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
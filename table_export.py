@@ -0,0 +1,173 @@
+# table_export.py
+#
+# Save the audio table as CSV or Parquet in a background thread, so saving a large
+# table does not block the UI. The rows are written in chunks, the job reports
+# how many rows are written, and the file only replaces the previous one when it
+# is complete. Incremental exports only hold the rows changed since the last
+# save, found by comparing the validation columns with a snapshot of that save.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from annotation_store import AnnotationStore
+from config import EXPORT_CHUNK_ROWS, EXPORT_PARQUET_COMPRESSION
+
+# A single writer thread, so the saves of all the sessions are written one after the other
+export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export")
+
+EXCLUDED_COLUMNS = ["Path"]
+SNAPSHOT_COLUMNS = ["Validation", "Suggested Specie", "Comment"]
+
+
+class ExportJob:
+    """
+    Progress of one export. The writer thread updates it, the UI polls get_status.
+    """
+
+    def __init__(self, file_path, total_rows, changed_only):
+        self.file_path = file_path
+        self.total_rows = total_rows
+        self.changed_only = changed_only
+        self.rows_read = 0
+        self.rows_written = 0
+        self.error = None
+        self.snapshot = None  # Validation columns of the table as saved, for the next incremental export
+        self.future = None
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def get_status(self):
+        with self._lock:
+            if self.error is not None:
+                return f"ERROR: {self.error}"
+            if not self.done():
+                percent = 100 * self.rows_read // max(self.total_rows, 1)
+                return f"Saving to {self.file_path}: {percent}%"
+            if self.changed_only:
+                return f"Validation saved to {self.file_path} ({self.rows_written} changed rows)"
+            return f"Validation saved to {self.file_path}"
+
+    def _advance(self, rows_read, rows_written):
+        with self._lock:
+            self.rows_read += rows_read
+            self.rows_written += rows_written
+
+
+def _iter_chunks(audio_table, chunk_rows):
+    columns = [column for column in audio_table.columns if column not in EXCLUDED_COLUMNS]
+    # At least one chunk, so an empty table still gets its header
+    for start in range(0, max(len(audio_table), 1), chunk_rows):
+        if isinstance(audio_table, AnnotationStore):
+            yield audio_table.get_rows(start, start + chunk_rows, columns)
+        else:
+            chunk = audio_table.iloc[start:start + chunk_rows][columns]
+            # Indexed by row position, like the rows of the store
+            yield chunk.set_axis(pd.RangeIndex(start, start + len(chunk)))
+
+
+def get_changed_mask(chunk, snapshot):
+    """
+    Rows of a chunk whose validation columns differ from the snapshot of the last
+    save. Without a snapshot, the rows that were validated.
+    """
+    if snapshot is None:
+        return (pd.to_numeric(chunk["Validation"], errors="coerce") != -100).to_numpy()
+    saved = snapshot.reindex(chunk.index)
+    changed = ~chunk.index.isin(snapshot.index)  # Rows added after the last save
+    for column in SNAPSHOT_COLUMNS:
+        if column not in chunk:
+            continue
+        current = chunk[column]
+        if column not in saved:
+            changed |= current.notna().to_numpy()
+            continue
+        previous = saved[column]
+        same = (current == previous) | (current.isna() & previous.isna())
+        changed |= ~same.to_numpy()
+    return changed
+
+
+def _open_writer(file_path, file_format, chunk):
+    if file_format == "parquet":
+        import pyarrow as pa  # Only needed for Parquet exports
+        import pyarrow.parquet as pq
+        # Text columns are written as strings, the rest keep the Arrow type of their
+        # pandas dtype (nullable Int64 included). Every chunk is cast to the schema of
+        # the first one, the chunks of the SQLite store can come with other dtypes.
+        text_columns = [column for column, dtype in chunk.dtypes.items() if dtype == object]
+
+        def to_arrow(rows):
+            rows = rows.assign(**{column: rows[column].map(str, na_action="ignore").astype(object) for column in text_columns})
+            return pa.Table.from_pandas(rows, preserve_index=False)
+
+        first = to_arrow(chunk)
+        schema = pa.schema([
+            # All-empty columns have no type in the first chunk, they are written as text
+            pa.field(field.name, pa.string()) if field.name in text_columns or pa.types.is_null(field.type) else field
+            for field in first.schema
+        ], metadata=first.schema.metadata)
+        writer = pq.ParquetWriter(file_path, schema, compression=EXPORT_PARQUET_COMPRESSION)
+
+        def write(rows):
+            writer.write_table(to_arrow(rows).cast(schema))
+        return write, writer.close
+
+    first_write = [True]
+
+    def write(rows):
+        rows.to_csv(file_path, mode="w" if first_write[0] else "a", header=first_write[0], index=False)
+        first_write[0] = False
+    return write, lambda: None
+
+
+def _write_table(job, audio_table, file_format, snapshot, chunk_rows):
+    # Written next to the output and moved over it when complete
+    temp_path = job.file_path + ".tmp"
+    write = close = None
+    snapshots = []
+    try:
+        for chunk in _iter_chunks(audio_table, chunk_rows):
+            if write is None:
+                write, close = _open_writer(temp_path, file_format, chunk)
+            rows = chunk[get_changed_mask(chunk, snapshot)] if job.changed_only else chunk
+            if len(rows) or not snapshots:
+                write(rows)
+            snapshots.append(chunk[[column for column in SNAPSHOT_COLUMNS if column in chunk]])
+            job._advance(len(chunk), len(rows))
+        close()
+        os.replace(temp_path, job.file_path)
+        job.snapshot = pd.concat(snapshots)
+    except Exception as e:
+        print(f"Error saving the table to {job.file_path}: {e}")
+        with job._lock:
+            job.error = str(e)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def start_export(audio_table, file_path, changed_only=False, snapshot=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Write the audio table (all columns but Path) to a CSV or Parquet file in the
+    background writer thread.
+
+    Parameters:
+    audio_table (pandas.DataFrame or AnnotationStore): The table to save.
+    file_path (str): Output file, Parquet when it ends with .parquet, CSV otherwise.
+    changed_only (bool): Only write the rows changed since the save the snapshot comes from.
+    snapshot (pandas.DataFrame): ExportJob.snapshot of the last save, or None.
+
+    Returns:
+    ExportJob: The job, to poll its status.
+    """
+    file_format = "parquet" if file_path.lower().endswith(".parquet") else "csv"
+    if not isinstance(audio_table, AnnotationStore):
+        # The session keeps validating while the copy is written
+        audio_table = audio_table.copy()
+    job = ExportJob(file_path, len(audio_table), changed_only)
+    job.future = export_executor.submit(_write_table, job, audio_table, file_format, snapshot, chunk_rows)
+    return job
@@ -0,0 +1,106 @@
+# table_view.py
+#
+# Windowed view of the audio table. The whole table stays on the server and only
+# the page around the current row is serialized to the browser.
+#
+# The audio table is either a pandas DataFrame or an AnnotationStore (SQLite),
+# and the handlers read and write it through the row accessors below.
+
+import math
+
+import pandas as pd
+
+from annotation_store import AnnotationStore
+from config import TABLE_PAGE_SIZE
+
+# Columns shown in the browser, the rest of the table (e.g. "Path") stays on the server
+DISPLAY_COLUMNS = ["Idx", "Specie", "File", "Validation", "Suggested Specie", "Comment", "Date", "Time", "Confidence"]
+
+
+def get_row(audio_table, row_index):
+    """
+    Return a row of the audio table as a dict.
+    """
+    if isinstance(audio_table, AnnotationStore):
+        return audio_table.get_row(row_index)
+    return audio_table.loc[row_index].to_dict()
+
+
+def get_row_value(audio_table, row_index, column):
+    """
+    Return one value of a row of the audio table, or None if the column does not exist.
+    """
+    if column not in audio_table:
+        return None
+    if isinstance(audio_table, AnnotationStore):
+        return audio_table.get_value(row_index, column)
+    return audio_table.at[row_index, column]
+
+
+def set_row_values(audio_table, row_index, values):
+    """
+    Update some columns of one row of the audio table, e.g. {"Validation": 1}.
+    """
+    if isinstance(audio_table, AnnotationStore):
+        audio_table.set_values(row_index, values)
+    else:
+        for column, value in values.items():
+            audio_table.at[row_index, column] = value
+
+
+def get_rows(audio_table, start, stop, columns):
+    """
+    Return the rows start to stop - 1 of the audio table, with the given columns.
+    """
+    columns = [column for column in columns if column in audio_table]
+    if isinstance(audio_table, AnnotationStore):
+        return audio_table.get_rows(start, stop, columns)
+    return audio_table.iloc[start:stop][columns]
+
+
+def get_column_values(audio_table, column):
+    """
+    Return one column of the whole audio table as a numpy array.
+    """
+    if isinstance(audio_table, AnnotationStore):
+        return audio_table.get_column(column)
+    return audio_table[column].to_numpy()
+
+
+def get_page_count(audio_table, page_size=TABLE_PAGE_SIZE):
+    return max(math.ceil(len(audio_table) / page_size), 1)
+
+
+def get_page_of_row(row_index, page_size=TABLE_PAGE_SIZE):
+    return max(int(row_index), 0) // page_size
+
+
+def clamp_page(audio_table, page, page_size=TABLE_PAGE_SIZE):
+    return min(max(int(page), 0), get_page_count(audio_table, page_size) - 1)
+
+
+def get_page_start(page, page_size=TABLE_PAGE_SIZE):
+    return int(page) * page_size
+
+
+def get_page(audio_table, page, page_size=TABLE_PAGE_SIZE):
+    """
+    Return the rows of a page of the audio table, with the display columns only.
+    The index of the returned DataFrame keeps the row labels of the full table.
+    """
+    if len(audio_table) == 0:
+        return pd.DataFrame(columns=DISPLAY_COLUMNS[:5])
+    start = get_page_start(clamp_page(audio_table, page, page_size), page_size)
+    return get_rows(audio_table, start, start + page_size, DISPLAY_COLUMNS)
+
+
+def describe_page(audio_table, page, page_size=TABLE_PAGE_SIZE):
+    """
+    Text shown next to the page buttons, e.g. "Page 2 of 10 (rows 51-100 of 500)".
+    """
+    if len(audio_table) == 0:
+        return "No audio files loaded"
+    page = clamp_page(audio_table, page, page_size)
+    start = get_page_start(page, page_size)
+    end = min(start + page_size, len(audio_table))
+    return f"Page {page + 1} of {get_page_count(audio_table, page_size)} (rows {start + 1}-{end} of {len(audio_table)})"
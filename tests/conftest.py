@@ -0,0 +1,9 @@
+# tests/conftest.py
+#
+# The modules of the app live in the repository root, run the tests from there:
+#   python -m pytest -q
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
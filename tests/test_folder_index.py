@@ -0,0 +1,55 @@
+# tests/test_folder_index.py
+
+import os
+
+import pytest
+
+from folder_index import FolderIndex
+
+
+def make_tree(root):
+    for folder in ["Parus major", "Turdus merula/2024"]:
+        os.makedirs(root / folder)
+    for path in ["Parus major/a.wav", "Parus major/b.mp3", "Parus major/notes.txt", "Turdus merula/2024/c.WAV"]:
+        (root / path).write_bytes(b"")
+
+
+def test_list_audio_files(tmp_path):
+    root = tmp_path / "audio"
+    make_tree(root)
+    index = FolderIndex(index_path=str(tmp_path / "index.json"))
+    expected = [str(root / "Parus major" / "a.wav"), str(root / "Parus major" / "b.mp3"), str(root / "Turdus merula" / "2024" / "c.WAV")]
+    assert index.list_audio_files(str(root)) == expected
+
+    # A new file is found through the changed mtime of its directory, with a fresh index from disk
+    (root / "Parus major" / "d.wav").write_bytes(b"")
+    os.utime(root / "Parus major", ns=(0, 1))
+    assert FolderIndex(index_path=str(tmp_path / "index.json")).list_audio_files(str(root)) == sorted(expected + [str(root / "Parus major" / "d.wav")])
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="needs symbolic links")
+def test_symlink_cycle(tmp_path):
+    root = tmp_path / "audio"
+    make_tree(root)
+    os.symlink(root, root / "Turdus merula" / "2024" / "loop")  # Link to an ancestor
+    os.symlink(root / "Parus major", root / "same")  # Second path to a folder
+    files = FolderIndex(index_path=None).list_audio_files(str(root))
+    assert len(files) == 3
+
+
+def test_refresh_and_memory(tmp_path):
+    root = tmp_path / "audio"
+    make_tree(root)
+    index = FolderIndex(index_path=str(tmp_path / "index.json"))
+    assert len(index.list_audio_files(str(root))) == 3
+    # The listings are read from the index file, not kept in memory after the scan
+    assert index._dirs == {}
+
+    # A file added without a new mtime (e.g. on some network shares) is only found by a rescan
+    mtime = os.stat(root / "Parus major").st_mtime_ns
+    (root / "Parus major" / "d.wav").write_bytes(b"")
+    os.utime(root / "Parus major", ns=(mtime, mtime))
+    assert len(index.list_audio_files(str(root))) == 3
+    assert len(index.refresh(str(root))) == 4
+    assert len(FolderIndex(index_path=str(tmp_path / "index.json")).list_audio_files(str(root))) == 4
+    assert index._dirs == {}
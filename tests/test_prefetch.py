@@ -0,0 +1,60 @@
+# tests/test_prefetch.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pandas as pd
+
+from metrics import MetricsRegistry
+from prefetch import Prefetcher, get_prefetch_queue_depth
+
+
+class FakeSession:
+    def __init__(self, paths):
+        self.audio_table = pd.DataFrame({"Path": paths, "Specie": ["Parus major"] * len(paths)})
+
+    def get_audio_file_list(self):
+        return self.audio_table
+
+    def get_current_row_index(self):
+        return 0
+
+    def get_sample_audio_dir(self):
+        return ""
+
+
+def test_fetch_reuses_the_prefetched_job():
+    # The table holds paths that are not normalized, select_row passes them as they are
+    paths = [os.path.join("audio", ".", f"clip_{index}.wav") for index in range(3)]
+    rendered = []
+
+    def render(path):
+        rendered.append(path)
+        return path, f"image of {path}"
+
+    with ThreadPoolExecutor(max_workers=2) as executor, mock.patch("prefetch.update_audio_and_image", render):
+        prefetcher = Prefetcher(FakeSession(paths), rows=2, executor=executor)
+        prefetcher.update()
+        assert prefetcher.fetch(paths[0], loader=render)[1] == f"image of {os.path.normpath(paths[0])}"
+        assert prefetcher.fetch(os.path.normpath(paths[1]), loader=render)[0] == os.path.normpath(paths[1])
+    assert sorted(rendered) == sorted(os.path.normpath(path) for path in paths)
+
+
+def test_queue_depth_gauge():
+    registry = MetricsRegistry()
+    release = threading.Event()
+
+    def render(path):
+        release.wait(10)
+        return path, None
+
+    with ThreadPoolExecutor(max_workers=1) as executor, mock.patch("prefetch.update_audio_and_image", render), \
+            mock.patch("metrics.METRICS_ENABLED", True), mock.patch("metrics.registry", registry):
+        prefetcher = Prefetcher(FakeSession(["a.wav", "b.wav", "c.wav"]), rows=2, executor=executor)
+        prefetcher.update()
+        assert get_prefetch_queue_depth() >= 3
+        assert registry.snapshot()["gauge:prefetch_queue_depth"] == 3
+        assert "validator_prefetch_queue_depth 3" in registry.to_prometheus()
+        release.set()
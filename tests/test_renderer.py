@@ -0,0 +1,53 @@
+# tests/test_renderer.py
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_processing import compute_spectrogram_db, render_spectrogram, render_spectrogram_matplotlib, _colormap_lut, _log_frequency_rows
+from config import SPECTROGRAM_RENDER_PARAMS
+
+
+def write_chirp(path, sr, seconds=1.0, f0=500.0, f1=None):
+    # A rising tone over some noise, so every frequency band has its own level
+    t = np.arange(int(seconds * sr)) / sr
+    f1 = f1 or sr / 4
+    phase = 2 * np.pi * (f0 * t + (f1 - f0) * t ** 2 / (2 * seconds))
+    noise = np.random.default_rng(0).normal(0, 0.01, len(t))
+    sf.write(path, (0.5 * np.sin(phase) + noise).astype(np.float32), sr)
+
+
+@pytest.mark.parametrize("sr, overrides", [
+    (48000, {}),
+    (256000, {"fmin": 10000, "fmax": 120000}),  # Bat recording, cropped to its band
+    (22050, {"n_fft": 1024, "hop_length": 256}),
+])
+def test_numpy_renderer_matches_matplotlib(tmp_path, sr, overrides):
+    params = {**SPECTROGRAM_RENDER_PARAMS, "width": 310, "height": 154, **overrides}
+    path = str(tmp_path / "chirp.wav")
+    write_chirp(path, sr)
+    D, layout = compute_spectrogram_db(path, params)
+
+    reference = np.asarray(render_spectrogram_matplotlib(D, layout, params).convert("RGB"), dtype=np.int16)
+    rendered = np.asarray(render_spectrogram(D, layout, params), dtype=np.int16)
+    assert rendered.shape == reference.shape == (params["height"], params["width"], 3)
+    # Mean absolute difference in 0-255 color units, a wrong row or column mapping is far above it
+    assert np.abs(reference - rendered).mean() < 1.0
+
+
+def test_colormap_lut():
+    from matplotlib import colormaps
+    lut = _colormap_lut("magma")
+    assert lut.shape == (256, 3) and lut.dtype == np.uint8
+    expected = (np.array(colormaps["magma"](np.linspace(0, 1, 256)))[:, :3] * 255).round()
+    assert np.array_equal(lut, expected.astype(np.uint8))
+
+
+def test_log_frequency_rows():
+    rows = _log_frequency_rows(0, 1025, 48000, 2048, 462)
+    assert len(rows) == 462
+    # Top row is the highest bin, the rows go down in frequency, and the log axis
+    # gives the low bins more rows than the high ones
+    assert rows[0] > 1000 and rows[-1] == 0
+    assert np.all(np.diff(rows) <= 0)
+    assert np.sum(rows < 100) > np.sum(rows >= 924)
@@ -0,0 +1,43 @@
+# tests/test_row_styles.py
+
+from unittest import mock
+
+import pandas as pd
+
+from annotation_store import AnnotationStore
+from table_view import get_page, set_row_values
+from ui_components import RowStyleCache, VALIDATION_STYLES
+
+
+def make_table(n_rows=120):
+    return pd.DataFrame({
+        "Path": [f"/audio/clip_{index}.wav" for index in range(n_rows)],
+        "Specie": ["Parus major"] * n_rows,
+        "File": [f"clip_{index}.wav" for index in range(n_rows)],
+        "Validation": [index % 5 - 2 for index in range(n_rows)],
+    })
+
+
+def test_dataframe_styles_are_cached():
+    table = make_table()
+    cache = RowStyleCache()
+    assert list(cache.get_styles(table, 0, 5)) == list(VALIDATION_STYLES[:5])
+    set_row_values(table, 3, {"Validation": -100})
+    cache.update_row(table, 3)
+    assert cache.get_styles(table, 3, 4)[0] == ""
+
+
+def test_store_styles_only_read_the_page(tmp_path):
+    table = make_table()
+    store = AnnotationStore(str(tmp_path / "project.sqlite"))
+    try:
+        store.import_table(table)
+        cache = RowStyleCache()
+        with mock.patch.object(store, "get_column", side_effect=AssertionError("whole column read")):
+            page = get_page(store, 1)
+            assert list(cache.get_styles(store, 50, 50 + len(page), page)) == [VALIDATION_STYLES[index % 5] for index in range(50, 100)]
+            set_row_values(store, 52, {"Validation": 1})
+            cache.update_row(store, 52)
+            assert cache.get_styles(store, 52, 53)[0] == VALIDATION_STYLES[3]
+    finally:
+        store.close()
@@ -0,0 +1,63 @@
+# tests/test_segments.py
+
+import os
+from unittest import mock
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from segments import make_segment_path, parse_segment_path, read_segment
+from spectrogram_cache import SpectrogramCache
+
+
+@pytest.mark.parametrize("recording", [
+    "/data/site 1/REC_0001.wav",
+    r"C:\recordings\2024#1\REC_0001.WAV",
+    "relative/REC.mp3",
+])
+def test_segment_path_round_trip(recording):
+    path = make_segment_path(recording, 12.5, 15.5)
+    assert path == f"{recording}#t=12.500,15.500"
+    assert parse_segment_path(path) == (recording, 12.5, 15.5)
+
+
+@pytest.mark.parametrize("path", [
+    "/data/REC_0001.wav",
+    "/data/REC#0001.wav",
+    "/data/REC_0001.wav#t=12.5",
+    "/data/REC_0001.wav#t=-1,3",
+])
+def test_regular_paths_are_not_segments(path):
+    assert parse_segment_path(path) is None
+
+
+def test_read_segment_window(tmp_path):
+    sr = 8000
+    recording = str(tmp_path / "recording.wav")
+    sf.write(recording, np.arange(10 * sr, dtype=np.float32) / (10 * sr), sr)
+    y, segment_sr = read_segment(make_segment_path(recording, 2.0, 3.5), context=0.0)
+    assert segment_sr == sr
+    assert len(y) == int(1.5 * sr)
+    assert y[0] == pytest.approx(2.0 / 10, abs=1e-4)
+    # The context is clamped to the recording
+    y, _ = read_segment(make_segment_path(recording, 0.5, 9.5), context=1.0)
+    assert len(y) == 10 * sr
+
+
+def test_segment_content_hash_does_not_decode(tmp_path):
+    recording = str(tmp_path / "recording.wav")
+    sf.write(recording, np.zeros(8000, dtype=np.float32), 8000)
+    cache = SpectrogramCache(str(tmp_path / "cache"))
+    with mock.patch("segments.decode_audio", side_effect=AssertionError("decoded")):
+        first = cache.content_hash(make_segment_path(recording, 0.0, 0.5))
+        assert cache.content_hash(make_segment_path(recording, 0.0, 0.5)) == first
+        assert cache.content_hash(make_segment_path(recording, 0.25, 0.75)) != first
+        assert len(cache._content_hashes) == 1  # The recording is hashed once for all its segments
+
+        # Moving the recordings keeps the keys, changing the recording does not
+        moved = str(tmp_path / "moved.wav")
+        os.replace(recording, moved)
+        assert cache.content_hash(make_segment_path(moved, 0.0, 0.5)) == first
+        sf.write(moved, np.ones(8000, dtype=np.float32) * 0.5, 8000)
+        assert cache.content_hash(make_segment_path(moved, 0.0, 0.5)) != first
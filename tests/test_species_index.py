@@ -0,0 +1,46 @@
+# tests/test_species_index.py
+
+from species_index import SpeciesIndex, label_with_query
+
+
+def make_index(usage=None):
+    index = SpeciesIndex(usage_counts=lambda: usage or {}, max_results=5)
+    for scientific_name, common_name in [
+        ("Grus grus", "Common Crane"),
+        ("Parus major", "Great Tit"),
+        ("Passer domesticus", "House Sparrow"),
+        ("Passer montanus", "Eurasian Tree Sparrow"),
+        ("Turdus merula", "Eurasian Blackbird"),
+    ]:
+        index.add(scientific_name, common_name)
+    return index
+
+
+def test_prefix_search():
+    index = make_index()
+    assert [species for _, species in index.search("pass")] == ["Passer domesticus", "Passer montanus"]
+    # Any word of the scientific or common name can start the match
+    assert [species for _, species in index.search("sparrow")] == ["Passer domesticus", "Passer montanus"]
+    assert [species for _, species in index.search("crane")] == ["Grus grus"]
+    assert index.search("Grus")[0] == ("Grus grus (Common Crane)", "Grus grus")
+
+
+def test_prefix_search_ranks_by_usage():
+    index = make_index(usage={"Passer montanus": 3, "Parus major": 1})
+    assert [species for _, species in index.search("pa")] == ["Passer montanus", "Parus major", "Passer domesticus"]
+    assert index.search("")[0][1] == "Passer montanus"
+
+
+def test_fuzzy_search():
+    index = make_index()
+    assert [species for _, species in index.search("grsu")] == ["Grus grus"]
+    assert [species for _, species in index.search("turdsu")] == ["Turdus merula"]
+    # Short queries need an exact prefix
+    assert index.search("gx") == []
+
+
+def test_labels_contain_the_query():
+    index = make_index()
+    for query in ["grsu", "Grus", "sparrow"]:
+        for label, _ in label_with_query(index.search(query), query):
+            assert query.lower() in label.lower()
@@ -0,0 +1,33 @@
+# tests/test_species_management.py
+
+from unittest import mock
+
+import species_management
+from species_management import CommentVocabulary, SuggestedSpeciesStore
+
+
+def test_initialize_keeps_the_counts(tmp_path):
+    file_path = str(tmp_path / "suggested_species.txt")
+    with open(file_path, "w") as file:
+        file.write("species,count\nGrus grus,3\nParus major,1\nTurdus merula,\n")
+    store = SuggestedSpeciesStore(file_path=file_path)
+    with mock.patch("species_management.SUGGESTED_SPECIES_FILE", file_path), mock.patch("species_management.suggested_species_store", store):
+        species_management.initialize_suggested_species_file()
+    # The ranking of the previous sessions is kept
+    assert store.get_counts() == {"Grus grus": 3, "Parus major": 1, "Turdus merula": 0}
+    assert store.get_ranking() == ["Turdus merula", "Parus major", "Grus grus"]
+
+
+def test_comments_are_stored_as_typed(tmp_path):
+    file_path = str(tmp_path / "comments.txt")
+    with open(file_path, "w") as file:
+        file.write("Comment\n")
+    vocabulary = CommentVocabulary(file_path=file_path)
+    assert vocabulary.add("  Song of  Parus major, far ")
+    # The same comment with another case or spacing is not stored again
+    assert not vocabulary.add("song of parus major,   far")
+    assert "SONG OF PARUS MAJOR, FAR" in vocabulary
+    assert vocabulary.get_comments() == ["Song of  Parus major, far"]
+
+    # Another process reads the comment from the file as it was typed
+    assert CommentVocabulary(file_path=file_path).get_comments() == ["Song of  Parus major, far"]
@@ -0,0 +1,65 @@
+# tests/test_spectrogram_cache.py
+
+import numpy as np
+from PIL import Image
+
+from spectrogram_cache import SpectrogramCache
+
+
+def make_image(seed):
+    # Noise does not compress, so every image has about the same size
+    pixels = np.random.default_rng(seed).integers(0, 256, (32, 32, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def test_trim_without_budget(tmp_path):
+    # The precompute workers write without a budget, the parent trims once
+    cache = SpectrogramCache(str(tmp_path), max_mb=None)
+    for index in range(6):
+        cache.put(f"{index:02d}key", make_image(index))
+    assert cache.stats()["entries"] == 6 and cache.evictions == 0
+
+    size = cache.stats()["bytes"] / 6
+    cache.touch("00key")  # Used again, kept
+    evicted = cache.trim(max_mb=3.5 * size / 1024 / 1024)
+    assert evicted == 3
+    kept = SpectrogramCache(str(tmp_path), max_mb=None)
+    assert [key for key in ["00key", "01key", "02key", "03key", "04key", "05key"] if kept.contains(key)] == ["00key", "04key", "05key"]
+
+
+def test_eviction_keeps_the_recently_used(tmp_path):
+    cache = SpectrogramCache(str(tmp_path), max_mb=None)
+    for index in range(3):
+        cache.put(f"{index:02d}key", make_image(index))
+    cache.max_bytes = cache.stats()["bytes"] + 100  # Room for three images
+    assert cache.get("00key") is not None  # 01key is now the least recently used
+    cache.put("03key", make_image(3))
+    cache.put("04key", make_image(4))
+
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert cache.evictions == 2
+    assert not cache.contains("01key") and not cache.contains("02key")
+    assert all(cache.contains(key) for key in ["00key", "03key", "04key"])
+    assert cache.get("01key") is None and cache.misses == 1
+    assert not (tmp_path / "01" / "01key.png").exists()
+
+
+def test_index_is_reloaded(tmp_path):
+    cache = SpectrogramCache(str(tmp_path))
+    cache.put("00key", make_image(0))
+    reopened = SpectrogramCache(str(tmp_path))
+    assert reopened.contains("00key")
+    assert reopened.get("00key").size == (32, 32)
+    assert reopened.stats()["bytes"] == cache.stats()["bytes"]
+
+
+def test_images_written_by_other_processes(tmp_path):
+    cache = SpectrogramCache(str(tmp_path))
+    other = SpectrogramCache(str(tmp_path))  # e.g. precompute_spectrograms.py, after the app started
+    other.put("00key", make_image(0))
+    assert cache.get("00key").size == (32, 32)
+    assert cache.hits == 1 and cache.misses == 0
+    assert cache.stats()["bytes"] == other.stats()["bytes"]
+    other.put("01key", make_image(1))
+    assert cache.contains("01key")
+    assert cache.get("02key") is None and cache.misses == 1
@@ -0,0 +1,76 @@
+# tests/test_table_export.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from annotation_store import AnnotationStore
+from app import build_audio_table
+from table_export import start_export
+
+
+def make_table(n_rows=10):
+    # The table of the app: BirdNET clip names parsed into typed columns (Int64
+    # "Start (ms)" and "End (ms)"), integer Validation codes and a Path column
+    filenames = [
+        os.path.join("/audio", "Parus major" if index % 2 else "Turdus merula", f"SM4_20240512_053000_{index * 3000}_{index * 3000 + 3000}_0.{index + 10}.WAV")
+        for index in range(n_rows - 1)
+    ]
+    filenames.append(os.path.join("/audio", "Parus major", "not_a_birdnet_name.wav"))  # Missing metadata
+    table = build_audio_table(filenames)
+    table["Validation"] = [1 if index % 3 == 0 else -100 for index in range(n_rows)]
+    table["Comment"] = [None] * n_rows
+    return table
+
+
+@pytest.mark.parametrize("extension", ["parquet", "csv"])
+def test_export_round_trip(tmp_path, extension):
+    table = make_table()
+    file_path = str(tmp_path / f"validation.{extension}")
+    job = start_export(table, file_path, chunk_rows=4)
+    job.future.result()
+    assert job.error is None
+
+    saved = pd.read_parquet(file_path) if extension == "parquet" else pd.read_csv(file_path)
+    assert "Path" not in saved.columns
+    assert list(saved["File"]) == list(table["File"])
+    assert list(saved["Specie"]) == list(table["Specie"])
+    assert list(saved["Validation"]) == list(table["Validation"])
+    for column in ["Start (ms)", "End (ms)"]:
+        assert table[column].dtype == "Int64" and table[column].isna().sum() == 1
+        assert saved[column].astype("Int64").equals(table[column])
+    assert saved["Confidence"].equals(table["Confidence"])
+    if extension == "parquet":
+        assert saved["Start (ms)"].dtype == "Int64"
+        assert saved["Validation"].dtype == "int64"
+
+
+def test_parquet_export_from_store(tmp_path):
+    table = make_table()
+    store = AnnotationStore(str(tmp_path / "project.sqlite"))
+    try:
+        store.import_table(table)
+        file_path = str(tmp_path / "validation.parquet")
+        job = start_export(store, file_path, chunk_rows=3)
+        job.future.result()
+        assert job.error is None
+        saved = pd.read_parquet(file_path)
+    finally:
+        store.close()
+    assert len(saved) == len(table)
+    assert list(saved["End (ms)"].astype("Int64")) == list(table["End (ms)"])
+    assert list(saved["Start (ms)"].astype("Int64").fillna(-1)) == list(table["Start (ms)"].fillna(-1))
+
+
+def test_changed_only_export(tmp_path):
+    table = make_table()
+    job = start_export(table, str(tmp_path / "first.parquet"))
+    job.future.result()
+    table.loc[1, "Validation"] = -1
+    job = start_export(table, str(tmp_path / "changed.csv"), changed_only=True, snapshot=job.snapshot)
+    job.future.result()
+    assert job.rows_written == 1
+    changed = pd.read_csv(tmp_path / "changed.csv")
+    assert list(changed["Validation"]) == [-1]
+    assert list(changed["File"]) == [table.loc[1, "File"]]
@@ -0,0 +1,90 @@
+# tests/test_validation_journal.py
+
+import pandas as pd
+
+from validation_journal import ValidationJournal
+from validation_merge import merge_validation_files
+
+
+def make_table():
+    return pd.DataFrame({
+        "Specie": ["Parus major"] * 3 + ["Turdus merula"] * 3,
+        "File": [f"clip_{index}.wav" for index in range(6)],
+        "Validation": [-100] * 6,
+        "Suggested Specie": [None] * 6,
+        "Comment": [None] * 6,
+    })
+
+
+def validate(journal, table, row_index, value, comment=None):
+    table.loc[row_index, "Validation"] = value
+    table.loc[row_index, "Comment"] = comment
+    journal.append(table, row_index)
+
+
+def wait_for_compaction(journal):
+    if journal._compaction_thread is not None:
+        journal._compaction_thread.join(10)
+
+
+def test_replay_restores_validations(tmp_path):
+    journal = ValidationJournal(journal_dir=str(tmp_path), compact_every=100)
+    journal.open(str(tmp_path / "project"))
+    table = make_table()
+    validate(journal, table, 0, 1, "clear call")
+    validate(journal, table, 4, 0)
+    validate(journal, table, 0, 0)  # The last record of a row wins
+    journal.close()
+
+    journal.open(str(tmp_path / "project"))
+    loaded = make_table()
+    assert journal.replay(loaded) == 2
+    journal.close()
+    assert list(loaded["Validation"]) == [0, -100, -100, -100, 0, -100]
+    assert pd.isna(loaded.loc[0, "Comment"])
+
+
+def test_compaction_keeps_the_other_sessions(tmp_path):
+    # Two sessions on the same project share the journal, each with its own table
+    journal = ValidationJournal(journal_dir=str(tmp_path), compact_every=3)
+    journal.open(str(tmp_path / "project"))
+    table_a, table_b = make_table(), make_table()
+    validate(journal, table_a, 0, 1)
+    validate(journal, table_b, 1, 0)
+    validate(journal, table_a, 2, 1)  # Compacts, table_a does not hold the validation of table_b
+    wait_for_compaction(journal)
+    validate(journal, table_b, 3, 1)
+    validate(journal, table_a, 4, 0)
+    validate(journal, table_b, 5, 1)  # Compacts again, merging the first snapshot
+    wait_for_compaction(journal)
+    validate(journal, table_a, 0, 0)  # Only in the journal
+    journal.close()
+
+    journal.open(str(tmp_path / "project"))
+    loaded = make_table()
+    assert journal.replay(loaded) == 6
+    journal.close()
+    assert list(loaded["Validation"]) == [0, 0, 1, 1, 0, 1]
+
+
+def test_merged_validations_are_journaled(tmp_path):
+    # "Load CSV" merges an export into the table, a crash afterwards must not lose it
+    export_path = tmp_path / "export.csv"
+    pd.DataFrame({"File": ["clip_1.wav", "clip_4.wav"], "Validation": [1, -1], "Comment": ["merged", None]}).to_csv(export_path, index=False)
+    with ValidationJournal(journal_dir=str(tmp_path / "journals")).open(str(tmp_path / "project")) as journal:
+        table, _ = merge_validation_files(make_table(), [str(export_path)], journal=journal)
+        assert list(table["Validation"]) == [-100, 1, -100, -100, -1, -100]
+
+    with ValidationJournal(journal_dir=str(tmp_path / "journals")).open(str(tmp_path / "project")) as journal:
+        loaded = make_table()
+        assert journal.replay(loaded) == 2
+    assert list(loaded["Validation"]) == [-100, 1, -100, -100, -1, -100]
+    assert loaded.loc[1, "Comment"] == "merged"
+
+
+def test_closed_journal_ignores_appends(tmp_path):
+    journal = ValidationJournal(journal_dir=str(tmp_path)).open(str(tmp_path / "project"))
+    with journal:
+        validate(journal, make_table(), 0, 1)
+    assert journal._file is None
+    validate(journal, make_table(), 1, 1)  # No error once closed
@@ -2,27 +2,45 @@
 
 import os
 from gradio import Blocks, Markdown, SelectData, Row, HTML
-import requests
+import numpy as np
 import pandas as pd
 
 from audio_processing import list_audio_files_from_folder
 
-# Caching
-from functools import lru_cache
+from config import CURRENT_VERSION, GITHUB_REPO, UPDATE_CHECK_TIMEOUT_S
+from audio_processing import get_recording_date_and_time
 
-from config import CURRENT_VERSION, GITHUB_REPO
-from audio_processing import update_audio_and_image, extract_date_from_filename, extract_time_from_filename
+from annotation_store import AnnotationStore
+from table_view import get_page, get_page_of_row, get_page_start, clamp_page, describe_page, get_row, get_rows, get_row_value, set_row_values, get_column_values
+from sample_library import load_sample_audio_and_image
+from metrics import timed_handler, stage
+from update_check import check_for_updates
 
-# Global variables
-from config import Globals
+@timed_handler
+def on_audio_selected(session, evt: SelectData):
+    """
+    Process the audio selected in the current page of the audio table.
+
+    Args:
+        session (Session): The state of the browser session.
+        evt (gr.SelectData): The event object, with the index of the cell selected in the page.
 
-def on_audio_selected(audio_table, evt: SelectData):
+    Returns:
+        tuple: The outputs of select_row, or None values if no audio is selected.
     """
-    Process the selected audio and return relevant information.
+    audio_table = session.get_audio_file_list()
+    if len(audio_table) and evt and evt.index:
+        selected_row_index = get_page_start(session.get_current_page()) + evt.index[0]
+        return select_row(session, selected_row_index)
+    return None, None, "Specie", -1, None, None, None, None, None, None, None, describe_page(audio_table, 0)
+
+def select_row(session, selected_row_index):
+    """
+    Make a row of the audio table the current one and return relevant information.
 
     Args:
-        selected_row (pandas.DataFrame): The selected row containing audio information.
-        evt (gr.SelectData): The event object containing additional information.
+        session (Session): The state of the browser session.
+        selected_row_index (int): The index of the row in the full audio table.
 
     Returns:
         tuple: A tuple containing the following information:
@@ -33,29 +51,30 @@ def on_audio_selected(audio_table, evt: SelectData):
             - sample_audio (str): The path of a sample audio file for the selected species.
             - sample_image (numpy.ndarray): The mel spectrogram image of the sample audio file.
             - suggested_specie (str): The suggested species for the selected audio.
-
-            If no audio is selected or an error occurs, the tuple will contain None values.
+            - audio_table_styled (pandas.io.formats.style.Styler): The page of the audio table containing the row.
+            - date (str): The recording date.
+            - time (str): The recording time.
+            - comment (str): The comment of the selected audio.
+            - page_text (str): The description of the page shown.
     """
-
-    if not audio_table.empty:
-        if evt and evt.index:
-            selected_row_index = evt.index[0]
-            Globals.set_current_row_index(selected_row_index)
-            audio_table_styled = update_and_highlight_row(audio_table, None, from_audio_selected=True)
-            audio_path = audio_table["Path"][selected_row_index]
-            audio_path = os.path.normpath(audio_path)
-            time = extract_time_from_filename(audio_path)
-            date = extract_date_from_filename(audio_path)
-            species_name = audio_table["Specie"][selected_row_index]
-            Globals.set_current_specie_name(species_name)
-            suggested_specie = audio_table["Suggested Specie"][selected_row_index] if "Suggested Specie" in audio_table else None
-            comment = audio_table["Comment"][selected_row_index] if "Comment" in audio_table else None
-            audio_path, mel_spectrogram_image = update_audio_and_image(audio_path)
-
-            sample_audio, sample_image = get_sample_audio_and_image()
-
-            return mel_spectrogram_image, audio_path, species_name, selected_row_index, sample_audio, sample_image, suggested_specie, audio_table_styled, date, time, comment
-    return None, None, "Specie", -1, None, None, None, None
+    audio_table = session.get_audio_file_list()
+    selected_row_index = min(max(int(selected_row_index), 0), len(audio_table) - 1)
+    session.set_current_row_index(selected_row_index)
+    session.set_current_page(get_page_of_row(selected_row_index))
+    audio_table_styled = update_and_highlight_row(session, audio_table, None, from_audio_selected=True)
+    row = get_row(audio_table, selected_row_index)
+    audio_path = row["Path"]
+    date, time = get_recording_date_and_time(audio_table, selected_row_index)
+    species_name = row["Specie"]
+    session.set_current_specie_name(species_name)
+    suggested_specie = row.get("Suggested Specie")
+    comment = row.get("Comment")
+    audio_path, mel_spectrogram_image = session.prefetcher.fetch(audio_path)
+    session.prefetcher.update()
+
+    sample_audio, sample_image = get_sample_audio_and_image(session)
+
+    return mel_spectrogram_image, audio_path, species_name, selected_row_index, sample_audio, sample_image, suggested_specie, audio_table_styled, date, time, comment, describe_page(audio_table, session.get_current_page())
 
 def apply_styles(row):
     # Check the Validation value and apply color styling to the entire row
@@ -72,71 +91,143 @@ def apply_styles(row):
     else:
         return [''] * len(row)  # Default, no styling
 
-def get_sample_audio_and_image():
-    sample_audio_files = list_audio_files_from_folder(Globals.get_sample_audio_dir() + os.sep + Globals.get_current_specie_name())
+def get_sample_audio_and_image(session):
+    sample_audio_files = list_audio_files_from_folder(session.get_sample_audio_dir() + os.sep + session.get_current_specie_name())
     if sample_audio_files:
-        sample_audio, sample_image = update_audio_and_image(sample_audio_files[0])
+        sample_audio, sample_image = session.prefetcher.fetch(sample_audio_files[0], load_sample_audio_and_image)
     else:
         sample_audio = None
         sample_image = None
         print("No audio files found for the selected species")
 
-    Globals.set_current_sample_audio_file(sample_audio)
+    session.set_current_sample_audio_file(sample_audio)
 
     return sample_audio, sample_image
 
-# Diccionario global para almacenar los estilos de las filas
-row_styles = {}
-
-def update_and_highlight_row(audio_table, validation_value, from_audio_selected=False):
+def update_and_highlight_row(session, audio_table, validation_value, from_audio_selected=False):
     """
-    Actualiza el estilo de la fila seleccionada dependiendo del valor de validación
-    y resalta la fila actual.
+    Actualiza el valor de validación de la fila actual y devuelve la página actual
+    de la tabla con los estilos aplicados.
     """
-    row_corrector = -1 if from_audio_selected else 0
+    current_row_index = session.get_current_row_index()
 
-    current_row_index = Globals.get_current_row_index()
-    next_row_index = current_row_index + 1 + row_corrector
-
-    # Cambia los colores según el valor de validación
+    # Cambia los colores según el valor de validación, solo de la fila que cambia
     if validation_value is not None:
-        audio_table.at[current_row_index, "Validation"] = validation_value
+        set_row_values(audio_table, current_row_index, {"Validation": validation_value})
+        session.row_style_cache.update_row(audio_table, current_row_index)
+
+    # Solo se aplican estilos a las filas de la página que se envía al navegador
+    page = clamp_page(audio_table, session.get_current_page())
+    return style_page(session, get_page(audio_table, page), get_page_start(page))
+
+# Row colors by Validation value, as a lookup array indexed by Validation + 2
+# (the last entry is used for rows that are not validated)
+VALIDATION_STYLES = np.array([
+    'background-color: #D3D3D3',  # -2: Unknown, light grey
+    'background-color: #B02E0C',  # -1: Other, red
+    'background-color: #FFA500',  #  0: Suggested Specie, orange
+    'background-color: #63C132',  #  1: Specie, green
+    'background-color: #86b46e',  #  2: Bird, light green
+    '',
+], dtype=object)
+
+def get_validation_styles(validation):
+    """
+    Vectorized version of apply_styles: the CSS of each row for an array of Validation values.
+    """
+    validation = pd.to_numeric(pd.Series(validation), errors="coerce").fillna(-100).to_numpy()
+    lookup_index = np.where(np.isin(validation, [-2, -1, 0, 1, 2]), validation + 2, len(VALIDATION_STYLES) - 1)
+    return VALIDATION_STYLES[lookup_index.astype(np.intp)]
+
+class RowStyleCache:
+    """
+    CSS of every row of the audio table. It is computed once for the whole table
+    and then only the row that changes is updated, instead of styling every row
+    on each click. Tables kept in an AnnotationStore are not cached: reading the
+    whole Validation column from SQLite costs more than styling the rows of the
+    page, so only those are styled.
+    """
 
-    # Aplicar estilos a todas las filas basadas en su valor de validación
-    styled_audio_table = audio_table.style.apply(apply_styles, axis=1)
+    def __init__(self):
+        self._table_id = None
+        self._styles = VALIDATION_STYLES[:0]
+
+    def invalidate(self):
+        self._table_id = None
+
+    def _ensure(self, audio_table):
+        if self._table_id != id(audio_table) or len(self._styles) != len(audio_table):
+            self._styles = get_validation_styles(get_column_values(audio_table, "Validation")) if len(audio_table) else VALIDATION_STYLES[:0]
+            self._table_id = id(audio_table)
+
+    def update_row(self, audio_table, row_index):
+        if isinstance(audio_table, AnnotationStore):
+            return  # Styled from the page when it is shown
+        self._ensure(audio_table)
+        self._styles[row_index] = get_validation_styles([get_row_value(audio_table, row_index, "Validation")])[0]
+
+    def get_styles(self, audio_table, start, stop, page=None):
+        """
+        CSS of the rows start to stop - 1. page, the rows already read for the
+        browser, saves reading them again from an AnnotationStore.
+        """
+        if isinstance(audio_table, AnnotationStore):
+            if page is None or "Validation" not in page:
+                page = get_rows(audio_table, start, stop, ["Validation"])
+            return get_validation_styles(page["Validation"]) if len(page) else VALIDATION_STYLES[:0]
+        self._ensure(audio_table)
+        return self._styles[start:stop]
+
+def style_page(session, page, start):
+    """
+    Style a page of the audio table with the cached row styles. start is the
+    position of the first row of the page in the audio table.
+    """
+    audio_table = session.get_audio_file_list()
+    if len(audio_table) == 0:
+        return page.style
+    with stage("style"):
+        row_styles = session.row_style_cache.get_styles(audio_table, start, start + len(page), page)
+        styles = pd.DataFrame(np.repeat(row_styles[:, None], len(page.columns), axis=1), index=page.index, columns=page.columns)
+        # The Styler is computed when Gradio serializes the table, timed as "serialize_table"
+        return page.style.apply(lambda _: styles, axis=None)
+
+def render_current_page(session):
+    """
+    Return the current page of the audio table, styled, and its description.
+    """
+    audio_table = session.get_audio_file_list()
+    page = clamp_page(audio_table, session.get_current_page())
+    session.set_current_page(page)
+    return style_page(session, get_page(audio_table, page), get_page_start(page)), describe_page(audio_table, page)
 
-    return styled_audio_table
+@timed_handler
+def on_page_changed(session, step):
+    """
+    Move the table view by a number of pages (negative to go back).
+    """
+    session.set_current_page(clamp_page(session.get_audio_file_list(), session.get_current_page() + step))
+    return render_current_page(session)
 
-def highlight_current_row(audio_table):
+def highlight_current_row(session, audio_table):
     # Create row lines orange style for that row
     def highlight_row(row):
-        return ['border: 2px solid orange' if row.name == Globals.get_current_row_index() else '' for _ in row]
+        return ['border: 2px solid orange' if row.name == session.get_current_row_index() else '' for _ in row]
     
     return audio_table.style.apply(highlight_row, axis=1)
 
-def update_validation(audio_table, row_index, new_value, suggestedSpecie=None):
+def update_validation(session, audio_table, row_index, new_value, suggestedSpecie=None):
     if 0 <= row_index < len(audio_table):
-        audio_table.at[row_index, "Validation"] = new_value
-        audio_table.at[row_index, "Suggested Specie"] = suggestedSpecie
+        set_row_values(audio_table, row_index, {"Validation": new_value, "Suggested Specie": suggestedSpecie})
+        session.row_style_cache.update_row(audio_table, row_index)
+        if session.journal is not None:
+            session.journal.append(audio_table, row_index)
         # return audio_table.style.apply(apply_styles, axis=1)
-        return update_and_highlight_row(audio_table, new_value)  # Verde para validación
+        return update_and_highlight_row(session, audio_table, new_value)  # Verde para validación
     return audio_table
 
-def check_for_updates():
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
-    response = requests.get(url)
-    if response.status_code == 200:
-        latest_release = response.json()
-        latest_version = latest_release["tag_name"]
-        if latest_version != CURRENT_VERSION:
-            return f"A new version {latest_version} is available! Please update."
-    return "You are using the latest version."
-
-def build_footer():
-    update_message = check_for_updates()
-    with Row():
-        Markdown(
-            f"""
+def get_footer_html(update_message):
+    return f"""
             <div style='display: flex; justify-content: space-around; align-items: center; padding: 10px; text-align: center'>
                 <div>
                     <div style="display: flex;flex-direction: row;">
@@ -148,7 +239,22 @@ def build_footer():
                 </div>
             </div>
             """
-        )
+
+def build_footer():
+    """
+    Build the footer with the version of the app. The update check runs in the
+    background (see update_check.py), refresh_footer shows its result once the page loads.
+
+    Returns:
+    gr.Markdown: The footer, to refresh it.
+    """
+    with Row():
+        footer = Markdown(get_footer_html(check_for_updates()))
+    return footer
+
+def refresh_footer():
+    # Runs in a worker when a page loads, the UI is already shown while it waits
+    return get_footer_html(check_for_updates(wait=UPDATE_CHECK_TIMEOUT_S))
 
 def tutorial_tab():
     """
@@ -169,17 +275,19 @@ def tutorial_tab():
         ### Load Audios
         1. Navigate to the "Load Audios" tab.
         2. Select "Files" or "Folder" and click "Browse" to upload your audio files.
+        3. To validate without cutting clips, select "BirdNET Table", then choose the BirdNET result tables (CSV or Raven selection tables) and the folder with the original recordings. Only the window of each detection is read from the recordings.
+        4. With `STORAGE_ENGINE = "sqlite"` in `config.py`, every project is kept in a database. Select "Project" to reopen one without scanning its audio files again.
 
         ### Validate Predictions
         1. Go to the "Validate BirdNET predictions" tab.
-        2. Select an audio file from the table.
+        2. Select an audio file from the table. Use the page buttons or "Go to row" to move through large tables.
         3. View the mel spectrogram and listen to the audio.
         4. Use the "Specie", "Other", and "Unknown" buttons to validate the predictions.
         5. If necessary, enter a suggested species and click "Suggested Specie".
 
         ### Save and Load Validations
-        1. To save the validations, click "Save Table".
-        2. To load previous validations from a CSV file, click "Load CSV and Copy Validation".
+        1. To save the validations, click "Save Table" and choose a CSV or Parquet file. Tick "Only rows changed since the last save" to save only the new validations.
+        2. To load previous validations from one or more CSV or Parquet files, click "Load CSV and Copy Validation".
                     
         ## Video Tutorial
         
@@ -0,0 +1,99 @@
+# update_check.py
+#
+# Check for a newer release of the app on GitHub without delaying the startup.
+# The request runs in a background thread with a short timeout, and its result is
+# kept in UPDATE_CHECK_CACHE_FILE for UPDATE_CHECK_CACHE_TTL_S, so the releases
+# API is asked at most once a day. Offline, set VALIDATOR_OFFLINE=1 to skip it.
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from config import CURRENT_VERSION, GITHUB_REPO, GITHUB_API_URL, UPDATE_CHECK_OFFLINE, UPDATE_CHECK_TIMEOUT_S, UPDATE_CHECK_CACHE_FILE, UPDATE_CHECK_CACHE_TTL_S
+
+_latest_version = None
+_check_done = threading.Event()
+_check_lock = threading.Lock()
+_check_started = False
+
+
+def _read_cached_version(cache_file):
+    # The cached answer is only used while it is recent and for the same repository
+    try:
+        with open(cache_file, encoding="utf-8") as file:
+            cached = json.load(file)
+        if cached.get("repo") == GITHUB_REPO and time.time() - cached.get("time", 0) < UPDATE_CHECK_CACHE_TTL_S:
+            return True, cached.get("latest_version")
+    except (OSError, ValueError, AttributeError):
+        pass
+    return False, None
+
+
+def _write_cached_version(cache_file, latest_version):
+    try:
+        directory = os.path.dirname(os.path.abspath(cache_file))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8") as file:
+            json.dump({"repo": GITHUB_REPO, "time": time.time(), "latest_version": latest_version}, file)
+        os.replace(file.name, cache_file)
+    except OSError as e:
+        print(f"Error writing the update check cache {cache_file}: {e}")
+
+
+def fetch_latest_version(api_url=GITHUB_API_URL, timeout=UPDATE_CHECK_TIMEOUT_S):
+    """
+    Ask the GitHub releases API for the tag of the latest release.
+
+    Returns:
+    str: The tag, or None if it could not be fetched.
+    """
+    import requests  # Only needed when the check runs
+
+    url = f"{api_url.rstrip('/')}/repos/{GITHUB_REPO}/releases/latest"
+    try:
+        response = requests.get(url, timeout=timeout)
+        if response.status_code == 200:
+            return response.json().get("tag_name")
+    except (requests.RequestException, ValueError) as e:
+        print(f"Could not check for updates: {e}")
+    return None
+
+
+def _run_check(cache_file):
+    global _latest_version
+    try:
+        cached, latest_version = _read_cached_version(cache_file)
+        if not cached:
+            latest_version = fetch_latest_version()
+            if latest_version is not None:
+                _write_cached_version(cache_file, latest_version)
+        _latest_version = latest_version
+    finally:
+        _check_done.set()
+
+
+def start_update_check(cache_file=UPDATE_CHECK_CACHE_FILE):
+    """
+    Start the update check in a background thread, once. Does nothing when offline.
+    """
+    global _check_started
+    with _check_lock:
+        if _check_started:
+            return
+        _check_started = True
+    if UPDATE_CHECK_OFFLINE:
+        _check_done.set()
+        return
+    threading.Thread(target=_run_check, args=(cache_file,), name="update-check", daemon=True).start()
+
+
+def check_for_updates(wait=0):
+    """
+    Return the update message, waiting up to wait seconds for the background check.
+    """
+    _check_done.wait(wait)
+    if _latest_version and _latest_version != CURRENT_VERSION:
+        return f"A new version {_latest_version} is available! Please update."
+    return "You are using the latest version."
@@ -0,0 +1,281 @@
+# validation_journal.py
+#
+# Append-only journal of the validations, so that no work is lost if the app
+# crashes or the browser tab is closed before "Save Table". Every validation is
+# appended as one JSON line, fsync'ed in batches, and replayed when the same
+# project is loaded again. The journal is periodically compacted into a CSV
+# snapshot with the latest record of every row.
+
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from config import JOURNAL_DIR, JOURNAL_FSYNC_EVERY, JOURNAL_FSYNC_INTERVAL_S, JOURNAL_COMPACT_EVERY
+
+JOURNAL_COLUMNS = ["Validation", "Suggested Specie", "Comment"]
+
+
+def get_row_keys(audio_table):
+    """
+    Key of the rows of the audio table: the species folder and the file name,
+    which stay the same if the project folder is moved.
+    """
+    return audio_table["Specie"].astype(str) + "/" + audio_table["File"].astype(str)
+
+
+def _to_json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return value
+
+
+class ValidationJournal:
+    """
+    Journal of the validations of one project at a time. The journal file stays
+    open between appends, close() (or a with block) closes it:
+
+        with ValidationJournal().open(project_root) as journal:
+            journal.append(audio_table, row_index)
+    """
+
+    def __init__(self, journal_dir=JOURNAL_DIR, fsync_every=JOURNAL_FSYNC_EVERY, fsync_interval=JOURNAL_FSYNC_INTERVAL_S, compact_every=JOURNAL_COMPACT_EVERY):
+        self.journal_dir = journal_dir
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._journal_path = None
+        self._snapshot_path = None
+        self._unsynced = 0
+        self._since_compaction = 0
+        self._sync_timer = None
+        self._compacting = False  # A snapshot is being written
+        self._compaction_thread = None
+
+    def open(self, project_root):
+        """
+        Start journaling the project in project_root, closing the previous one.
+        """
+        self.close()
+        project_id = hashlib.blake2b(os.path.abspath(project_root).encode(), digest_size=10).hexdigest()
+        os.makedirs(self.journal_dir, exist_ok=True)
+        base_path = os.path.join(self.journal_dir, project_id)
+        journal_file = open(base_path + ".jsonl", "a", encoding="utf-8")
+        with self._lock:
+            self._journal_path = base_path + ".jsonl"
+            self._snapshot_path = base_path + ".csv"
+            self._file = journal_file
+            self._since_compaction = 0
+        return self
+
+    def append(self, audio_table, row_index):
+        """
+        Append the validation of a row of the audio table to the journal.
+        """
+        self.append_rows(audio_table, [row_index])
+
+    def append_rows(self, audio_table, row_indices):
+        """
+        Append the validations of several rows of the audio table to the journal,
+        e.g. the rows updated by "Load CSV", with a single write.
+        """
+        if self._file is None or len(row_indices) == 0:
+            return
+        rows = audio_table.loc[row_indices]
+        now = round(time.time(), 3)
+        columns = [rows[column] if column in rows else [None] * len(rows) for column in JOURNAL_COLUMNS]
+        lines = []
+        for key, validation, species, comment in zip(get_row_keys(rows), *columns):
+            record = {"k": key, "t": now, "v": _to_json_value(validation), "s": _to_json_value(species), "c": _to_json_value(comment)}
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write("".join(lines))
+            self._file.flush()
+            self._unsynced += len(lines)
+            self._since_compaction += len(lines)
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+            elif self._sync_timer is None:
+                # Records written in a quiet period are synced after a short delay
+                self._sync_timer = threading.Timer(self.fsync_interval, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+            compact = self._since_compaction >= self.compact_every
+
+        if compact:
+            self.compact()
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def _read_records(self, path):
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last line may be incomplete after a crash
+                    continue
+        return records
+
+    def replay(self, audio_table):
+        """
+        Apply the snapshot and the journal of the project onto a freshly loaded
+        audio table.
+
+        Returns:
+        int: The number of rows restored.
+        """
+        if self._journal_path is None:
+            return 0
+        frames = []
+        if os.path.exists(self._snapshot_path):
+            frames.append(pd.read_csv(self._snapshot_path, dtype={"k": str}))
+        # A journal left by an interrupted compaction goes before the current one
+        records = self._read_records(self._journal_path + ".old") + self._read_records(self._journal_path)
+        if records:
+            frames.append(pd.DataFrame(records))
+        if not frames:
+            return 0
+
+        latest = pd.concat(frames, ignore_index=True).drop_duplicates("k", keep="last").set_index("k")
+        row_keys = get_row_keys(audio_table)
+        restored = row_keys.isin(latest.index)
+        for key, column in zip(["v", "s", "c"], JOURNAL_COLUMNS):
+            if key not in latest:
+                continue
+            values = row_keys[restored].map(latest[key])
+            if column not in audio_table:
+                audio_table[column] = pd.NA
+            if column == "Validation":
+                values = values.fillna(-100).astype(int)
+            audio_table.loc[restored, column] = values
+        return int(restored.sum())
+
+    def compact(self):
+        """
+        Merge the journal into the CSV snapshot and start a new, empty journal.
+        The snapshot is built from the previous snapshot and the journaled records,
+        not from the table of one session, so the validations of the other sessions
+        on the project are kept. It is written in a background thread.
+        """
+        with self._lock:
+            if self._file is None or self._compacting:
+                return  # The records are merged by the next compaction
+            self._sync()
+            # The current journal is kept until the snapshot that includes it is written
+            self._file.close()
+            self._file = None
+            old_journal_path = self._journal_path + ".old"
+            try:
+                if os.path.exists(old_journal_path):
+                    # Left by an interrupted compaction: both are merged now
+                    with open(self._journal_path, encoding="utf-8") as journal, open(old_journal_path, "a", encoding="utf-8") as old_journal:
+                        old_journal.write(journal.read())
+                    os.remove(self._journal_path)
+                else:
+                    os.replace(self._journal_path, old_journal_path)
+            except OSError as e:
+                print(f"Error compacting the validation journal {self._journal_path}: {e}")
+                return
+            finally:
+                # The journal is open again whether the rotation worked or not
+                self._file = open(self._journal_path, "a", encoding="utf-8")
+            self._since_compaction = 0
+            self._compacting = True
+            snapshot_path = self._snapshot_path
+
+        def write_snapshot():
+            try:
+                frames = []
+                if os.path.exists(snapshot_path):
+                    frames.append(pd.read_csv(snapshot_path, dtype={"k": str}))
+                records = self._read_records(old_journal_path)
+                if records:
+                    frames.append(pd.DataFrame(records))
+                if frames:
+                    snapshot = pd.concat(frames, ignore_index=True).drop_duplicates("k", keep="last")
+                    snapshot = snapshot.reindex(columns=["k", "v", "s", "c"])
+                    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(snapshot_path), suffix=".tmp")
+                    with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+                        snapshot.to_csv(file, index=False)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(tmp_path, snapshot_path)
+                os.remove(old_journal_path)
+            except (OSError, ValueError) as e:
+                print(f"Error compacting the validation journal {snapshot_path}: {e}")
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        self._compaction_thread = threading.Thread(target=write_snapshot, name="journal-compaction", daemon=True)
+        self._compaction_thread.start()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._sync()
+                finally:
+                    self._file.close()
+                    self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Journals of the open projects, shared by all the sessions working on the same project
+_project_journals = {}
+_project_journals_lock = threading.Lock()
+
+
+def get_project_journal(project_root):
+    """
+    Return the journal of the project in project_root, opening it on first use.
+    """
+    project_root = os.path.abspath(project_root)
+    with _project_journals_lock:
+        journal = _project_journals.get(project_root)
+        if journal is None:
+            journal = ValidationJournal()
+            journal.open(project_root)
+            _project_journals[project_root] = journal
+    return journal
+
+
+def close_journals():
+    with _project_journals_lock:
+        for journal in _project_journals.values():
+            journal.close()
+
+
+atexit.register(close_journals)
@@ -0,0 +1,176 @@
+# validation_merge.py
+#
+# Merge the validations of many exported tables (CSV or Parquet, e.g. one per
+# annotator and day) into the loaded audio table. The files are read in chunks
+# into a File -> latest validation map, so millions of rows can be merged
+# without loading them all at once, and the map is applied to the audio table
+# in one vectorized pass.
+#
+# Merge a folder of exports into a single table:
+#   python validation_merge.py exports/ --output merged.csv [--resolution timestamp]
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from annotation_store import AnnotationStore
+from config import VALIDATION_MERGE_CHUNK_ROWS, VALIDATION_MERGE_RESOLUTION
+
+VALIDATION_FILE_EXTENSIONS = (".csv", ".parquet")
+MERGED_COLUMNS = ["Validation", "Suggested Specie", "Comment"]
+TIMESTAMP_COLUMNS = ["Timestamp", "Validated At", "timestamp"]
+
+
+def collect_validation_files(paths):
+    """
+    Expand folders into the validation files they contain. Files of a folder are
+    sorted by modification time, so with "last" resolution the newest export wins.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = [
+                os.path.join(dir_path, name)
+                for dir_path, _, names in os.walk(path)
+                for name in names
+                if name.lower().endswith(VALIDATION_FILE_EXTENSIONS)
+            ]
+            files.extend(sorted(found, key=os.path.getmtime))
+        else:
+            files.append(path)
+    return files
+
+
+def _iter_chunks(file_path, chunk_rows):
+    if file_path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq  # Only needed for Parquet files
+        parquet_file = pq.ParquetFile(file_path)
+        columns = [column for column in ["File"] + MERGED_COLUMNS + TIMESTAMP_COLUMNS if column in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        wanted = set(["File"] + MERGED_COLUMNS + TIMESTAMP_COLUMNS)
+        yield from pd.read_csv(file_path, usecols=lambda column: column in wanted, chunksize=chunk_rows)
+
+
+def _get_timestamps(chunk, file_path):
+    for column in TIMESTAMP_COLUMNS:
+        if column in chunk:
+            return pd.to_datetime(chunk[column], errors="coerce").fillna(pd.Timestamp.min).to_numpy("datetime64[ns]").astype(np.int64)
+    # Exports without a timestamp column are as recent as the file itself
+    return np.full(len(chunk), int(os.path.getmtime(file_path) * 1e9), dtype=np.int64)
+
+
+def build_validation_map(file_paths, resolution=VALIDATION_MERGE_RESOLUTION, chunk_rows=VALIDATION_MERGE_CHUNK_ROWS):
+    """
+    Read validation files in chunks into a map from File to its latest validation.
+
+    Parameters:
+    file_paths (list): CSV or Parquet files, in the order they were exported.
+    resolution (str): "last" keeps the row of the last file that has the File,
+        "timestamp" keeps the row with the latest timestamp column (or file
+        modification time when the file has no timestamp column).
+
+    Returns:
+    pandas.DataFrame: The latest Validation, Suggested Specie and Comment per File, indexed by File.
+    """
+    def fold(frames):
+        frames = [frame for frame in frames if frame is not None]
+        # Concatenated column by column, pd.concat checks every value of the all-empty columns
+        latest = pd.DataFrame({column: np.concatenate([frame[column].to_numpy() for frame in frames]) for column in columns})
+        if resolution == "timestamp":
+            # Stable sort, so with equal timestamps the later file still wins
+            latest = latest.sort_values("_timestamp", kind="stable")
+        return latest.drop_duplicates("File", keep="last")
+
+    columns = ["File"] + MERGED_COLUMNS + ["_timestamp"]
+    latest = None
+    pending, pending_rows = [], 0
+    for file_path in file_paths:
+        for chunk in _iter_chunks(file_path, chunk_rows):
+            if "File" not in chunk or "Validation" not in chunk:
+                print(f"Skipping {file_path}: no File and Validation columns")
+                break
+            chunk = chunk.assign(_timestamp=_get_timestamps(chunk, file_path))
+            # Rows that were not validated do not override earlier validations
+            validation = pd.to_numeric(chunk["Validation"], errors="coerce")
+            chunk = chunk[validation.notna() & (validation != -100)].reindex(columns=columns)
+            chunk = chunk.astype({"Validation": "int64", "Suggested Specie": object, "Comment": object})
+            pending.append(chunk)
+            pending_rows += len(chunk)
+            # The chunks are folded into the map once they outgrow it, so memory stays
+            # within twice the number of distinct Files and each row is folded a few times at most
+            if pending_rows > max(0 if latest is None else len(latest), chunk_rows):
+                latest = fold([latest] + pending)
+                pending, pending_rows = [], 0
+
+    if pending or latest is None:
+        latest = fold([latest] + pending) if pending else pd.DataFrame(columns=columns)
+    return latest.drop(columns="_timestamp").set_index("File")
+
+
+def apply_validation_map(audio_table, validation_map, journal=None):
+    """
+    Copy the merged validations into the rows of the audio table with the same
+    File. Rows without a merged validation keep their values. The updated rows
+    are appended to the journal of the project, if one is given, so a crash
+    after the merge does not lose them.
+
+    Returns:
+    tuple: The updated audio table and the number of rows updated.
+    """
+    if isinstance(audio_table, AnnotationStore):
+        return audio_table, audio_table.update_validations(validation_map.reset_index())
+
+    positions = validation_map.index.get_indexer(audio_table["File"])
+    matched = positions >= 0
+    for column in MERGED_COLUMNS:
+        values = validation_map[column].to_numpy()[positions[matched]]
+        if column == "Validation":
+            audio_table.loc[matched, column] = pd.to_numeric(values).astype(int)
+        elif validation_map[column].notna().any():
+            # Columns missing from every file (e.g. exports without comments) are left as they are
+            if column not in audio_table:
+                audio_table[column] = pd.NA
+            audio_table.loc[matched, column] = values
+    if journal is not None:
+        journal.append_rows(audio_table, audio_table.index[matched])
+    return audio_table, int(matched.sum())
+
+
+def merge_validation_files(audio_table, paths, resolution=VALIDATION_MERGE_RESOLUTION, journal=None):
+    """
+    Merge the validations of the given files and folders into the audio table,
+    journaling the updated rows (see apply_validation_map).
+
+    Returns:
+    tuple: The updated audio table and a message with the result.
+    """
+    file_paths = collect_validation_files(paths)
+    validation_map = build_validation_map(file_paths, resolution)
+    audio_table, updated = apply_validation_map(audio_table, validation_map, journal)
+    return audio_table, f"Validation Values Loaded: {updated} rows updated from {len(file_paths)} files"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge validation exports into a single table with the latest validation per File")
+    parser.add_argument("paths", nargs="+", help="CSV or Parquet validation files, or folders with them")
+    parser.add_argument("--output", required=True, help="Merged table, .csv or .parquet")
+    parser.add_argument("--resolution", choices=["last", "timestamp"], default=VALIDATION_MERGE_RESOLUTION, help="Which validation wins when a File is in several files")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    file_paths = collect_validation_files(args.paths)
+    validation_map = build_validation_map(file_paths, args.resolution).reset_index()
+    if args.output.lower().endswith(".parquet"):
+        validation_map.to_parquet(args.output, index=False)
+    else:
+        validation_map.to_csv(args.output, index=False)
+    print(f"Merged {len(file_paths)} files into {len(validation_map)} validations in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()